@@ -33,11 +33,10 @@ def top_level_task():
   
   num_samples = 10000
   
-  (x_train, y_train), (x_test, y_test) = cifar10.load_data(num_samples)
-  
-  x_train = x_train.astype('float32')
-  x_train /= 255
-  y_train = y_train.astype('int32')
+  # float32 images in [0, 1] and int32 labels, memory-mapped from the cache
+  (x_train, y_train), (x_test, y_test) = cifar10.load_data(num_samples, preprocessed=True)
+  # the dataset fits in memory, np.asarray drops the memmap so fit pins and shuffles it
+  x_train, y_train = np.asarray(x_train), np.asarray(y_train)
   print("shape: ", x_train.shape)
   
   input_tensor1 = Input(shape=(3, 32, 32), dtype="float32")
@@ -0,0 +1,68 @@
+# Copyright 2020 Stanford University, Los Alamos National Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# Measures how the time to build and compile a functional model grows with the
+# number of layers. The graph is a chain of Dense layers with a residual Add
+# every few layers, so every layer has several consumers to walk through.
+
+from flexflow.keras.models import Model
+from flexflow.keras.layers import Add, Dense, Activation, Input
+import flexflow.keras.optimizers
+
+import time
+import gc
+
+def build_graph(num_layers):
+  input_tensor = Input(shape=(16,), dtype="float32")
+  outputs = [Dense(16, activation="relu")(input_tensor)]
+  while len(outputs) < num_layers:
+    t = Dense(16, activation="relu")(outputs[-1])
+    if len(outputs) % 4 == 3:
+      t = Add()([t, outputs[-4]])
+    outputs.append(t)
+  output = Dense(10)(outputs[-1])
+  output = Activation("softmax")(output)
+  return input_tensor, output
+
+def top_level_task():
+  sizes = [1000, 2000, 4000, 8000]
+  per_layer = []
+  print("%10s %12s %12s %12s %14s" %("layers", "build (s)", "compile (s)", "lookup (s)", "us per layer"))
+  for num_layers in sizes:
+    input_tensor, output = build_graph(num_layers)
+
+    ts_start = time.time()
+    model = Model(input_tensor, output)
+    ts_build = time.time()
+    opt = flexflow.keras.optimizers.SGD(learning_rate=0.01)
+    model.compile(optimizer=opt, loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    ts_compile = time.time()
+    for layer in model.layers:
+      model.get_layer(name=layer.name)
+    ts_lookup = time.time()
+
+    nb_layers = len(model.layers)
+    per_layer.append(1e6 * (ts_compile - ts_start) / nb_layers)
+    print("%10d %12.4f %12.4f %12.4f %14.2f" %(nb_layers, ts_build - ts_start, ts_compile - ts_build, ts_lookup - ts_compile, per_layer[-1]))
+    del model
+    gc.collect()
+
+  # with linear construction the cost per layer stays flat as the graph grows
+  print("cost per layer grows %.2fx from %d to %d layers" %(per_layer[-1] / per_layer[0], sizes[0], sizes[-1]))
+
+if __name__ == "__main__":
+  print("Functional API, synthetic graph construction benchmark")
+  top_level_task()
+  gc.collect()
@@ -26,16 +26,11 @@ from accuracy import ModelAccuracy
 def top_level_task():
   
   num_classes = 10
-
-  img_rows, img_cols = 28, 28
-  
-  (x_train, y_train), (x_test, y_test) = mnist.load_data()
-  x_train = x_train.reshape(x_train.shape[0], 1, img_rows, img_cols)
   
-  x_train = x_train.astype('float32')
-  x_train /= 255
-  y_train = y_train.astype('int32')
-  y_train = np.reshape(y_train, (len(y_train), 1))
+  # float32 (N, 1, 28, 28) images in [0, 1] and int32 (N, 1) labels, memory-mapped from the cache
+  (x_train, y_train), (x_test, y_test) = mnist.load_data(preprocessed=True)
+  # the dataset fits in memory, np.asarray drops the memmap so fit pins and shuffles it
+  x_train, y_train = np.asarray(x_train), np.asarray(y_train)
   print("shape: ", x_train.shape, x_train.__array_interface__["strides"])
   
   layers = [Input(shape=(1, 28, 28), dtype="float32"),
@@ -90,14 +90,18 @@ def top_level_task():
 
   epochs = ffconfig.epochs
 
+  input_stager = input_tensor.create_batch_stager(ffmodel)
+  label_stager = label_tensor.create_batch_stager(ffmodel)
+
   ts_start = ffconfig.get_current_time()
   for epoch in range(0,epochs):
     ct = 0
     ffmodel.reset_metrics()
     iterations = num_samples / ffconfig.batch_size
     for iter in range(0, int(iterations)):
-      next_batch(ct, x_train, input_tensor, ffconfig, ffmodel)
-      next_batch_label(ct, y_train, label_tensor, ffconfig, ffmodel)
+      start = ct*ffconfig.batch_size
+      input_stager.stage(x_train[start:start+ffconfig.batch_size, :])
+      label_stager.stage(y_train[start:start+ffconfig.batch_size, :])
       ct += 1
       ffconfig.begin_trace(111)
       ffmodel.forward()
@@ -127,6 +127,7 @@ enum TaskIDs {
   NCCL_INIT_COMMS_TASK_ID,
   // Search
   STRATEGY_SEARCH_TASK_ID,
+  MEASURE_OPERATOR_COSTS_TASK_ID,
   // Python data loader
   PY_DL_FLOAT_LOAD_ENTIRE_CPU_TASK_ID,
   PY_DL_INT_LOAD_ENTIRE_CPU_TASK_ID,
@@ -442,6 +443,8 @@ public:
                 CompMode comp_mode) const;
   void rewrite(const std::map<Op*, ParallelConfig>& current,
                std::map<Op*, ParallelConfig>& next) const;
+  void measure_operator_costs(std::vector<CostMetrics>& costs,
+                              std::vector<int>& num_parts);
   void zero_gradients();
   void print_layers(int id);
   std::string get_operator_type_name(OperatorType type) const;
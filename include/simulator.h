@@ -40,6 +40,13 @@ struct CostMetrics {
   size_t memory_requirement;
 };
 
+struct MeasureOperatorCostsArgs {
+  const FFModel* model;
+  // one entry per layer, filled by the task
+  CostMetrics* costs;
+  int* num_parts;
+};
+
 class Device {
 public:
     enum DeviceType {
@@ -349,6 +356,8 @@ public:
   void add_task_dependencies_with_xfer(
       SimTask* src_task, SimTask* dst_task, size_t message_size);
   CostMetrics measure_operator_cost(Op* op, const ParallelConfig& config);
+  bool measure_operator_cost(Op* op, const ParallelConfig& config,
+                             CostMetrics& cost_metrics);
   float simulate_runtime(const FFModel* model,
       const std::map<Op*, ParallelConfig>& global,
       CompMode comp_mode);
@@ -359,6 +368,9 @@ public:
   static void strategy_search_task(const Task *task,
                                    const std::vector<PhysicalRegion> &regions,
                                    Context ctx, Runtime *runtime);
+  static void measure_operator_costs_task(const Task *task,
+                                          const std::vector<PhysicalRegion> &regions,
+                                          Context ctx, Runtime *runtime);
 public:
   Realm::RegionInstance simulatorInst;
   MachineModel *machine;
@@ -31,6 +31,8 @@ struct Tensor {
   void inline_unmap(FFConfig &config);
   template<typename T>
   T* get_raw_ptr(FFConfig &config);
+  template<typename T>
+  void get_raw_strides(FFConfig &config, size_t *strides);
   void attach_raw_ptr(FFConfig &config, void *raw_ptr, bool column_major);
   void detach_raw_ptr(FFConfig &config);
   bool get_input_sub_tensor(const ParallelConfig& pc,
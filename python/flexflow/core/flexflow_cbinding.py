@@ -16,25 +16,65 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import cffi
+import hashlib
+import json
 import os
-import subprocess
+import struct
 import logging
 import warnings
+import threading
+import time
+import queue
+import weakref
 import numpy as np
 from .flexflow_logger import fflogger
 from .flexflow_type import ActiMode, AggrMode, PoolType, DataType, LossType, CompMode, MetricsType, OpType, ParameterSyncType, enum_to_int, int_to_enum
 
 assert 'FF_HOME' in os.environ
-_flexflow_cxxheader_dir= os.path.join(os.environ['FF_HOME'], 'include')
-_flexflow_cheader_file = os.path.join(os.path.join(os.environ['FF_HOME'], 'python'), 'flexflow_c.h')
-
-_flexflow_cheader = subprocess.check_output(['gcc', '-I', _flexflow_cxxheader_dir, '-E', '-P', _flexflow_cheader_file]).decode('utf-8')
-ffi = cffi.FFI()
-ffi.cdef(_flexflow_cheader)
+_flexflow_cheader_files = [os.path.join(os.environ['FF_HOME'], 'python', 'flexflow_c.h'),
+                           os.path.join(os.environ['FF_HOME'], 'include', 'ffconst.h')]
+
+def _get_cheader_key():
+  sha = hashlib.sha1()
+  for header_file in _flexflow_cheader_files:
+    with open(header_file, 'rb') as f:
+      sha.update(f.read())
+  return sha.hexdigest()
+
+def _get_cffi_cache_dir():
+  if 'FF_CFFI_CACHE_DIR' in os.environ:
+    return os.environ['FF_CFFI_CACHE_DIR']
+  xdg_cache = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+  return os.path.join(xdg_cache, 'flexflow')
+
+def _load_ffi():
+  # Both the compiled module and the cached header are produced by
+  # python/flexflow_cffi_build.py, we never run the preprocessor at import.
+  key = _get_cheader_key()
+  try:
+    from ._flexflow_cffi import ffi as compiled_ffi, header_key
+    if header_key == key:
+      return compiled_ffi
+    fflogger.warning("_flexflow_cffi is out of date with flexflow_c.h, falling back to the cached header")
+  except ImportError:
+    pass
+  cached_header_file = os.path.join(_get_cffi_cache_dir(), 'flexflow_c.%s.h' % key)
+  if os.path.exists(cached_header_file):
+    with open(cached_header_file, 'r') as f:
+      cached_ffi = cffi.FFI()
+      cached_ffi.cdef(f.read())
+      return cached_ffi
+  raise ImportError("Can not find an up-to-date _flexflow_cffi module or cached flexflow_c.h, please run python/flexflow_cffi_build.py")
+
+ffi = _load_ffi()
 ffc = ffi.dlopen(None)
 
 ff_tracing_id = 200
 
+_checkpoint_magic = b'FFCKPT\x00\x00'
+_checkpoint_version = 1
+_checkpoint_alignment = 4096
+
 warnings.simplefilter('always', DeprecationWarning)
 
 def get_c_name(name):
@@ -410,7 +450,7 @@ class FFConfig(object):
 # -----------------------------------------------------------------------
 
 class Tensor(object):
-  __slots__ = ['p_handle', 'handle', '_handle', 'num_dims', 'dims', 'data_type', 'owner_op', 'mapped']
+  __slots__ = ['p_handle', 'handle', '_handle', 'num_dims', 'dims', 'data_type', 'owner_op', 'mapped', '__weakref__']
   def __init__(self, handle, deallocate=True, owner_op_type=None, p_handle=None):
     if handle == None and ffi.typeof(p_handle) == ffi.typeof('flexflow_tensor_t*'):
       self.p_handle = p_handle
@@ -454,8 +494,8 @@ class Tensor(object):
     raw_ptr = self.__get_raw_ptr(ffconfig, data_type)
     raw_ptr_int = int(ffi.cast("uintptr_t", raw_ptr))
     fflogger.debug("raw_ptr: %s, %d" %( str(raw_ptr), raw_ptr_int))
-    strides = None
-    if (self.num_dims >= 1 or self.num_dims <= 4):
+    strides = self.__get_raw_strides(ffconfig)
+    if (self.num_dims >= 1 and self.num_dims <= 5):
       shape = self.dims
     else:
       assert 0, "unknow num_dims"
@@ -464,19 +504,11 @@ class Tensor(object):
     return array
 
   def get_flat_array(self, ffconfig, data_type):
-    assert self.mapped == True, "Tensor is not mapped."
-    raw_ptr = self.__get_raw_ptr(ffconfig, data_type)
-    raw_ptr_int = int(ffi.cast("uintptr_t", raw_ptr))
-    fflogger.debug("raw_ptr: %s, %d" %( str(raw_ptr), raw_ptr_int))
-    strides = None
-    if (self.num_dims >= 1 or self.num_dims <= 4):
-      shape_prod = np.prod(self.dims)
-      shape = (shape_prod,)
-    else:
-      assert 0, "unknown num_dims"
-    initializer = RegionNdarray(shape, data_type, raw_ptr_int, strides, False)
-    array = np.asarray(initializer)
-    return array
+    array = self.get_array(ffconfig, data_type)
+    # a flat view only exists when the instance is laid out densely in numpy
+    # order, otherwise reshape would silently return a copy
+    assert array.flags['C_CONTIGUOUS'], "the mapped instance is not dense, use get_array"
+    return array.reshape(-1)
 
   def attach_numpy_array(self, ffconfig, np_array):
     assert np_array.__array_interface__['strides'] == None, "numpy array strides is not None"
@@ -510,21 +542,54 @@ class Tensor(object):
       assert self.data_type == DataType.DT_FLOAT, "Wrong datatype"
       raw_ptr = ffi.cast("float*", np_raw_ptr[0])
       ret_val = ffc.flexflow_tensor_set_tensor_float(self.handle, ffmodel.handle, num_dims, c_dims, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.float64:
+      assert self.data_type == DataType.DT_DOUBLE, "Wrong datatype"
+      raw_ptr = ffi.cast("double*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_set_tensor_double(self.handle, ffmodel.handle, num_dims, c_dims, raw_ptr, c_comm_type)
     elif np_array.dtype == np.int32:
       assert self.data_type == DataType.DT_INT32, "Wrong datatype"
       raw_ptr = ffi.cast("int*", np_raw_ptr[0])
       ret_val = ffc.flexflow_tensor_set_tensor_int(self.handle, ffmodel.handle, num_dims, c_dims, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.int64:
+      assert self.data_type == DataType.DT_INT64, "Wrong datatype"
+      raw_ptr = ffi.cast("int64_t*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_set_tensor_int64(self.handle, ffmodel.handle, num_dims, c_dims, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.bool_:
+      assert self.data_type == DataType.DT_BOOLEAN, "Wrong datatype"
+      raw_ptr = ffi.cast("bool*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_set_tensor_bool(self.handle, ffmodel.handle, num_dims, c_dims, raw_ptr, c_comm_type)
     else:
       assert 0, "Unsupported datatype"
     fflogger.debug("set tensor raw_ptr: %s, %s, %s, %s" %( str(raw_ptr), str(np_raw_ptr[0]), hex(np_raw_ptr[0]), str(np_shape)))
     assert ret_val == True, ret_val
     
+  def create_batch_stager(self, ffmodel, num_buffers=2):
+    """Create a BatchStager that feeds this tensor from a ring of pre-registered 
+    host staging buffers. It is the asynchronous replacement of calling 
+    :attr:`set_tensor` once per batch.
+             
+    :param ffmodel: the model owning this tensor.
+    :type ffmodel: FFModel
+    
+    :param num_buffers: number of staging buffers in the ring. Default is 2.
+    :type num_buffers: int
+             
+    :returns:  BatchStager -- the stager of this tensor.
+    """
+    return BatchStager(ffmodel, self, num_buffers)
+
   def get_tensor(self, ffmodel, comm_type):
     shape = self.dims
     if self.data_type == DataType.DT_FLOAT:
       np_array = np.empty(shape, dtype=np.float32)
+    elif self.data_type == DataType.DT_DOUBLE:
+      np_array = np.empty(shape, dtype=np.float64)
     elif self.data_type == DataType.DT_INT32:
       np_array = np.empty(shape, dtype=np.int32)
+    elif self.data_type == DataType.DT_INT64:
+      np_array = np.empty(shape, dtype=np.int64)
+    elif self.data_type == DataType.DT_BOOLEAN:
+      np_array = np.empty(shape, dtype=np.bool_)
     else:
       assert 0, "Unsupported datatype"
     np_raw_ptr = np_array.__array_interface__['data']
@@ -532,9 +597,18 @@ class Tensor(object):
     if np_array.dtype == np.float32:
       raw_ptr = ffi.cast("float*", np_raw_ptr[0])
       ret_val = ffc.flexflow_tensor_get_tensor_float(self.handle, ffmodel.handle, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.float64:
+      raw_ptr = ffi.cast("double*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_get_tensor_double(self.handle, ffmodel.handle, raw_ptr, c_comm_type)
     elif np_array.dtype == np.int32:
       raw_ptr = ffi.cast("int*", np_raw_ptr[0])
       ret_val = ffc.flexflow_tensor_get_tensor_int(self.handle, ffmodel.handle, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.int64:
+      raw_ptr = ffi.cast("int64_t*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_get_tensor_int64(self.handle, ffmodel.handle, raw_ptr, c_comm_type)
+    elif np_array.dtype == np.bool_:
+      raw_ptr = ffi.cast("bool*", np_raw_ptr[0])
+      ret_val = ffc.flexflow_tensor_get_tensor_bool(self.handle, ffmodel.handle, raw_ptr, c_comm_type)
     fflogger.debug("get weights raw_ptr: %s, %s, %s, %s" %( str(raw_ptr), str(np_raw_ptr[0]), hex(np_raw_ptr[0]), str(shape)))
     assert ret_val == True
     return np_array
@@ -543,11 +617,24 @@ class Tensor(object):
     assert data_type == self.data_type, "Tensor check data type"
     if (data_type == DataType.DT_FLOAT):
       return ffc.flexflow_tensor_get_raw_ptr_float(self.handle, ffconfig.handle)
+    elif (data_type == DataType.DT_DOUBLE):
+      return ffc.flexflow_tensor_get_raw_ptr_double(self.handle, ffconfig.handle)
     elif (data_type == DataType.DT_INT32):
       return ffc.flexflow_tensor_get_raw_ptr_int32(self.handle, ffconfig.handle)
+    elif (data_type == DataType.DT_INT64):
+      return ffc.flexflow_tensor_get_raw_ptr_int64(self.handle, ffconfig.handle)
+    elif (data_type == DataType.DT_BOOLEAN):
+      return ffc.flexflow_tensor_get_raw_ptr_bool(self.handle, ffconfig.handle)
     else:
       assert 0, "unknown data type"
 
+  def __get_raw_strides(self, ffconfig):
+    # byte strides of the mapped instance; Legion orders them fastest
+    # dimension first, numpy slowest first
+    c_strides = ffi.new("size_t[]", self.num_dims)
+    ffc.flexflow_tensor_get_raw_strides(self.handle, ffconfig.handle, c_strides)
+    return tuple(int(c_strides[i]) for i in reversed(range(self.num_dims)))
+
   def __get_dims(self):
     self.num_dims = ffc.flexflow_tensor_get_num_dims(self.handle)
     d = ffc.flexflow_tensor_get_dims(self.handle)
@@ -639,7 +726,7 @@ class Parameter(Tensor):
 class FFModel(object):
   """
   """
-  __slots__ = ['handle', '_handle', '_layers', '_nb_layers', '_ffconfig', '_tracing_id']
+  __slots__ = ['handle', '_handle', '_layers', '_nb_layers', '_layers_by_name', '_wrappers', '_ffconfig', '_tracing_id', '_batch_readers']
   def __init__(self, ffconfig):
     """Constructor of FFModel.
            
@@ -652,6 +739,12 @@ class FFModel(object):
     self._handle = ffi.gc(self.handle, ffc.flexflow_model_destroy)
     self._layers = dict()
     self._nb_layers = 0
+    self._layers_by_name = dict()
+    # C handle -> python wrapper, so that repeated lookups of the same
+    # tensor do not rebuild the wrapper and query its dims and data type
+    self._wrappers = weakref.WeakValueDictionary()
+    # C handle of an output tensor -> its BatchReader, reused by every predict
+    self._batch_readers = dict()
     self._ffconfig = ffconfig
     global ff_tracing_id
     self._tracing_id = ff_tracing_id
@@ -663,9 +756,26 @@ class FFModel(object):
   def add_layer(self, op_type, name):
     layer_id = self._nb_layers
     op_handle = ffc.flexflow_model_get_layer_by_id(self.handle, layer_id)
-    self._layers[self._nb_layers] = convert_op_handle_to_op(op_type, op_handle, idx=layer_id, name=name)
+    layer = convert_op_handle_to_op(op_type, op_handle, idx=layer_id, name=name)
+    self._layers[self._nb_layers] = layer
+    # new parameters may move the existing ones in memory
+    self._wrappers.clear()
+    # keep the first layer of a name, as the former linear search did
+    if name not in self._layers_by_name:
+      self._layers_by_name[name] = layer
     self._nb_layers += 1
 
+  def _get_wrapper(self, handle, wrapper_type):
+    key = (wrapper_type, int(ffi.cast("uintptr_t", handle.impl)))
+    wrapper = self._wrappers.get(key)
+    if wrapper is None:
+      if wrapper_type is Parameter:
+        wrapper = Parameter(handle)
+      else:
+        wrapper = wrapper_type(handle, deallocate=False)
+      self._wrappers[key] = wrapper
+    return wrapper
+
   def create_tensor(self, dims, data_type, create_grad=True):
     """Instantiate a FlexFlow tensor.
              
@@ -1483,6 +1593,8 @@ class FFModel(object):
       comp_mode = CompMode.TRAINING
     c_comp_mode = enum_to_int(CompMode, comp_mode)
     ffc.flexflow_model_compile(self.handle, c_loss_type, c_metrics, len(metrics), c_comp_mode)
+    # the label tensor is only shaped by compile
+    self._wrappers.clear()
 
   def fit(self, x=None, y=None, batch_size=None, epochs=1):
     """Trains the model for a fixed number of epochs (iterations on a dataset).
@@ -1518,16 +1630,152 @@ class FFModel(object):
         d.reset()
       self.reset_metrics()
       iterations = num_samples / batch_size
-      for iter in range(0, int(iterations)):
-        for d in dataloaders:
-          d.next_batch(self)
-        self._ffconfig.begin_trace(self._tracing_id)
-        self.forward()
-        self.zero_gradients()
-        self.backward()
-        self.update()
-        self._ffconfig.end_trace(self._tracing_id)
-          
+      self.train_steps(dataloaders, int(iterations), self._tracing_id)
+
+  def train_steps(self, dataloaders, num_steps, trace_id=None, eval=False, load_times=None):
+    """Run :attr:`num_steps` traced iterations in a single call. Each iteration
+    loads the next batch of every dataloader, then runs forward, zero_gradients,
+    backward and update (or forward and compute_metrics if :attr:`eval` is True).
+    The loop runs natively, and the GIL is released for the duration of the call.
+             
+    :param dataloaders: the SingleDataLoader or MemmapDataLoader instances feeding the inputs and the label.
+    :type dataloaders: list of SingleDataLoader
+    
+    :param num_steps: number of iterations to run.
+    :type num_steps: int
+    
+    :param trace_id: the Legion trace id of each iteration. Default is the model's tracing id.
+    :type trace_id: int
+    
+    :param eval: compute metrics instead of updating the weights. Default is False.
+    :type eval: bool
+    
+    :param load_times: if not None, filled with the part of each step time (in microseconds) 
+                       spent loading the batches.
+    :type load_times: Numpy Array of np.float64
+             
+    :returns:  Numpy Array -- the time (in microseconds) spent issuing each step.
+    """
+    if trace_id is None:
+      trace_id = self._tracing_id
+    native_dataloaders = [d for d in dataloaders if d.handle is not None]
+    streamed_dataloaders = [d for d in dataloaders if d.handle is None]
+    c_dataloaders = ffi.new("flexflow_single_dataloader_t[]", [d.handle for d in native_dataloaders])
+    step_times = np.zeros(num_steps, dtype=np.float64)
+    c_step_times = ffi.cast("double*", step_times.__array_interface__['data'][0])
+    if load_times is None:
+      c_load_times = ffi.NULL
+    else:
+      assert load_times.dtype == np.float64 and load_times.shape[0] >= num_steps, "please check load_times"
+      c_load_times = ffi.cast("double*", load_times.__array_interface__['data'][0])
+    if len(streamed_dataloaders) == 0:
+      ffc.flexflow_model_train_steps(self.handle, c_dataloaders, len(native_dataloaders), ffi.NULL, 0, 
+                                     num_steps, trace_id, eval, c_step_times, c_load_times)
+      return step_times
+    # streamed dataloaders (e.g. MemmapDataLoader) fill their staging buffers from python,
+    # as many batches ahead as they have buffers, then the native loop stages them
+    stagers = [stager for d in streamed_dataloaders for stager in d.stagers]
+    c_stagers = ffi.new("flexflow_batch_stager_t[]", [stager.handle for stager in stagers])
+    steps_per_call = min(d.num_buffers for d in streamed_dataloaders)
+    fill_times = np.zeros(steps_per_call, dtype=np.float64)
+    for start in range(0, num_steps, steps_per_call):
+      steps = min(steps_per_call, num_steps - start)
+      for step in range(0, steps):
+        ts_start = time.time()
+        for d in streamed_dataloaders:
+          d.fill_next_batch()
+        fill_times[step] = 1e6 * (time.time() - ts_start)
+      ffc.flexflow_model_train_steps(self.handle, c_dataloaders, len(native_dataloaders), c_stagers, len(stagers), 
+                                     steps, trace_id, eval, c_step_times + start, 
+                                     ffi.NULL if load_times is None else c_load_times + start)
+      step_times[start:start+steps] += fill_times[:steps]
+      if load_times is not None:
+        load_times[start:start+steps] += fill_times[:steps]
+    return step_times
+
+  def predict(self, dataloaders, output=None, num_steps=None, trace_id=None):
+    """Run the forward pass over the data of the dataloaders and return the model 
+    outputs. The model should be compiled with :attr:`CompMode.INFERENCE`, so that no 
+    gradients or optimizer states are allocated. The output of each batch is read 
+    back while the forward pass of the next batch is running.
+             
+    :param dataloaders: the dataloaders feeding the inputs of the model.
+    :type dataloaders: list of SingleDataLoader
+    
+    :param output: the tensor to read back. Default is the first output of the last layer.
+    :type output: Tensor
+    
+    :param num_steps: number of batches. Default is as many batches as needed to cover 
+                      the samples of the dataloaders, the last one padded with the last sample.
+    :type num_steps: int
+    
+    :param trace_id: the Legion trace id of each iteration. Default is a new tracing id.
+    :type trace_id: int
+             
+    :returns:  Numpy Array -- the outputs, of shape (num_samples, ...), or 
+               (num_steps * batch_size, ...) if :attr:`num_steps` is given.
+    """
+    if output is None:
+      output = self._layers[self._nb_layers-1].get_output_tensor_by_id(0)
+    if trace_id is None:
+      # a forward-only iteration cannot replay the training trace
+      self._tracing_id += 1
+      trace_id = self._tracing_id
+    num_samples = None
+    if num_steps is None:
+      num_samples = dataloaders[0].num_samples
+      batch_size = self._ffconfig.batch_size
+      num_steps = (num_samples + batch_size - 1) // batch_size
+    if output.data_type == DataType.DT_FLOAT:
+      dtype = np.float32
+    elif output.data_type == DataType.DT_INT32:
+      dtype = np.int32
+    else:
+      assert 0, "unsupported datatype"
+    reader = self._get_batch_reader(output)
+    result = np.empty((num_steps * output.dims[0],) + tuple(output.dims[1:]), dtype=dtype)
+    native_dataloaders = [d for d in dataloaders if d.handle is not None]
+    streamed_dataloaders = [d for d in dataloaders if d.handle is None]
+    for d in streamed_dataloaders:
+      d.pad_last_batch = True
+    for d in dataloaders:
+      d.reset()
+    try:
+      self._predict_steps(native_dataloaders, streamed_dataloaders, reader, num_steps, trace_id, result)
+    finally:
+      for d in streamed_dataloaders:
+        d.pad_last_batch = False
+    if num_samples is None:
+      return result
+    # drop the outputs of the samples padding the last batch
+    return result[:num_samples]
+
+  def _get_batch_reader(self, output):
+    key = int(ffi.cast("uintptr_t", output.handle.impl))
+    if key not in self._batch_readers:
+      self._batch_readers[key] = BatchReader(self, output)
+    return self._batch_readers[key]
+
+  def _predict_steps(self, native_dataloaders, streamed_dataloaders, reader, num_steps, trace_id, result):
+    c_dataloaders = ffi.new("flexflow_single_dataloader_t[]", [d.handle for d in native_dataloaders])
+    c_result = ffi.cast("void*", result.__array_interface__['data'][0])
+    if len(streamed_dataloaders) == 0:
+      ffc.flexflow_model_predict_steps(self.handle, c_dataloaders, len(native_dataloaders), ffi.NULL, 0, 
+                                       reader.handle, num_steps, trace_id, c_result)
+      return
+    # same as train_steps, the streamed batches are filled ahead of each native call
+    stagers = [stager for d in streamed_dataloaders for stager in d.stagers]
+    c_stagers = ffi.new("flexflow_batch_stager_t[]", [stager.handle for stager in stagers])
+    steps_per_call = min(d.num_buffers for d in streamed_dataloaders)
+    batch_bytes = result.nbytes // num_steps if num_steps > 0 else 0
+    for start in range(0, num_steps, steps_per_call):
+      steps = min(steps_per_call, num_steps - start)
+      for step in range(0, steps):
+        for d in streamed_dataloaders:
+          d.fill_next_batch()
+      ffc.flexflow_model_predict_steps(self.handle, c_dataloaders, len(native_dataloaders), c_stagers, len(stagers), 
+                                       reader.handle, steps, trace_id, ffi.cast("char*", c_result) + start * batch_bytes)
+
   def eval(self, x=None, y=None, batch_size=None):
     """Returns the loss value & metrics values for the model in test mode. 
              
@@ -1592,26 +1840,190 @@ class FFModel(object):
     return self._layers[layer_id]
 
   def get_layer_by_name(self, layer_name):
-    for layer_id in self._layers:
-      layer = self._layers[layer_id]
-      if layer.name == layer_name:
-        return layer
-    assert 0, "Can not find the layer with the name"
-    return None
+    layer = self._layers_by_name.get(layer_name)
+    if layer is None:
+      assert 0, "Can not find the layer with the name"
+    return layer
 
   def get_tensor_by_id(self, id):
     handle = ffc.flexflow_model_get_parameter_by_id(self.handle, id)
-    return Parameter(handle)
+    return self._get_wrapper(handle, Parameter)
 
   @property
   def label_tensor(self):
     handle = ffc.flexflow_model_get_label_tensor(self.handle)
-    return Tensor(handle, deallocate=False)
+    return self._get_wrapper(handle, Tensor)
+
+  def _get_checkpoint_index(self):
+    num_states = ffc.flexflow_model_get_num_optimizer_states(self.handle)
+    state_names = [["weights"], ["weights", "momentum"], ["weights", "m", "v"]][num_states]
+    num_tensors = ffc.flexflow_model_get_num_checkpoint_tensors(self.handle)
+    num_parameters = num_tensors // len(state_names)
+    entries = []
+    offset = 0
+    for idx in range(0, num_tensors):
+      nbytes = ffc.flexflow_model_get_checkpoint_tensor_size(self.handle, idx)
+      name = "%s.%d" %(state_names[idx // num_parameters], idx % num_parameters)
+      entries.append({'name': name, 'dtype': '<f4', 'offset': offset, 'nbytes': nbytes})
+      # keep every tensor page aligned so that it can be attached in place
+      offset += (nbytes + _checkpoint_alignment - 1) // _checkpoint_alignment * _checkpoint_alignment
+    return entries, offset
+
+  def save_strategies(self, path):
+    """Write the parallelization strategy of the compiled model (the ParallelConfig 
+    of every op) in the strategy file format. Starting FlexFlow with 
+    ``--import path`` reuses it without running the strategy search again.
+             
+    :param path: the strategy file to write.
+    :type path: str
+             
+    :returns:  None -- no returns.
+    """
+    ret_val = ffc.flexflow_model_save_strategies(self.handle, path.encode('utf-8'))
+    assert ret_val == True, "failed to write strategy file %s" %(path)
+
+  def measure_operator_costs(self):
+    """Measure every op of the compiled model on a GPU, with the simulator
+    used by the strategy search, under the ParallelConfig the op was
+    partitioned with. The times are those of one partition of the op.
+             
+    :returns:  list -- one dict per layer, in the order of the layer ids, with 
+      ``forward_time`` and ``backward_time`` in ms (None if the op can not be 
+      measured), ``memory_requirement`` in bytes and ``num_parts``.
+    """
+    num_layers = self._nb_layers
+    c_forward_times = ffi.new("float[]", num_layers)
+    c_backward_times = ffi.new("float[]", num_layers)
+    c_memory_requirements = ffi.new("size_t[]", num_layers)
+    c_num_parts = ffi.new("int[]", num_layers)
+    ffc.flexflow_model_measure_operator_costs(self.handle, c_forward_times, c_backward_times, c_memory_requirements, c_num_parts)
+    costs = []
+    for i in range(0, num_layers):
+      cost = {'forward_time': None, 'backward_time': None,
+              'memory_requirement': c_memory_requirements[i],
+              'num_parts': c_num_parts[i]}
+      if c_forward_times[i] >= 0:
+        cost['forward_time'] = c_forward_times[i]
+        cost['backward_time'] = c_backward_times[i]
+      costs.append(cost)
+    return costs
+
+  def save_checkpoint(self, path, dataloaders=None):
+    """Write the parameters, the optimizer states and the positions of the 
+    dataloaders into one file. The file starts with a JSON index of the tensors, 
+    which are stored page aligned so that they can be memory mapped.
+             
+    :param path: the checkpoint file.
+    :type path: str
+    
+    :param dataloaders: the dataloaders whose position is saved.
+    :type dataloaders: list of SingleDataLoader
+             
+    :returns:  None -- no returns.
+    """
+    entries, data_size = self._get_checkpoint_index()
+    c_scalars = ffi.new("double[]", 3)
+    ffc.flexflow_model_get_optimizer_scalars(self.handle, c_scalars)
+    positions = []
+    if dataloaders is not None:
+      for d in dataloaders:
+        assert d.handle is not None, "only SingleDataLoader positions can be saved"
+        positions.append(list(d.get_position()))
+    index = {'version': _checkpoint_version, 'tensors': entries,
+             'optimizer_scalars': [c_scalars[i] for i in range(0, 3)],
+             'dataloaders': positions}
+    header = json.dumps(index).encode('utf-8')
+    data_offset = (len(_checkpoint_magic) + 16 + len(header) + _checkpoint_alignment - 1) // _checkpoint_alignment * _checkpoint_alignment
+    with open(path, 'wb') as f:
+      f.write(_checkpoint_magic)
+      f.write(struct.pack('<QQ', len(header), data_offset))
+      f.write(header)
+      f.truncate(data_offset + data_size)
+    if len(entries) == 0:
+      return
+    data = np.memmap(path, dtype=np.uint8, mode='r+', offset=data_offset, shape=(data_size,))
+    base_ptr = data.__array_interface__['data'][0]
+    c_ptrs = ffi.new("void*[]", [ffi.cast("void*", base_ptr + e['offset']) for e in entries])
+    ffc.flexflow_model_copy_checkpoint_tensors(self.handle, c_ptrs, False)
+    data.flush()
+    del data
+
+  def load_checkpoint(self, path, dataloaders=None):
+    """Restore a checkpoint written by :meth:`save_checkpoint` into a compiled model 
+    with the same layers and optimizer. The tensors are copied straight out of the 
+    memory mapped file.
+             
+    :param path: the checkpoint file.
+    :type path: str
+    
+    :param dataloaders: the dataloaders whose position is restored, in the order 
+                        they were saved.
+    :type dataloaders: list of SingleDataLoader
+             
+    :returns:  None -- no returns.
+    """
+    with open(path, 'rb') as f:
+      magic = f.read(len(_checkpoint_magic))
+      assert magic == _checkpoint_magic, "%s is not a checkpoint" %(path)
+      header_size, data_offset = struct.unpack('<QQ', f.read(16))
+      index = json.loads(f.read(header_size).decode('utf-8'))
+    assert index['version'] == _checkpoint_version, "unsupported checkpoint version %d" %(index['version'])
+    entries, data_size = self._get_checkpoint_index()
+    saved_entries = index['tensors']
+    assert len(entries) == len(saved_entries), "checkpoint has %d tensors, model has %d" %(len(saved_entries), len(entries))
+    for e, saved in zip(entries, saved_entries):
+      assert e['name'] == saved['name'] and e['nbytes'] == saved['nbytes'], "checkpoint tensor %s does not match the model" %(saved['name'])
+    if len(entries) > 0:
+      data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_offset, shape=(data_size,))
+      base_ptr = data.__array_interface__['data'][0]
+      c_ptrs = ffi.new("void*[]", [ffi.cast("void*", base_ptr + e['offset']) for e in saved_entries])
+      ffc.flexflow_model_copy_checkpoint_tensors(self.handle, c_ptrs, True)
+      del data
+    c_scalars = ffi.new("double[]", index['optimizer_scalars'])
+    ffc.flexflow_model_set_optimizer_scalars(self.handle, c_scalars)
+    if dataloaders is not None:
+      assert len(dataloaders) == len(index['dataloaders']), "checkpoint has %d dataloaders" %(len(index['dataloaders']))
+      for d, position in zip(dataloaders, index['dataloaders']):
+        d.set_position(*position)
+
+  def set_parameters(self, parameters, np_arrays):
+    """Copy numpy arrays into parameters of an initialized model. The arrays are 
+    attached in place, without a staging copy, and all the transfers are issued 
+    at once. Call it after :meth:`init_layers`, which initializes the parameters.
+             
+    :param parameters: the parameters to set.
+    :type parameters: list of Parameter
+    
+    :param np_arrays: the float32 arrays, in the shape of the parameters.
+    :type np_arrays: list of Numpy Array
+             
+    :returns:  None -- no returns.
+    """
+    assert len(parameters) == len(np_arrays), "%d parameters and %d arrays" %(len(parameters), len(np_arrays))
+    if len(parameters) == 0:
+      return
+    c_ptrs = []
+    for parameter, np_array in zip(parameters, np_arrays):
+      assert np_array.dtype == np.float32, "parameter set_weights only supports float32, not %s" %(np_array.dtype)
+      assert tuple(np_array.shape) == tuple(parameter.dims), "please check shape (%s == %s)" %(np_array.shape, parameter.dims)
+      assert np_array.flags['C_CONTIGUOUS'] == True, "the array is not contiguous"
+      c_ptrs.append(ffi.cast("float*", np_array.__array_interface__['data'][0]))
+    c_parameters = ffi.new("flexflow_parameter_t[]", [p.parameter_handle for p in parameters])
+    c_data = ffi.new("float*[]", c_ptrs)
+    ffc.flexflow_model_set_parameters_float(self.handle, len(parameters), c_parameters, c_data)
 
   def get_perf_metrics(self):
     handle = ffc.flexflow_model_get_perf_metrics(self.handle)
     return PerfMetrics(handle)
 
+  def get_perf_metrics_async(self):
+    """Return the metrics of the steps issued so far without waiting for them.
+             
+    :returns:  PerfMetricsFuture -- a handle that can be polled, waited on or awaited.
+    """
+    handle = ffc.flexflow_model_get_perf_metrics_future(self.handle)
+    return PerfMetricsFuture(handle)
+
   def create_data_loader(self, batch_tensor, full_array):
     """Create a SingleDataloader instance. 
              
@@ -1646,6 +2058,28 @@ class FFModel(object):
 
     return dataloader
     
+  def create_memmap_data_loader(self, batch_tensor, source, chunk_size=None, num_chunks=2):
+    """Create a MemmapDataLoader instance that streams the data instead of attaching 
+    the entire array. 
+             
+    :param batch_tensor: a batch-sized tensor. Usually it is a input tensor of the model.  
+    :type batch_tensor: Tensor
+    
+    :param source: the path of a .npy file, a np.memmap, or any array-like object that 
+                   supports slicing along the first dimension (e.g. a h5py dataset).
+    :type source: str or Numpy Array
+    
+    :param chunk_size: number of samples read at once, rounded down to a multiple of 
+                       the batch size. Default is 64 batches.
+    :type chunk_size: int
+    
+    :param num_chunks: number of chunks kept resident in host memory.
+    :type num_chunks: int
+             
+    :returns:  MemmapDataLoader -- returns a dataloader instance.
+    """
+    return MemmapDataLoader(self, batch_tensor, source, chunk_size, num_chunks)
+
   def create_data_loader2(self, batch_tensor, full_array):
     """Create a SingleDataloader instance. 
              
@@ -1785,6 +2219,54 @@ class PerfMetrics(object):
   def get_accuracy(self):
     return ffc.flexflow_per_metrics_get_accuracy(self.handle)
 
+  def get_values(self):
+    """Return the metrics averaged over the samples seen since the last reset.
+    Only the metrics the model was compiled with are meaningful.
+             
+    :returns:  dict -- the metrics by name, and the number of samples.
+    """
+    c_values = ffi.new("double[]", 7)
+    ffc.flexflow_per_metrics_get_values(self.handle, c_values)
+    num_samples = int(c_values[0])
+    values = {'num_samples': num_samples}
+    if num_samples > 0:
+      values['accuracy'] = c_values[1] * 100.0 / num_samples
+      values['categorical_crossentropy'] = c_values[2] / num_samples
+      values['sparse_categorical_crossentropy'] = c_values[3] / num_samples
+      values['mean_squared_error'] = c_values[4] / num_samples
+      values['root_mean_squared_error'] = c_values[5] / num_samples
+      values['mean_absolute_error'] = c_values[6] / num_samples
+    return values
+
+class PerfMetricsFuture(object):
+  __slots__= ['handle', '_handle', '_result']
+  def __init__(self, handle):
+    self.handle = handle
+    self._handle = ffi.gc(self.handle, ffc.flexflow_perf_metrics_future_destroy)
+    self._result = None
+
+  def is_ready(self):
+    """Check whether the metrics have been computed, without blocking.
+             
+    :returns:  bool -- True if :meth:`get` will not block.
+    """
+    return self._result is not None or ffc.flexflow_perf_metrics_future_is_ready(self.handle)
+
+  def get(self):
+    """Wait for the metrics.
+             
+    :returns:  PerfMetrics -- the metrics.
+    """
+    if self._result is None:
+      self._result = PerfMetrics(ffc.flexflow_perf_metrics_future_get(self.handle))
+    return self._result
+
+  def __await__(self):
+    import asyncio
+    while not self.is_ready():
+      yield from asyncio.sleep(0.001).__await__()
+    return self.get()
+
 # -----------------------------------------------------------------------
 # NetConfig
 # -----------------------------------------------------------------------
@@ -1926,14 +2408,331 @@ class SingleDataLoader(object):
     """
     ffc.flexflow_single_dataloader_reset(self.handle)
 
+  def get_position(self):
+    """Return the position of the dataloder within the data.
+             
+    :returns:  tuple -- the index of the next sample, the number of epochs drawn 
+               and the shuffle seed.
+    """
+    c_position = ffi.new("int[]", 3)
+    ffc.flexflow_single_dataloader_get_position(self.handle, c_position)
+    return (c_position[0], c_position[1], c_position[2])
+
+  def set_position(self, next_index, epoch=0, seed=0):
+    """Move the dataloder to a position returned by :meth:`get_position`.
+             
+    :returns:  None -- no returns.
+    """
+    ffc.flexflow_single_dataloader_set_position(self.handle, next_index, epoch, seed)
+
+  def release(self, ffmodel):
+    """Free the copy of the dataset held by the dataloader. The dataloader 
+    cannot load batches anymore afterwards.
+             
+    :param ffmodel: the model the dataloader belongs to.
+    :type ffmodel: FFModel
+             
+    :returns:  None -- no returns.
+    """
+    ffc.flexflow_single_dataloader_release(self.handle, ffmodel.handle)
+
+  def set_shuffle(self, ffmodel, shuffle=True, seed=0, sharded=False):
+    """Visit the samples in a random order that is drawn again at every :meth:`reset`.
+    The permutation is generated natively from :attr:`seed` and the epoch count,
+    so dataloaders of the same model configured with the same seed stay aligned.
+             
+    :param ffmodel: the model the dataloader belongs to.
+    :type ffmodel: FFModel
+    
+    :param shuffle: whether to shuffle the samples.
+    :type shuffle: bool
+    
+    :param seed: seed of the per-epoch permutation.
+    :type seed: int
+    
+    :param sharded: when True, every data-parallel part only draws samples from its 
+                    own contiguous slice of the full data, which avoids reading the 
+                    whole dataset from every device.
+    :type sharded: bool
+             
+    :returns:  None -- no returns.
+    """
+    ffc.flexflow_single_dataloader_set_shuffle(self.handle, ffmodel.handle, shuffle, seed, sharded)
+
+# -----------------------------------------------------------------------
+# BatchStager
+# -----------------------------------------------------------------------
+
+class BatchStager(object):
+  __slots__ = ['handle', '_handle', 'ffmodel', 'batch_tensor', 'num_buffers']
+  def __init__(self, ffmodel, batch_tensor, num_buffers=2):
+    assert type(ffmodel) is FFModel, "BatchStager ffmodel is wrong"
+    assert batch_tensor.data_type == DataType.DT_FLOAT or batch_tensor.data_type == DataType.DT_INT32, "Unsupported datatype"
+    # keep the model alive until the staging buffers are detached
+    self.ffmodel = ffmodel
+    self.batch_tensor = batch_tensor
+    self.num_buffers = num_buffers
+    c_data_type = enum_to_int(DataType, batch_tensor.data_type)
+    self.handle = ffc.flexflow_batch_stager_create(ffmodel.handle, batch_tensor.handle, num_buffers, c_data_type)
+    self._handle = ffi.gc(self.handle, ffc.flexflow_batch_stager_destroy)
+
+  def next_buffer(self):
+    """Return the next staging buffer of the ring as a numpy array. It blocks only
+    if the copy previously issued from this buffer has not finished yet. Up to 
+    :attr:`num_buffers` buffers can be filled ahead, each of them is handed back 
+    to Legion by a :attr:`commit`, or by the native loop of :meth:`FFModel.train_steps`.
+             
+    :returns:  Numpy Array -- a writable view of the staging buffer.
+    """
+    raw_ptr = ffc.flexflow_batch_stager_next_buffer(self.handle)
+    raw_ptr_int = int(ffi.cast("uintptr_t", raw_ptr))
+    initializer = RegionNdarray(self.batch_tensor.dims, self.batch_tensor.data_type, raw_ptr_int, None, False)
+    return np.asarray(initializer)
+
+  def commit(self):
+    """Issue the copy from the buffer returned by :attr:`next_buffer` into the batch 
+    tensor. The copy is deferred and only waits for the consumers of the previous batch.
+             
+    :returns:  None -- no returns.
+    """
+    ffc.flexflow_batch_stager_stage_next_buffer(self.handle, self.ffmodel.handle)
+
+  def fill(self, np_array):
+    """Write one batch into the next staging buffer, without issuing its copy.
+             
+    :param np_array: a batch-sized array, it can also be a slice of a np.memmap.
+    :type np_array: Numpy Array
+             
+    :returns:  None -- no returns.
+    """
+    buffer = self.next_buffer()
+    assert np_array.shape == buffer.shape, "please check shape (%s == %s)" %(str(np_array.shape), str(buffer.shape))
+    np.copyto(buffer, np_array, casting='same_kind')
+
+  def stage(self, np_array):
+    """Write one batch into the next staging buffer and issue its copy into the batch tensor.
+             
+    :param np_array: a batch-sized array, it can also be a slice of a np.memmap.
+    :type np_array: Numpy Array
+             
+    :returns:  None -- no returns.
+    """
+    self.fill(np_array)
+    self.commit()
+
+  def stage_from(self, batches):
+    """Stage the batches produced by an iterable, yielding after each batch 
+    has been issued so that the caller can run the corresponding step.
+             
+    :param batches: batch-sized arrays, e.g. a list or a generator of memmap slices.
+    :type batches: iterable
+             
+    :returns:  generator -- yields the index of the staged batch.
+    """
+    for idx, np_array in enumerate(batches):
+      self.stage(np_array)
+      yield idx
+
+# -----------------------------------------------------------------------
+# BatchReader
+# -----------------------------------------------------------------------
+
+class BatchReader(object):
+  __slots__ = ['handle', '_handle', 'batch_tensor', 'num_buffers']
+  def __init__(self, ffmodel, batch_tensor, num_buffers=2):
+    """The ring of attached host buffers into which :meth:`FFModel.predict` reads 
+    back the batches of an output tensor. :class:`FFModel` keeps one per output 
+    tensor, so the buffers are allocated and attached once.
+    """
+    assert type(ffmodel) is FFModel, "BatchReader ffmodel is wrong"
+    assert batch_tensor.data_type == DataType.DT_FLOAT or batch_tensor.data_type == DataType.DT_INT32, "Unsupported datatype"
+    self.batch_tensor = batch_tensor
+    self.num_buffers = num_buffers
+    c_data_type = enum_to_int(DataType, batch_tensor.data_type)
+    self.handle = ffc.flexflow_batch_reader_create(ffmodel.handle, batch_tensor.handle, num_buffers, c_data_type)
+    self._handle = ffi.gc(self.handle, ffc.flexflow_batch_reader_destroy)
+
+# -----------------------------------------------------------------------
+# MemmapDataLoader
+# -----------------------------------------------------------------------
+
+class MemmapDataLoader(object):
+  __slots__ = ['handle', 'source', 'batch_tensor', 'batch_size', 'chunk_size', 'num_chunks', 
+               'shuffle', 'seed', 'epoch', 'pad_last_batch', '_num_samples', '_stager', '_chunk', 
+               '_chunk_offset', '_chunks', '_worker', '_stop']
+  def __init__(self, ffmodel, batch_tensor, source, chunk_size=None, num_chunks=2, num_buffers=4, stager=None):
+    assert type(ffmodel) is FFModel, "MemmapDataLoader ffmodel is wrong"
+    assert type(batch_tensor) is Tensor, "MemmapDataLoader batch_tensor is wrong"
+    if isinstance(source, str):
+      source = np.load(source, mmap_mode='r')
+    assert len(source.shape) == batch_tensor.num_dims, "please check dims (%d == %d)" %(len(source.shape), batch_tensor.num_dims)
+    assert tuple(source.shape[1:]) == tuple(batch_tensor.dims[1:]), "please check shape (%s == %s)" %(str(source.shape[1:]), str(batch_tensor.dims[1:]))
+    # not backed by a native dataloader, see FFModel.train_steps
+    self.handle = None
+    self.source = source
+    self.batch_tensor = batch_tensor
+    self.batch_size = batch_tensor.dims[0]
+    if chunk_size is None:
+      chunk_size = 64 * self.batch_size
+    assert chunk_size >= self.batch_size, "chunk_size must hold at least one batch"
+    self.chunk_size = chunk_size - chunk_size % self.batch_size
+    assert num_chunks > 0, "num_chunks must be positive"
+    self.num_chunks = num_chunks
+    self._num_samples = source.shape[0]
+    # a stager passed by the caller is reused across dataloaders, which
+    # saves attaching new staging regions for every dataloader
+    if stager is None:
+      stager = BatchStager(ffmodel, batch_tensor, num_buffers)
+    assert stager.batch_tensor.handle.impl == batch_tensor.handle.impl, "the stager feeds another tensor"
+    self._stager = stager
+    self._worker = None
+    self.shuffle = False
+    self.seed = 0
+    self.epoch = 0
+    # set by FFModel.predict, the last partial batch is padded with the last sample
+    self.pad_last_batch = False
+    self.reset()
+
+  @property
+  def num_samples(self):
+    return self._num_samples
+
+  @property
+  def stagers(self):
+    return [self._stager]
+
+  @property
+  def num_buffers(self):
+    return self._stager.num_buffers
+
+  @num_samples.setter
+  def num_samples(self, samples):
+    assert samples <= self.source.shape[0], "num_samples is larger than the source"
+    self._num_samples = samples
+    self.reset()
+
+  def _prefetch(self, chunks, stop, rng):
+    starts = list(range(0, self._num_samples, self.chunk_size))
+    if rng is not None:
+      # the tail chunk may hold less than a batch, so only the full chunks are
+      # shuffled and the tail one is always visited last
+      num_full_chunks = self._num_samples // self.chunk_size
+      starts = [starts[i] for i in rng.permutation(num_full_chunks)] + starts[num_full_chunks:]
+    for start in starts:
+      end = min(start + self.chunk_size, self._num_samples)
+      # reading the slice is where the pages of the source are touched,
+      # so it happens here rather than on the training thread
+      if rng is None:
+        chunk = np.ascontiguousarray(self.source[start:end])
+      else:
+        chunk = np.take(self.source[start:end], rng.permutation(end - start), axis=0)
+      if self.pad_last_batch and end == self._num_samples and chunk.shape[0] % self.batch_size != 0:
+        pad = self.batch_size - chunk.shape[0] % self.batch_size
+        chunk = np.concatenate([chunk, np.repeat(chunk[-1:], pad, axis=0)])
+      while not stop.is_set():
+        try:
+          chunks.put(chunk, timeout=0.1)
+          break
+        except queue.Full:
+          pass
+      if stop.is_set():
+        return
+
+  def _stop_worker(self):
+    if self._worker is not None:
+      self._stop.set()
+      self._worker.join()
+      self._worker = None
+
+  def fill_next_batch(self):
+    """Write the next batch of the resident window into the next staging buffer, 
+    the copy into :attr:`batch_tensor` is issued by :meth:`FFModel.train_steps`. 
+    Only :attr:`num_chunks` chunks of :attr:`chunk_size` samples are kept in host 
+    memory; the following ones are read by a background thread.
+             
+    :returns:  None -- no returns.
+    """
+    if self._chunk is None or self._chunk_offset + self.batch_size > self._chunk.shape[0]:
+      self._chunk = self._chunks.get()
+      self._chunk_offset = 0
+      assert self._chunk.shape[0] >= self.batch_size, "not enough samples left for a batch"
+    self._stager.fill(self._chunk[self._chunk_offset:self._chunk_offset+self.batch_size])
+    self._chunk_offset += self.batch_size
+
+  def next_batch(self, ffmodel):
+    """Stage the next batch of the resident window into :attr:`batch_tensor`.
+             
+    :returns:  None -- no returns.
+    """
+    self.fill_next_batch()
+    self._stager.commit()
+
+  def set_shuffle(self, ffmodel, shuffle=True, seed=0, sharded=False):
+    """Visit the chunks in a random order, and the samples of each chunk in a 
+    random order, drawn again at every :meth:`reset` from :attr:`seed` and the 
+    epoch count. A last chunk shorter than :attr:`chunk_size` stays last. Only the resident chunks are shuffled, so samples further apart 
+    than :attr:`chunk_size` are never swapped. Dataloaders of the same length and 
+    chunk_size configured with the same seed stay aligned.
+             
+    :param ffmodel: the model the dataloader belongs to.
+    :type ffmodel: FFModel
+    
+    :param shuffle: whether to shuffle the samples.
+    :type shuffle: bool
+    
+    :param seed: seed of the per-epoch permutation.
+    :type seed: int
+    
+    :param sharded: not supported by memory-mapped inputs.
+    :type sharded: bool
+             
+    :returns:  None -- no returns.
+    """
+    assert sharded == False, "sharded shuffle is not supported by MemmapDataLoader"
+    self.shuffle = shuffle
+    self.seed = seed
+    self.epoch = 0
+    self.reset()
+
+  def reset(self):
+    """Reset the current position of the dataloder to 0 and restart the prefetching. 
+             
+    :returns:  None -- no returns.
+    """
+    self._stop_worker()
+    self._chunk = None
+    self._chunk_offset = 0
+    rng = None
+    if self.shuffle:
+      rng = np.random.RandomState(self.seed + self.epoch)
+      self.epoch += 1
+    self._chunks = queue.Queue(maxsize=self.num_chunks)
+    self._stop = threading.Event()
+    self._worker = threading.Thread(target=self._prefetch, args=(self._chunks, self._stop, rng))
+    self._worker.daemon = True
+    self._worker.start()
+
+  def close(self):
+    """Stop the prefetching thread.
+             
+    :returns:  None -- no returns.
+    """
+    self._stop_worker()
+
 class RegionNdarray(object):
   __slots__ = ['__array_interface__']
   def __init__(self, shape, data_type, base_ptr, strides, read_only):
     # See: https://docs.scipy.org/doc/numpy/reference/arrays.interface.html
     if (data_type == DataType.DT_FLOAT):
       field_type = "<f4"
+    elif (data_type == DataType.DT_DOUBLE):
+      field_type = "<f8"
     elif (data_type == DataType.DT_INT32):
       field_type = "<i4"
+    elif (data_type == DataType.DT_INT64):
+      field_type = "<i8"
+    elif (data_type == DataType.DT_BOOLEAN):
+      field_type = "|b1"
     else:
       assert 0, "unknown data type"
       field_type = "<f4"
@@ -14,10 +14,22 @@
 #
 
 import flexflow.core as ff
+from flexflow.core.flexflow_logger import fflogger
 import numpy as np
 
 from . import backend as K
 
+import json
+import os
+import socket
+import struct
+import threading
+import time
+try:
+  import queue
+except ImportError:
+  import Queue as queue
+
 class Callback(object):
   def __init__(self):
     self.validation_data = None
@@ -45,7 +57,35 @@ class Callback(object):
 
   def on_train_end(self, logs=None):
     pass
+
+  def _has_batch_hooks(self):
+    # the model falls back to one native call per step for these callbacks
+    return type(self).on_batch_begin is not Callback.on_batch_begin or \
+           type(self).on_batch_end is not Callback.on_batch_end
     
+class History(Callback):
+  def __init__(self):
+    super(History, self).__init__()
+    self.epoch = []
+    self.history = {}
+
+  def on_train_begin(self, logs=None):
+    self.epoch = []
+    self.history = {}
+    self._epoch_logs = []
+
+  def on_epoch_end(self, epoch, logs=None):
+    self.epoch.append(epoch)
+    # the logs of an epoch wait on its metrics when read, so they are
+    # only read once training has been issued
+    self._epoch_logs.append(logs if logs != None else {})
+
+  def on_train_end(self, logs=None):
+    for epoch_logs in self._epoch_logs:
+      for key, value in epoch_logs.items():
+        self.history.setdefault(key, []).append(value)
+    self._epoch_logs = []
+
 class LearningRateScheduler(Callback):
   def __init__(self, schedule):
     super(LearningRateScheduler, self).__init__()
@@ -78,7 +118,7 @@ class EpochVerifyMetrics(Callback):
     self.accuracy = accuracy.value
     self.early_stop = early_stop
 
-  def on_epoch_end(self, logs=None):
+  def on_epoch_end(self, epoch, logs=None):
     perf_metrics = self.model.ffmodel.get_perf_metrics()
     accuracy = perf_metrics.get_accuracy()
     if self.early_stop == False:
@@ -87,5 +127,259 @@ class EpochVerifyMetrics(Callback):
       return True
     else:
       return False
-      
-    
\ No newline at end of file
+
+# -----------------------------------------------------------------------
+# TrainingLogger
+# -----------------------------------------------------------------------
+
+_histogram_bins = 30
+
+def _get_histogram(values):
+  values = values.astype(np.float64).ravel()
+  counts, edges = np.histogram(values, bins=_histogram_bins)
+  return {'min': float(values.min()),
+          'max': float(values.max()),
+          'num': float(values.shape[0]),
+          'sum': float(values.sum()),
+          'sum_squares': float(np.dot(values, values)),
+          'bucket_limit': [float(edge) for edge in edges[1:]],
+          'bucket': [float(count) for count in counts]}
+
+class _JsonlWriter(object):
+  """Appends one json record per line to ``log_dir/events.jsonl``."""
+  def __init__(self, log_dir):
+    self._file = open(os.path.join(log_dir, 'events.jsonl'), 'a')
+
+  def add_scalars(self, step, wall_time, scalars):
+    self._file.write(json.dumps({'step': step, 'wall_time': wall_time, 'scalars': scalars}) + '\n')
+
+  def add_histogram(self, step, wall_time, tag, values):
+    self._file.write(json.dumps({'step': step, 'wall_time': wall_time, 'tag': tag, 'histogram': _get_histogram(values)}) + '\n')
+
+  def flush(self):
+    self._file.flush()
+
+  def close(self):
+    self._file.close()
+
+_crc32c_table = None
+
+def _crc32c(data):
+  global _crc32c_table
+  if _crc32c_table is None:
+    _crc32c_table = []
+    for i in range(256):
+      crc = i
+      for j in range(8):
+        crc = (crc >> 1) ^ 0x82f63b78 if crc & 1 else crc >> 1
+      _crc32c_table.append(crc)
+  crc = 0xffffffff
+  for byte in bytearray(data):
+    crc = _crc32c_table[(crc ^ byte) & 0xff] ^ (crc >> 8)
+  return crc ^ 0xffffffff
+
+def _masked_crc32c(data):
+  crc = _crc32c(data)
+  return (((crc >> 15) | (crc << 17)) + 0xa282ead8) & 0xffffffff
+
+def _pb_varint(value):
+  out = bytearray()
+  while True:
+    byte = value & 0x7f
+    value >>= 7
+    if value:
+      out.append(byte | 0x80)
+    else:
+      out.append(byte)
+      return bytes(out)
+
+def _pb_key(field, wire_type):
+  return _pb_varint((field << 3) | wire_type)
+
+def _pb_bytes(field, data):
+  return _pb_key(field, 2) + _pb_varint(len(data)) + data
+
+def _pb_double(field, value):
+  return _pb_key(field, 1) + struct.pack('<d', value)
+
+class _EventFileWriter(object):
+  """Writes ``tf.Event`` protocol buffers into a TensorBoard event file,
+  without depending on TensorFlow. Only the fields read by TensorBoard for
+  scalars and histograms are encoded.
+  """
+  def __init__(self, log_dir):
+    filename = 'events.out.tfevents.%d.%s' %(int(time.time()), socket.gethostname())
+    self._file = open(os.path.join(log_dir, filename), 'wb')
+    # Event.file_version
+    self.__write_event(time.time(), 0, _pb_bytes(3, b'brain.Event:2'))
+
+  def add_scalars(self, step, wall_time, scalars):
+    summary = b''
+    for tag, value in scalars.items():
+      # Summary.Value: tag = 1, simple_value = 2
+      summary_value = _pb_bytes(1, tag.encode('utf-8')) + _pb_key(2, 5) + struct.pack('<f', value)
+      summary += _pb_bytes(1, summary_value)
+    self.__write_event(wall_time, step, _pb_bytes(5, summary))
+
+  def add_histogram(self, step, wall_time, tag, values):
+    histogram = _get_histogram(values)
+    # HistogramProto: min, max, num, sum, sum_squares, then the packed bucket_limit and bucket
+    histo = b''
+    for field, key in enumerate(['min', 'max', 'num', 'sum', 'sum_squares']):
+      histo += _pb_double(field + 1, histogram[key])
+    histo += _pb_bytes(6, struct.pack('<%dd' %(len(histogram['bucket_limit'])), *histogram['bucket_limit']))
+    histo += _pb_bytes(7, struct.pack('<%dd' %(len(histogram['bucket'])), *histogram['bucket']))
+    # Summary.Value: tag = 1, histo = 5
+    summary_value = _pb_bytes(1, tag.encode('utf-8')) + _pb_bytes(5, histo)
+    self.__write_event(wall_time, step, _pb_bytes(5, _pb_bytes(1, summary_value)))
+
+  def flush(self):
+    self._file.flush()
+
+  def close(self):
+    self._file.close()
+
+  def __write_event(self, wall_time, step, payload):
+    # Event: wall_time = 1, step = 2, then the file_version or summary payload
+    event = _pb_double(1, wall_time) + _pb_key(2, 0) + _pb_varint(step) + payload
+    # TFRecord framing
+    header = struct.pack('<Q', len(event))
+    self._file.write(header + struct.pack('<I', _masked_crc32c(header)) + event + struct.pack('<I', _masked_crc32c(event)))
+
+class TrainingLogger(Callback):
+  """Writes the training scalars, and optionally histograms of the parameters,
+  into a TensorBoard event file or a JSONL file in :attr:`log_dir`.
+
+  The records are handed to a writer thread through a bounded queue, which
+  does the serialization and the file I/O. When the queue is full, the
+  records are dropped instead of stalling the training loop.
+
+  The metrics of an epoch are only read at the end of the next epoch, by
+  which time they are computed, so reading them does not wait on the steps
+  in flight. The last epoch is written at the end of training.
+
+  :param log_dir: the directory of the log files, created if needed.
+  :type log_dir: str
+
+  :param format: 'tensorboard' or 'jsonl'.
+  :type format: str
+
+  :param update_freq: 'epoch' to only write the epoch scalars, or N to also write
+                      the step time, load time and throughput every N steps.
+  :type update_freq: str or int
+
+  :param histogram_freq: write the histograms of the parameters every N steps, 0 to disable.
+                         The parameters are copied with :meth:`Parameter.get_weights`,
+                         which waits for the steps in flight.
+  :type histogram_freq: int
+
+  :param max_queue_size: the number of records waiting for the writer thread.
+  :type max_queue_size: int
+  """
+  def __init__(self, log_dir, format='tensorboard', update_freq='epoch', histogram_freq=0, max_queue_size=100):
+    super(TrainingLogger, self).__init__()
+    if format == 'tensorboard':
+      self._writer_class = _EventFileWriter
+    elif format == 'jsonl':
+      self._writer_class = _JsonlWriter
+    else:
+      assert 0, "Unsupported format %s" %(format)
+    assert update_freq == 'epoch' or (isinstance(update_freq, int) and update_freq > 0), "update_freq should be 'epoch' or a positive int"
+    self.log_dir = log_dir
+    self.update_freq = update_freq
+    self.histogram_freq = histogram_freq
+    self._queue = queue.Queue(maxsize=max_queue_size)
+    self._thread = None
+    self._step = 0
+    self._epoch = 0
+    self._pending_epoch = None
+    self._dropped = 0
+
+  def on_train_begin(self, logs=None):
+    if os.path.isdir(self.log_dir) == False:
+      os.makedirs(self.log_dir)
+    self._dropped = 0
+    self._pending_epoch = None
+    self._thread = threading.Thread(target=self.__run, args=(self._writer_class(self.log_dir),))
+    self._thread.daemon = True
+    self._thread.start()
+
+  def on_batch_end(self, batch, logs=None):
+    self._step += 1
+    if logs != None and self.update_freq != 'epoch' and self._step % self.update_freq == 0:
+      scalars = {}
+      if 'step_time' in logs:
+        scalars['batch/step_time'] = float(logs['step_time'])
+        if logs['step_time'] > 0:
+          scalars['batch/throughput'] = 1e3 * logs['size'] / logs['step_time']
+      if 'load_time' in logs:
+        scalars['batch/load_time'] = float(logs['load_time'])
+      self.__put(('scalars', self._step, time.time(), scalars))
+    if self.histogram_freq > 0 and self._step % self.histogram_freq == 0:
+      self.__put_histograms()
+
+  def on_epoch_end(self, epoch, logs=None):
+    self.__put_pending_epoch()
+    lr = getattr(self.model.optimizer, 'lr', None)
+    self._pending_epoch = (self._epoch, time.time(), logs, lr)
+    self._epoch += 1
+
+  def on_train_end(self, logs=None):
+    self.__put_pending_epoch()
+    # wait for the records in the queue to be written
+    if self._thread.is_alive() == True:
+      self._queue.put(None)
+    self._thread.join()
+    self._thread = None
+    if self._dropped > 0:
+      fflogger.warning("TrainingLogger dropped %d records, increase max_queue_size" %(self._dropped))
+
+  def _has_batch_hooks(self):
+    return self.update_freq != 'epoch' or self.histogram_freq > 0
+
+  def __put(self, record):
+    try:
+      self._queue.put_nowait(record)
+    except queue.Full:
+      self._dropped += 1
+
+  def __put_pending_epoch(self):
+    if self._pending_epoch is None:
+      return
+    epoch, wall_time, logs, lr = self._pending_epoch
+    self._pending_epoch = None
+    scalars = {}
+    if logs != None:
+      for key, value in logs.items():
+        if isinstance(value, (int, float, np.integer, np.floating)):
+          scalars['epoch/' + key] = float(value)
+    if lr != None:
+      scalars['epoch/learning_rate'] = float(lr)
+    self.__put(('scalars', epoch, wall_time, scalars))
+
+  def __put_histograms(self):
+    wall_time = time.time()
+    for layer in self.model.layers:
+      if layer.ffhandle == None:
+        continue
+      for i in range(0, layer.ffhandle.get_number_parameters()):
+        parameter = layer.ffhandle.get_parameter_tensor_by_id(i)
+        values = parameter.get_weights(self.model.ffmodel)
+        self.__put(('histogram', self._step, wall_time, ('%s/parameter_%d' %(layer.name, i), values)))
+
+  def __run(self, writer):
+    try:
+      while True:
+        record = self._queue.get()
+        if record is None:
+          break
+        kind, step, wall_time, payload = record
+        if kind == 'scalars':
+          if len(payload) > 0:
+            writer.add_scalars(step, wall_time, payload)
+        else:
+          writer.add_histogram(step, wall_time, payload[0], payload[1])
+        if self._queue.empty():
+          writer.flush()
+    finally:
+      writer.close()
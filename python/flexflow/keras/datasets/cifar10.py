@@ -5,17 +5,43 @@ from __future__ import division
 from __future__ import print_function
 
 from .cifar import load_batch
+from .dataset_cache import load_preprocessed
 from ..utils.data_utils import get_file
 import numpy as np
 import os
 
 
-def load_data(num_samples=40000):
+def load_data(num_samples=40000, preprocessed=False):
     """Loads CIFAR10 dataset.
 
+    # Arguments
+        num_samples: number of training samples, a multiple of 10000.
+        preprocessed: if True, return the images as float32 scaled to
+            [0, 1] and the labels as int32, read from a memory-mapped
+            cache which is built on the first call.
+
     # Returns
         Tuple of Numpy arrays: `(x_train, y_train), (x_test, y_test)`.
+        The images are `(N, 3, 32, 32)` and the labels `(N, 1)`.
     """
+    if preprocessed:
+        x_train, y_train, x_test, y_test = load_preprocessed(
+            'cifar10', {'num_samples': num_samples},
+            ['x_train', 'y_train', 'x_test', 'y_test'],
+            lambda: _preprocess(*_load_raw_data(num_samples)))
+        return (x_train, y_train), (x_test, y_test)
+    return _load_raw_data(num_samples)
+
+
+def _preprocess(train, test):
+    arrays = []
+    for x, y in [train, test]:
+        arrays.append(x.astype('float32') / 255)
+        arrays.append(y.astype('int32'))
+    return arrays
+
+
+def _load_raw_data(num_samples):
     dirname = 'cifar-10-batches-py'
     origin = 'https://www.cs.toronto.edu/~kriz/cifar-10-python.tar.gz'
     path = get_file(dirname, origin=origin, untar=True)
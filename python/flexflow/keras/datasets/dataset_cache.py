@@ -0,0 +1,73 @@
+"""Cache of the preprocessed datasets, stored as `.npy` files and
+returned as memory-mapped arrays.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from ..utils.data_utils import get_datadir
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+
+# Bump when the preprocessing of any dataset changes, so the stale
+# caches are rebuilt.
+CACHE_VERSION = 1
+
+
+def get_cache_path(name, params):
+    """Returns the directory caching the dataset `name` preprocessed with `params`.
+
+    # Arguments
+        name: name of the dataset.
+        params: dict of the arguments the preprocessed arrays depend on.
+
+    # Returns
+        Path of the cache directory, under `~/.keras/datasets/preprocessed`.
+    """
+    key = json.dumps(params, sort_keys=True)
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(get_datadir('datasets'), 'preprocessed',
+                        '%s-v%d-%s' % (name, CACHE_VERSION, digest))
+
+
+def load_preprocessed(name, params, array_names, build_fn):
+    """Loads the preprocessed arrays of a dataset from the cache.
+
+    The first call runs `build_fn` and saves its arrays as `.npy` files,
+    the later calls only map the files, so they take no time and no memory
+    until the arrays are read. The arrays are written into a temporary
+    directory which is then renamed, so a concurrent or interrupted run
+    never leaves a partial cache behind.
+
+    # Arguments
+        name: name of the dataset.
+        params: dict of the arguments the preprocessed arrays depend on.
+        array_names: names of the arrays returned by `build_fn`.
+        build_fn: function returning the preprocessed arrays, in the
+            order of `array_names`.
+
+    # Returns
+        List of read-only `np.memmap`, in the order of `array_names`.
+    """
+    path = get_cache_path(name, params)
+    fpaths = [os.path.join(path, array_name + '.npy') for array_name in array_names]
+    if not os.path.isdir(path):
+        arrays = build_fn()
+        assert len(arrays) == len(array_names), 'check the arrays of %s' % name
+        tmp_path = '%s.tmp%d' % (path, os.getpid())
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for array_name, array in zip(array_names, arrays):
+            np.save(os.path.join(tmp_path, array_name + '.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, 'params.json'), 'w') as f:
+            json.dump(params, f, sort_keys=True)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process cached the dataset first
+            shutil.rmtree(tmp_path)
+    return [np.load(fpath, mmap_mode='r') for fpath in fpaths]
@@ -4,20 +4,42 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from .dataset_cache import load_preprocessed
 from ..utils.data_utils import get_file
 import numpy as np
 
 
-def load_data(path='mnist.npz'):
+def load_data(path='mnist.npz', preprocessed=False):
     """Loads the MNIST dataset.
 
     # Arguments
         path: path where to cache the dataset locally
             (relative to ~/.keras/datasets).
+        preprocessed: if True, return the images as float32 `(N, 1, 28, 28)`
+            scaled to [0, 1] and the labels as int32 `(N, 1)`, read from a
+            memory-mapped cache which is built on the first call.
 
     # Returns
         Tuple of Numpy arrays: `(x_train, y_train), (x_test, y_test)`.
     """
+    if preprocessed:
+        x_train, y_train, x_test, y_test = load_preprocessed(
+            'mnist', {'path': path},
+            ['x_train', 'y_train', 'x_test', 'y_test'],
+            lambda: _preprocess(*_load_raw_data(path)))
+        return (x_train, y_train), (x_test, y_test)
+    return _load_raw_data(path)
+
+
+def _preprocess(train, test):
+    arrays = []
+    for x, y in [train, test]:
+        arrays.append(x.reshape(x.shape[0], 1, x.shape[1], x.shape[2]).astype('float32') / 255)
+        arrays.append(y.astype('int32').reshape(len(y), 1))
+    return arrays
+
+
+def _load_raw_data(path):
     path = get_file(path,
                     origin='https://s3.amazonaws.com/img-datasets/mnist.npz',
                     file_hash='8a61469f7ea1b51cbae51d4f78837e45')
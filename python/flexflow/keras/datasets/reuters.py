@@ -6,7 +6,8 @@ from __future__ import division
 from __future__ import print_function
 
 from ..utils.data_utils import get_file
-from ..preprocessing.sequence import _remove_long_seq
+from ..preprocessing.sequence import _remove_long_seq, RaggedSequences
+from .dataset_cache import load_preprocessed
 import numpy as np
 import json
 import warnings
@@ -14,7 +15,8 @@ import warnings
 
 def load_data(path='reuters.npz', num_words=None, skip_top=0,
               maxlen=None, test_split=0.2, seed=113,
-              start_char=1, oov_char=2, index_from=3, **kwargs):
+              start_char=1, oov_char=2, index_from=3, preprocessed=False,
+              **kwargs):
     """Loads the Reuters newswire classification dataset.
 
     # Arguments
@@ -32,6 +34,10 @@ def load_data(path='reuters.npz', num_words=None, skip_top=0,
         oov_char: words that were cut out because of the `num_words`
             or `skip_top` limit will be replaced with this character.
         index_from: index actual words with this index and higher.
+        preprocessed: if True, read the sequences from a memory-mapped
+            cache which is built on the first call for these arguments.
+            The sequences are int32 arrays and the labels are int32
+            `(N, 1)`.
 
     # Returns
         Tuple of Numpy arrays: `(x_train, y_train), (x_test, y_test)`.
@@ -50,6 +56,41 @@ def load_data(path='reuters.npz', num_words=None, skip_top=0,
     if kwargs:
         raise TypeError('Unrecognized keyword arguments: ' + str(kwargs))
 
+    args = (path, num_words, skip_top, maxlen, test_split, seed,
+            start_char, oov_char, index_from)
+    if preprocessed:
+        params = dict(zip(['path', 'num_words', 'skip_top', 'maxlen', 'test_split',
+                           'seed', 'start_char', 'oov_char', 'index_from'], args))
+        arrays = load_preprocessed(
+            'reuters', params,
+            ['x_train_values', 'x_train_offsets', 'y_train',
+             'x_test_values', 'x_test_offsets', 'y_test'],
+            lambda: _preprocess(*_load_raw_data(*args)))
+        x_train = _split_sequences(arrays[0], arrays[1])
+        x_test = _split_sequences(arrays[3], arrays[4])
+        return (x_train, arrays[2]), (x_test, arrays[5])
+    return _load_raw_data(*args)
+
+
+def _preprocess(train, test):
+    arrays = []
+    for xs, labels in [train, test]:
+        ragged = RaggedSequences.from_sequences(xs, dtype='int32')
+        arrays += [ragged.values, ragged.offsets, labels.astype('int32').reshape(len(labels), 1)]
+    return arrays
+
+
+def _split_sequences(values, offsets):
+    # views of the memory-mapped values, as the raw data returns one array per sequence
+    ragged = RaggedSequences(values, offsets)
+    xs = np.empty(len(ragged), dtype=object)
+    for i, x in enumerate(ragged):
+        xs[i] = x
+    return xs
+
+
+def _load_raw_data(path, num_words, skip_top, maxlen, test_split, seed,
+                   start_char, oov_char, index_from):
     path = get_file(path,
                     origin='https://s3.amazonaws.com/text-datasets/reuters.npz',
                     file_hash='87aedbeb0cb229e378797a632c1997b6')
@@ -90,6 +90,22 @@ class Layer(object):
     self._initialized = False
     self.has_visited = False
     
+  def get_config(self):
+    """Return the arguments of the constructor that rebuild this layer, see 
+    :func:`flexflow.keras.utils.generic_utils.serialize_keras_object`.
+    """
+    return {'name': self._name}
+
+  def _get_activation_config(self):
+    if self.activation == ff.ActiMode.AC_MODE_NONE:
+      return None
+    elif self.activation == ff.ActiMode.AC_MODE_RELU:
+      return 'relu'
+    elif self.activation == ff.ActiMode.AC_MODE_SIGMOID:
+      return 'sigmoid'
+    else:
+      assert 0, "unknown activation"
+
   def set_batch_size(self, size):
     if self.input_shape != None:
       lst = list(self.input_shape)
@@ -107,6 +107,21 @@ class Conv2D(Layer):
         self.input_shape = (0, input_shape[0], input_shape[1], input_shape[2])
     self.use_bias = use_bias
   
+  def get_config(self):
+    config = super(Conv2D, self).get_config()
+    if self.padding == "same":
+      padding = "same"
+    else:
+      padding = list(self.padding)
+    config.update({'filters': self.out_channels, 
+                   'kernel_size': list(self.kernel_size), 
+                   'strides': list(self.stride), 
+                   'padding': padding, 
+                   'groups': self.groups, 
+                   'activation': self._get_activation_config(), 
+                   'use_bias': self.use_bias})
+    return config
+
   def verify_meta_data(self):
     assert self.input_shape != (0, 0, 0, 0), "[Conv2D]: input shape is wrong"
     assert self.output_shape != (0, 0, 0, 0), "[Conv2D]: output shape is wrong"
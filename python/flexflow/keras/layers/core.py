@@ -81,6 +81,13 @@ class Dense(Layer):
     else:
       assert 0, "activation is not supported"
     
+  def get_config(self):
+    config = super(Dense, self).get_config()
+    config.update({'units': self.out_channels, 
+                   'activation': self._get_activation_config(), 
+                   'use_bias': self.use_bias})
+    return config
+
   def verify_meta_data(self):
     assert self.input_shape != (0, 0), "input shape is wrong"
     assert self.output_shape != (0, 0), "output shape is wrong"
@@ -176,6 +183,13 @@ class Embedding(Layer):
       self.embeddings_initializer = RandomUniform(random.randint(0,1024), -0.05, 0.05)
       
     super(Embedding, self).__init__("embedding", "Embedding", **kwargs) 
+
+  def get_config(self):
+    config = super(Embedding, self).get_config()
+    config.update({'input_dim': self.input_dim, 
+                   'output_dim': self.out_channels, 
+                   'input_length': self.input_length})
+    return config
       
   def verify_meta_data(self):
     pass
@@ -215,6 +229,11 @@ class Activation(Layer):
       assert 0, '[Activation]: unsupported activation'
       
     super(Activation, self).__init__(self.activation, 'Activation', **kwargs) 
+
+  def get_config(self):
+    config = super(Activation, self).get_config()
+    config['activation'] = self.activation
+    return config
       
   def verify_meta_data(self):
     pass
@@ -247,6 +266,11 @@ class Dropout(Layer):
     self.seed = _seed
       
     super(Dropout, self).__init__('dropout', 'Dropout', **kwargs) 
+
+  def get_config(self):
+    config = super(Dropout, self).get_config()
+    config['rate'] = self.rate
+    return config
       
   def verify_meta_data(self):
     pass
@@ -271,12 +295,17 @@ class Dropout(Layer):
 class Reshape(Layer):
   def __init__(self, target_shape, input_shape=None, **kwargs):
     #TODO: target shape does not support -1
-    self.target_shape = (0,) + target_shape
+    self.target_shape = (0,) + tuple(target_shape)
     # TODO: input shape should not contain batch size for now
     if input_shape != None:
-      self.input_shape = (0,) + input_shape
+      self.input_shape = (0,) + tuple(input_shape)
       
     super(Reshape, self).__init__('reshape', 'Reshape', **kwargs) 
+
+  def get_config(self):
+    config = super(Reshape, self).get_config()
+    config['target_shape'] = list(self.target_shape[1:])
+    return config
       
   def verify_meta_data(self):
     pass
@@ -21,8 +21,8 @@ from .input_layer import Input
 from flexflow.keras.models.tensor import Tensor
 
 class _Merge(Layer):
-  def __init__(self, default_name, layer_type):
-    super(_Merge, self).__init__(default_name, layer_type) 
+  def __init__(self, default_name, layer_type, **kwargs):
+    super(_Merge, self).__init__(default_name, layer_type, **kwargs) 
   
   def verify_meta_data(self):
    pass
@@ -64,6 +64,11 @@ class Concatenate(_Merge):
     super(Concatenate, self).__init__("concatenate", "Concatenate", **kwargs) 
     
     self.axis = axis
+
+  def get_config(self):
+    config = super(Concatenate, self).get_config()
+    config['axis'] = self.axis
+    return config
     
   def _calculate_inout_shape(self, input_tensors):
     if (input_tensors[0].num_dims == 2):
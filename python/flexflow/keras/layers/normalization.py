@@ -44,6 +44,15 @@ class BatchNormalization(Layer):
     self.center = center
     self.scale = scale
     
+  def get_config(self):
+    config = super(BatchNormalization, self).get_config()
+    config.update({'axis': self.axis, 
+                   'momentum': self.momentum, 
+                   'epsilon': self.epsilon, 
+                   'center': self.center, 
+                   'scale': self.scale})
+    return config
+
   def verify_meta_data(self):
     pass
     
@@ -44,6 +44,17 @@ class Pooling2D(Layer):
       assert 0, "[Pooling2D]: check padding"
     self.pool_type = pool_type
     
+  def get_config(self):
+    config = super(Pooling2D, self).get_config()
+    if self.padding == "same":
+      padding = "same"
+    else:
+      padding = list(self.padding)
+    config.update({'pool_size': list(self.kernel_size), 
+                   'strides': list(self.stride), 
+                   'padding': padding})
+    return config
+
   def verify_meta_data(self):
     assert self.input_shape != (0, 0, 0, 0), "input shape is wrong"
     assert self.output_shape != (0, 0, 0, 0), "output shape is wrong"
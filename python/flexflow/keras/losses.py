@@ -19,6 +19,9 @@ class Loss(object):
   def __init__(self, name=None):
     self.type = None
     self.name = name
+
+  def get_config(self):
+    return {'name': self.name}
     
 class CategoricalCrossentropy(Loss):
   def __init__(self,
@@ -20,6 +20,9 @@ class Metric(object):
     self.name = name
     self.dtype = dtype
     self.type = None
+
+  def get_config(self):
+    return {'name': self.name, 'dtype': self.dtype}
     
 class Accuracy(Metric):
   def __init__(self, 
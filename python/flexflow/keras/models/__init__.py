@@ -17,3 +17,4 @@ from .sequential import Sequential
 from .model import Model
 from .base_model import BaseModel
 from .tensor import Tensor
+from .saving import save_model, load_model, model_from_config
@@ -15,25 +15,546 @@
 
 import flexflow.core as ff
 from flexflow.core.flexflow_logger import fflogger
+import numpy as np
 
 from .tensor import Tensor
 from flexflow.keras.layers import Conv2D, Pooling2D, Flatten, Dense, Activation, Concatenate, Add, Subtract, Multiply, Dropout, BatchNormalization, Embedding, Reshape
 from flexflow.keras.optimizers import SGD, Adam
-from flexflow.keras.callbacks import Callback, LearningRateScheduler, VerifyMetrics, EpochVerifyMetrics
+from flexflow.keras.callbacks import Callback, History, LearningRateScheduler, VerifyMetrics, EpochVerifyMetrics
 from flexflow.keras import losses as keras_losses
 from flexflow.keras import metrics as keras_metrics
+from flexflow.keras.utils.data_utils import Sequence, OrderedEnqueuer, GeneratorEnqueuer
+from flexflow.keras.utils.generic_utils import serialize_keras_object, Progbar
 
 from PIL import Image
+import inspect
+from collections import OrderedDict, deque
+
+try:
+  from collections.abc import MutableMapping
+except ImportError:
+  from collections import MutableMapping
 
 tracing_id = 100
 
+# default limit of the bytes copied into zero-copy memory by the cached dataloaders of a model
+data_cache_max_bytes = 4 << 30
+
+# number of recent steps kept for the step time percentiles
+training_stats_window = 1000
+
+# number of progress bar updates per epoch, each of them waits for the issued steps
+progbar_updates_per_epoch = 20
+
+class EpochLogs(MutableMapping):
+  """The logs handed to the callbacks at the end of an epoch. The metrics of
+  the epoch are only waited on when the logs are first read, so callbacks
+  that ignore them do not stall the training pipeline.
+  """
+  def __init__(self, metrics_future, metrics, loss, num_samples, run_time, stats_values=None):
+    self._metrics_future = metrics_future
+    self._metrics = metrics
+    self._loss = loss
+    self._num_samples = num_samples
+    self._run_time = run_time
+    self._stats_values = stats_values
+    self._logs = None
+
+  def _get_logs(self):
+    if self._logs is None:
+      values = self._metrics_future.get().get_values()
+      logs = {}
+      for metric in self._metrics:
+        if metric.name in values:
+          logs[metric.name] = values[metric.name]
+      if self._loss != None and self._loss.name in logs:
+        logs['loss'] = logs[self._loss.name]
+      if self._run_time > 0:
+        logs['throughput'] = self._num_samples / self._run_time
+      if self._stats_values != None:
+        logs.update(self._stats_values)
+      self._logs = logs
+    return self._logs
+
+  def __getitem__(self, key):
+    return self._get_logs()[key]
+
+  def __setitem__(self, key, value):
+    self._get_logs()[key] = value
+
+  def __delitem__(self, key):
+    del self._get_logs()[key]
+
+  def __iter__(self):
+    return iter(self._get_logs())
+
+  def __len__(self):
+    return len(self._get_logs())
+
+  def __repr__(self):
+    return repr(self._get_logs())
+
+class TrainingStats(object):
+  """Timing statistics of the training steps, read by the progress bar, the
+  callbacks (``model.training_stats``) and the epoch logs.
+
+  The step and load times come from :meth:`FFModel.train_steps`. Legion runs
+  the steps asynchronously, so they are the times spent issuing each step,
+  which track the execution time once the pipeline is full; the percentiles
+  are taken over the last :attr:`window` steps. The wall time is measured
+  with :meth:`FFConfig.get_current_time`, which waits for the issued steps,
+  so it is only taken at progress bar updates and at the end of the epochs.
+  """
+  def __init__(self, batch_size, window=training_stats_window):
+    self._batch_size = batch_size
+    self._step_times = deque(maxlen=window)
+    self._load_times = deque(maxlen=window)
+    self.reset_epoch()
+
+  def reset_epoch(self):
+    """Start the totals of a new epoch, the percentile window is kept."""
+    self._num_steps = 0
+    self._total_step_time = 0.0
+    self._total_load_time = 0.0
+    self._wall_time = 0.0
+
+  def add_steps(self, step_times, load_times):
+    """Record the times (in microseconds) returned by :meth:`FFModel.train_steps`."""
+    self._step_times.extend(step_times)
+    self._load_times.extend(load_times)
+    self._num_steps += len(step_times)
+    self._total_step_time += 1e-6 * float(np.sum(step_times))
+    self._total_load_time += 1e-6 * float(np.sum(load_times))
+
+  def add_wall_time(self, run_time):
+    """Record the wall time (in seconds) taken by the steps of the epoch."""
+    self._wall_time += run_time
+
+  @property
+  def steps(self):
+    return self._num_steps
+
+  @property
+  def samples_per_sec(self):
+    if self._wall_time <= 0:
+      return 0.0
+    return self._num_steps * self._batch_size / self._wall_time
+
+  @property
+  def load_time(self):
+    return self._total_load_time
+
+  @property
+  def compute_time(self):
+    if self._wall_time > 0:
+      return max(self._wall_time - self._total_load_time, 0.0)
+    return self._total_step_time - self._total_load_time
+
+  def step_time_percentile(self, q):
+    """Return the q-th percentile of the recent step times, in milliseconds."""
+    if len(self._step_times) == 0:
+      return 0.0
+    return 1e-3 * float(np.percentile(np.fromiter(self._step_times, dtype=np.float64), q))
+
+  def get_values(self):
+    """Return the statistics of the epoch as a dict.
+
+    :returns:  dict -- steps, step_time_p50/p95/p99 (ms), samples_per_sec,
+               load_time and compute_time (s).
+    """
+    step_times = np.fromiter(self._step_times, dtype=np.float64)
+    if step_times.shape[0] > 0:
+      p50, p95, p99 = 1e-3 * np.percentile(step_times, [50, 95, 99])
+    else:
+      p50, p95, p99 = 0.0, 0.0, 0.0
+    return {'steps': self._num_steps,
+            'step_time_p50': float(p50),
+            'step_time_p95': float(p95),
+            'step_time_p99': float(p99),
+            'samples_per_sec': self.samples_per_sec,
+            'load_time': self.load_time,
+            'compute_time': self.compute_time}
+
+class EnqueuerDataLoader(object):
+  """Feeds the input and label tensors from a :class:`Sequence` or a generator
+  of ``(inputs, targets)`` batches. The batches are produced by an
+  :class:`OrderedEnqueuer` (or a :class:`GeneratorEnqueuer`) running on
+  :attr:`workers` threads or processes, so the preprocessing of the next
+  batches overlaps with the training step. Like ``ff.MemmapDataLoader`` it is
+  not backed by a native dataloader, ``FFModel.train_steps`` calls
+  :meth:`fill_next_batch` ahead of the steps. The :attr:`stagers` are owned by
+  the model and reused by every call, only full batches are staged. The partial
+  last batch of a :class:`Sequence`, of :attr:`partial_batch_size` samples, is
+  skipped once per pass over the sequence, any other batch size is an error.
+  """
+  def __init__(self, stagers, data, steps, shuffle=False,
+               max_queue_size=10, workers=1, use_multiprocessing=False,
+               partial_batch_size=None):
+    self.handle = None
+    self.batch_size = stagers[0].batch_tensor.dims[0]
+    self.num_samples = steps * self.batch_size
+    self.partial_batch_size = partial_batch_size
+    self._stagers = stagers
+    # the sequences yield len(data) batches per pass, one of them partial
+    self._pass_length = len(data) if isinstance(data, Sequence) else 0
+    self._pass_position = 0
+    self._skipped_in_pass = False
+    self._enqueuer = None
+    if workers > 0:
+      if isinstance(data, Sequence):
+        self._enqueuer = OrderedEnqueuer(data, use_multiprocessing=use_multiprocessing, shuffle=shuffle)
+      else:
+        self._enqueuer = GeneratorEnqueuer(data, use_multiprocessing=use_multiprocessing)
+      self._enqueuer.start(workers=workers, max_queue_size=max_queue_size)
+      self._output = self._enqueuer.get()
+    elif isinstance(data, Sequence):
+      self._output = self.__iter_sequence(data, shuffle)
+    else:
+      self._output = data
+
+  def __iter_sequence(self, sequence, shuffle):
+    while True:
+      order = np.arange(len(sequence))
+      if shuffle == True:
+        np.random.shuffle(order)
+      for idx in order:
+        yield sequence[idx]
+      sequence.on_epoch_end()
+
+  def reset(self):
+    # the enqueuer streams across epochs, there is nothing to rewind
+    pass
+
+  @property
+  def stagers(self):
+    return self._stagers
+
+  @property
+  def num_buffers(self):
+    return min(stager.num_buffers for stager in self._stagers)
+
+  def __next_batch_of_pass(self):
+    batch = next(self._output)
+    if self._pass_length > 0:
+      if self._pass_position == 0:
+        self._skipped_in_pass = False
+      self._pass_position = (self._pass_position + 1) % self._pass_length
+    return batch
+
+  def fill_next_batch(self):
+    while True:
+      batch = self.__next_batch_of_pass()
+      assert len(batch) == 2, "the batches should be (inputs, targets) tuples, sample_weights is not supported"
+      inputs, targets = batch
+      if isinstance(inputs, (list, tuple)) == False:
+        inputs = [inputs]
+      if len(targets) == self.batch_size:
+        break
+      if len(targets) == self.partial_batch_size and self._skipped_in_pass == False:
+        # the stagers cannot take the partial last batch of the sequence
+        self._skipped_in_pass = True
+        continue
+      raise ValueError("expected batches of %d samples (the batch size of the model), got %d" %(self.batch_size, len(targets)))
+    assert len(inputs) + 1 == len(self._stagers), "check len of input tensors"
+    for stager, np_array in zip(self._stagers, list(inputs) + [targets]):
+      stager.fill(np.asarray(np_array))
+
+  def next_batch(self, ffmodel):
+    self.fill_next_batch()
+    for stager in self._stagers:
+      stager.commit()
+
+  def close(self):
+    if self._enqueuer != None:
+      self._enqueuer.stop()
+      self._enqueuer = None
+
+class DataLoaderCache(object):
+  """Keeps the dataloaders created from numpy arrays across calls of
+  :meth:`BaseModel.fit`, :meth:`BaseModel.evaluate` and :meth:`BaseModel.predict`,
+  so passing the same arrays again does not copy the dataset again. The entries
+  are keyed on the buffer address, shape, dtype and strides of the array and on
+  the batch tensor it feeds. The arrays are assumed not to be modified in place,
+  call :meth:`clear` otherwise. Once the cached datasets hold more than
+  :attr:`max_bytes`, the least recently used ones that are not used by the
+  current call are released.
+  """
+  def __init__(self, max_bytes):
+    self.max_bytes = max_bytes
+    self.pinned_bytes = 0
+    self._entries = OrderedDict()
+    self._in_use = set()
+
+  def _get_key(self, np_array, batch_tensor):
+    interface = np_array.__array_interface__
+    return (interface['data'][0], np_array.shape, np_array.dtype.str, interface['strides'], id(batch_tensor))
+
+  def lookup(self, np_array, batch_tensor):
+    key = self._get_key(np_array, batch_tensor)
+    entry = self._entries.pop(key, None)
+    if entry == None:
+      return None
+    self._entries[key] = entry
+    self._in_use.add(key)
+    return entry[1], entry[2]
+
+  def insert(self, np_array, batch_tensor, full_tensor, dataloader):
+    key = self._get_key(np_array, batch_tensor)
+    # holding the array keeps its buffer address from being reused by another array
+    self._entries[key] = (np_array, full_tensor, dataloader, np_array.nbytes)
+    self._in_use.add(key)
+    self.pinned_bytes += np_array.nbytes
+
+  def evict(self, ffmodel):
+    for key in list(self._entries.keys()):
+      if self.pinned_bytes <= self.max_bytes:
+        break
+      if key not in self._in_use:
+        self.__release(ffmodel, key)
+    self._in_use = set()
+
+  def clear(self, ffmodel):
+    for key in list(self._entries.keys()):
+      self.__release(ffmodel, key)
+    self._in_use = set()
+
+  def __release(self, ffmodel, key):
+    np_array, full_tensor, dataloader, nbytes = self._entries.pop(key)
+    dataloader.release(ffmodel)
+    self.pinned_bytes -= nbytes
+
+def _create_activation(model, layer):
+  if layer.activation == 'softmax':
+    assert layer.layer_id == model._nb_layers-1, "softmax is not in the last layer"
+    return model._ffmodel.softmax(layer.input_tensors[0].ffhandle)
+  elif layer.activation == 'relu':
+    return model._ffmodel.relu(layer.input_tensors[0].ffhandle)
+  elif layer.activation == 'sigmoid':
+    return model._ffmodel.sigmoid(layer.input_tensors[0].ffhandle)
+  elif layer.activation == 'tanh':
+    return model._ffmodel.tanh(layer.input_tensors[0].ffhandle)
+  elif layer.activation == 'elu':
+    return model._ffmodel.elu(layer.input_tensors[0].ffhandle)
+  else:
+    assert 0, "unknown activation"
+
+def _create_concatenate(model, layer):
+  t_ffhandle_list = []
+  for t in layer.input_tensors:
+    t_ffhandle_list.append(t.ffhandle)
+  return model._ffmodel.concat(t_ffhandle_list, layer.axis)
+
+def _create_conv2d(model, layer):
+  return model._ffmodel.conv2d(layer.input_tensors[0].ffhandle, layer.out_channels, layer.kernel_size[0], layer.kernel_size[1], layer.stride[0], layer.stride[1], layer.padding[0], layer.padding[1], layer.activation, layer.groups, layer.use_bias, None, layer.kernel_initializer.ffhandle, layer.bias_initializer.ffhandle)
+
+def _create_pooling2d(model, layer):
+  return model._ffmodel.pool2d(layer.input_tensors[0].ffhandle, layer.kernel_size[1], layer.kernel_size[0], layer.stride[0], layer.stride[1], layer.padding[0], layer.padding[1], layer.pool_type)
+
+def _create_flatten(model, layer):
+  return model._ffmodel.flat(layer.input_tensors[0].ffhandle)
+
+def _create_dense(model, layer):
+  return model._ffmodel.dense(layer.input_tensors[0].ffhandle, layer.out_channels, layer.activation, layer.use_bias, None, layer.kernel_initializer.ffhandle, layer.bias_initializer.ffhandle)
+
+def _create_add(model, layer):
+  return model._ffmodel.add(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
+
+def _create_subtract(model, layer):
+  return model._ffmodel.subtract(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
+
+def _create_multiply(model, layer):
+  return model._ffmodel.multiply(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
+
+def _create_dropout(model, layer):
+  return model._ffmodel.dropout(layer.input_tensors[0].ffhandle, layer.rate, layer.seed)
+
+def _create_batch_normalization(model, layer):
+  return model._ffmodel.batch_norm(layer.input_tensors[0].ffhandle)
+
+def _create_embedding(model, layer):
+  return model._ffmodel.embedding(layer.input_tensors[0].ffhandle, layer.input_dim, layer.out_channels, ff.AggrMode.AGGR_MODE_SUM, None, layer.embeddings_initializer.ffhandle)
+
+def _create_reshape(model, layer):
+  return model._ffmodel.reshape(layer.input_tensors[0].ffhandle, layer.output_shape)
+
+# layer type -> function adding the layer to the FFModel, see BaseModel._create_flexflow_layers
+_layer_builders = {
+  Activation: _create_activation,
+  Concatenate: _create_concatenate,
+  Conv2D: _create_conv2d,
+  Pooling2D: _create_pooling2d,
+  Flatten: _create_flatten,
+  Dense: _create_dense,
+  Add: _create_add,
+  Subtract: _create_subtract,
+  Multiply: _create_multiply,
+  Dropout: _create_dropout,
+  BatchNormalization: _create_batch_normalization,
+  Embedding: _create_embedding,
+  Reshape: _create_reshape,
+}
+
+def _get_layer_builder(layer):
+  layer_type = type(layer)
+  builder = _layer_builders.get(layer_type)
+  if builder == None:
+    # subclasses (e.g. MaxPooling2D) use the builder of their closest registered base
+    for base in layer_type.__mro__[1:]:
+      if base in _layer_builders:
+        builder = _layer_builders[base]
+        _layer_builders[layer_type] = builder
+        break
+  return builder
+
+def _get_num_elements(shape):
+  # elements of one sample, the batch dimension is skipped
+  num_elements = 1
+  for dim in shape[1:]:
+    num_elements *= dim
+  return num_elements
+
+# The cost functions return (parameters, forward FLOPs, backward FLOPs) of one
+# sample. A multiply-add counts as 2 FLOPs and an element-wise op as 1 FLOP per
+# element. The backward pass of a layer with weights computes the gradients of
+# both its input and its weights, so it costs twice its forward pass.
+def _get_dense_cost(layer):
+  out_elements = _get_num_elements(layer.output_shape)
+  params = layer.in_channels * layer.out_channels
+  flops = 2 * layer.in_channels * out_elements
+  if layer.use_bias == True:
+    params += layer.out_channels
+    flops += out_elements
+  if layer.activation != ff.ActiMode.AC_MODE_NONE:
+    flops += out_elements
+  return params, flops, 2 * flops
+
+def _get_conv2d_cost(layer):
+  out_elements = _get_num_elements(layer.output_shape)
+  kernel_elements = layer.in_channels // layer.groups * layer.kernel_size[0] * layer.kernel_size[1]
+  params = kernel_elements * layer.out_channels
+  flops = 2 * kernel_elements * out_elements
+  if layer.use_bias == True:
+    params += layer.out_channels
+    flops += out_elements
+  if layer.activation != ff.ActiMode.AC_MODE_NONE:
+    flops += out_elements
+  return params, flops, 2 * flops
+
+def _get_pooling2d_cost(layer):
+  flops = layer.kernel_size[0] * layer.kernel_size[1] * _get_num_elements(layer.output_shape)
+  return 0, flops, flops
+
+def _get_embedding_cost(layer):
+  # the looked up rows are summed, no gradient flows to the input
+  params = layer.input_dim * layer.out_channels
+  flops = layer.input_length * layer.out_channels
+  return params, flops, flops
+
+def _get_batch_normalization_cost(layer):
+  # scale and bias per channel, the running statistics are not trained
+  params = 2 * layer.output_shape[1]
+  flops = 4 * _get_num_elements(layer.output_shape)
+  return params, flops, 2 * flops
+
+def _get_element_wise_cost(layer):
+  flops = _get_num_elements(layer.output_shape)
+  return 0, flops, flops
+
+def _get_data_movement_cost(layer):
+  return 0, 0, 0
+
+# layer type -> function computing the cost of one sample, see BaseModel.summary
+_layer_costs = {
+  Activation: _get_element_wise_cost,
+  Concatenate: _get_data_movement_cost,
+  Conv2D: _get_conv2d_cost,
+  Pooling2D: _get_pooling2d_cost,
+  Flatten: _get_data_movement_cost,
+  Dense: _get_dense_cost,
+  Add: _get_element_wise_cost,
+  Subtract: _get_element_wise_cost,
+  Multiply: _get_element_wise_cost,
+  Dropout: _get_element_wise_cost,
+  BatchNormalization: _get_batch_normalization_cost,
+  Embedding: _get_embedding_cost,
+  Reshape: _get_data_movement_cost,
+}
+
+def _get_layer_cost(layer):
+  layer_type = type(layer)
+  cost_fn = _layer_costs.get(layer_type)
+  if cost_fn == None:
+    for base in layer_type.__mro__[1:]:
+      if base in _layer_costs:
+        cost_fn = _layer_costs[base]
+        _layer_costs[layer_type] = cost_fn
+        break
+  if cost_fn == None:
+    fflogger.warning("[%s]: unknown cost of layer type %s" %(layer.name, layer_type.__name__))
+    return 0, 0, 0
+  return cost_fn(layer)
+
+_data_type_sizes = {
+  ff.DataType.DT_FLOAT: 4,
+  ff.DataType.DT_DOUBLE: 8,
+  ff.DataType.DT_INT32: 4,
+  ff.DataType.DT_INT64: 8,
+}
+
+class ModelSummary(dict):
+  """The result of :meth:`BaseModel.summary`: a dict with the keys ``layers`` 
+  (one dict per layer), ``totals``, ``batch_size`` and ``num_gpus``. Printing it 
+  prints the summary table.
+  """
+  __slots__ = ['_lines']
+  def __init__(self, lines, **kwargs):
+    super(ModelSummary, self).__init__(**kwargs)
+    self._lines = lines
+
+  def __str__(self):
+    return "\n".join(self._lines)
+
+def _format_row(fields, positions):
+  line = ''
+  for i in range(len(fields)):
+    if i > 0:
+      line = line[:-1] + ' '
+    line += str(fields[i])
+    line = line[:positions[i]]
+    line += ' ' * (positions[i] - len(line))
+  return line
+
+def _format_count(count):
+  for unit in ['', 'K', 'M', 'G', 'T']:
+    if abs(count) < 1000:
+      break
+    count /= 1000.0
+  if unit == '':
+    return '%d' %(count)
+  return '%.2f%s' %(count, unit)
+
+def _format_bytes(nbytes):
+  for unit in ['B', 'KiB', 'MiB', 'GiB']:
+    if nbytes < 1024:
+      break
+    nbytes /= 1024.0
+  if unit == 'B':
+    return '%dB' %(nbytes)
+  return '%.2f%s' %(nbytes, unit)
+
+def _format_time(forward_time, backward_time):
+  if forward_time == None:
+    return '-'
+  return '%.3f/%.3f' %(forward_time, backward_time)
+
 class BaseModel(object):
   __slots__ = ['_ffconfig', '_ffmodel', '_ffoptimizer', '_layers', '_nb_layers', \
                '_input_layers', '_input_tensors', '_output_tensor', '_label_tensor', \
                '_full_input_tensors', '_full_label_tensor', '_num_samples',\
                '_input_dataloaders', '_input_dataloaders_dim', \
                '_label_dataloader', '_label_dataloader_dim', \
-               '_loss', '_metrics', '_label_type', '__tracing_id']
+               '_loss', '_metrics', '_label_type', '_data_cache', '_layers_by_name', '_comp_mode', \
+               '_training_stats', '__tracing_id']
   def __init__(self, name):
     self._ffconfig = ff.FFConfig()
     print("Python API batchSize(%d) workersPerNodes(%d) numNodes(%d)" %(self._ffconfig.batch_size, self._ffconfig.workers_per_node, self._ffconfig.num_nodes))
@@ -58,11 +579,24 @@ class BaseModel(object):
     self._metrics = []
     self._label_type = ff.DataType.DT_FLOAT
     self._layer_inited = False
+    self._data_cache = DataLoaderCache(data_cache_max_bytes)
+    self._batch_stagers = None
+    self._layers_by_name = None
+    self._comp_mode = None
+    self._training_stats = TrainingStats(self._ffconfig.batch_size)
 
     global tracing_id
     self.__tracing_id = tracing_id
     tracing_id += 1
 
+  @property
+  def data_cache(self):
+    return self._data_cache
+
+  @property
+  def training_stats(self):
+    return self._training_stats
+
   @property
   def input(self):
     return self._input_tensors
@@ -98,32 +632,156 @@ class BaseModel(object):
     else:
       if not name:
         raise ValueError('Provide either a layer name or layer index.')
+    if self._layers_by_name == None or self._layers_by_name[1] != self._nb_layers:
+      self.__build_layer_index()
+    layer = self._layers_by_name[0].get(name)
+    if layer == None:
+      raise ValueError('No such layer: ' + name)
+    return layer
+
+  def __build_layer_index(self):
+    # names are not unique, the first layer of a name wins as with a linear scan
+    layers_by_name = {}
     for layer in self._layers:
-      if (layer.name == name):
-        return layer
-    raise ValueError('No such layer: ' + name)
-
-  # TODO: finish API
-  def summary(self, line_length=None, positions=None, print_fn=None):
-    if line_length != None:
-      assert 0, "line_length is not supported"
-    if print_fn != None:
-      assert 0, "print_fn is not supported"
+      if layer.name not in layers_by_name:
+        layers_by_name[layer.name] = layer
+    self._layers_by_name = (layers_by_name, self._nb_layers)
 
-    model_summary = "Layer (type)\t\tOutput Shape\t\tInput Shape\tConnected to\n"
-    for layer in self._input_layers:
-      layer_summary = layer.get_summary()
-      model_summary += layer_summary
+  def get_config(self):
+    """Describe the layer graph: the input layers, the config of every layer in 
+    order with the layers producing its inputs, and the output layer.
+    
+    :returns:  dict -- the config, it can be serialized to JSON.
+    """
+    layer_ids = {}
+    for idx, layer in enumerate(self._input_layers):
+      layer_ids[id(layer)] = ['input', idx]
+    for idx, layer in enumerate(self._layers):
+      layer_ids[id(layer)] = ['layer', idx]
+    input_configs = []
+    for layer, tensor in zip(self._input_layers, self._input_tensors):
+      input_configs.append({'name': layer.name, 
+                            'shape': list(tensor.batch_shape[1:]), 
+                            'dtype': tensor.dtype_str})
+    layer_configs = []
     for layer in self._layers:
+      layer_config = serialize_keras_object(layer)
+      layer_config['inbound_layers'] = [layer_ids[id(t.from_layer)] for t in layer.input_tensors]
+      layer_configs.append(layer_config)
+    return {'name': self._name, 
+            'input_layers': input_configs, 
+            'layers': layer_configs, 
+            'output_layer': layer_ids[id(self._output_tensor.from_layer)][1]}
+
+  def save(self, filepath, overwrite=True):
+    """Save the model into the directory :attr:`filepath`, so that 
+    :func:`flexflow.keras.models.load_model` can restore it without building 
+    and searching it again. See :func:`flexflow.keras.models.save_model`.
+    """
+    from .saving import save_model
+    save_model(self, filepath, overwrite)
+
+  def summary(self, line_length=None, positions=None, print_fn=None, measure_runtime=False):
+    """Summarize the cost of every layer at the batch size of the FFConfig: the 
+    number of parameters, the forward and backward FLOPs, the bytes of its 
+    output activations and, once the model is compiled, the forward and 
+    backward time in ms simulated under the ParallelConfig of the layer 
+    (measured by :meth:`FFModel.measure_operator_costs`).
+             
+    :param line_length: total length of the printed lines.
+    :type line_length: int
+    
+    :param positions: relative or absolute positions of the column ends.
+    :type positions: list
+    
+    :param print_fn: function called with each line of the table, e.g. 
+      ``fflogger.info``. The table is not printed if it is None.
+    :type print_fn: function
+    
+    :param measure_runtime: whether to simulate the layers of a compiled model. 
+      It runs a GPU task which allocates the simulator work space in the 
+      framebuffer (set with :attr:`--simulator-workspace-size`), so it is off by default.
+    :type measure_runtime: bool
+             
+    :returns:  ModelSummary -- the per layer costs and their totals, printing 
+      it prints the table.
+    """
+    if line_length == None:
+      line_length = 128
+    if positions == None:
+      positions = [.22, .37, .45, .60, .72, .86, 1.]
+    if positions[-1] <= 1:
+      positions = [int(line_length * p) for p in positions]
+    batch_size = self._ffconfig.batch_size
+
+    costs = None
+    if measure_runtime == True and self._ffmodel != None:
+      costs = self._ffmodel.measure_operator_costs()
+
+    layer_summaries = []
+    for layer in self._input_layers + self._layers:
       fflogger.debug(str(layer))
       for prev_layer in layer.prev_layers:
         fflogger.debug("\tprev: %s" %( str(prev_layer)))
       for next_layer in layer.next_layers:
         fflogger.debug("\tnext: %s" %( str(next_layer)))
-      layer_summary = layer.get_summary()
-      model_summary += layer_summary
+      if layer in self._input_layers:
+        params, forward_flops, backward_flops = 0, 0, 0
+      else:
+        params, forward_flops, backward_flops = _get_layer_cost(layer)
+      dtype = layer.output_tensors[0].dtype
+      layer_summary = {
+        'name': layer.name,
+        'type': type(layer).__name__,
+        'output_shape': (batch_size,) + tuple(layer.output_shape[1:]),
+        'params': params,
+        'forward_flops': forward_flops * batch_size,
+        'backward_flops': backward_flops * batch_size,
+        'activation_bytes': _get_num_elements(layer.output_shape) * batch_size * _data_type_sizes[dtype],
+        'forward_time': None,
+        'backward_time': None,
+        'num_parts': None,
+        'connected_to': [prev_layer.name for prev_layer in layer.prev_layers],
+      }
+      if costs != None and layer not in self._input_layers:
+        layer_summary.update(costs[layer.layer_id])
+        del layer_summary['memory_requirement']
+      layer_summaries.append(layer_summary)
 
-    return model_summary
+    totals = {}
+    for key in ['params', 'forward_flops', 'backward_flops', 'activation_bytes']:
+      totals[key] = sum(layer_summary[key] for layer_summary in layer_summaries)
+    for key in ['forward_time', 'backward_time']:
+      times = [layer_summary[key] for layer_summary in layer_summaries if layer_summary[key] != None]
+      totals[key] = sum(times) if len(times) > 0 else None
+
+    lines = ['_' * line_length]
+    lines.append(_format_row(['Layer (type)', 'Output Shape', 'Param #', 'FLOPs (fwd/bwd)', 'Activations', 'Time ms (fwd/bwd)', 'Connected to'], positions))
+    lines.append('=' * line_length)
+    for layer_summary in layer_summaries:
+      lines.append(_format_row([
+        '%s (%s)' %(layer_summary['name'], layer_summary['type']),
+        layer_summary['output_shape'],
+        _format_count(layer_summary['params']),
+        '%s/%s' %(_format_count(layer_summary['forward_flops']), _format_count(layer_summary['backward_flops'])),
+        _format_bytes(layer_summary['activation_bytes']),
+        _format_time(layer_summary['forward_time'], layer_summary['backward_time']),
+        ', '.join(layer_summary['connected_to'])], positions))
+    lines.append('=' * line_length)
+    lines.append('Batch size: %d' %(batch_size))
+    lines.append('Total params: %s' %(_format_count(totals['params'])))
+    lines.append('Total FLOPs: %s forward, %s backward' %(_format_count(totals['forward_flops']), _format_count(totals['backward_flops'])))
+    lines.append('Total activations: %s' %(_format_bytes(totals['activation_bytes'])))
+    if totals['forward_time'] != None:
+      lines.append('Simulated time: %.3f ms forward, %.3f ms backward' %(totals['forward_time'], totals['backward_time']))
+    lines.append('_' * line_length)
+    if print_fn != None:
+      for line in lines:
+        print_fn(line)
+
+    return ModelSummary(lines, layers=layer_summaries, totals=totals,
+                        batch_size=batch_size,
+                        num_gpus=self._ffconfig.workers_per_node * self._ffconfig.num_nodes)
 
   #TODO: finish API
   def compile(self,
@@ -145,6 +803,8 @@ class BaseModel(object):
     assert loss != None, "loss is None"
     if isinstance(loss, keras_losses.Loss) == True:
       self._loss = loss
+      if isinstance(loss, keras_losses.SparseCategoricalCrossentropy) == True:
+        self._label_type = ff.DataType.DT_INT32
     elif loss == 'categorical_crossentropy':
       self._loss = keras_losses.CategoricalCrossentropy()
     elif loss == 'sparse_categorical_crossentropy':
@@ -175,6 +835,10 @@ class BaseModel(object):
       else:
         assert 0, 'Unsupported metric'
 
+    if self._ffmodel != None:
+      self._data_cache.clear(self._ffmodel)
+    # the stagers feed the batch tensors of the previous model
+    self._batch_stagers = None
     self._ffmodel = ff.FFModel(self._ffconfig)
     self._create_input_tensors()
     self._create_flexflow_layers()
@@ -183,6 +847,7 @@ class BaseModel(object):
     self._verify_input_tensors()
 
     self._ffoptimizer = optimizer
+    self._comp_mode = comp_mode
     self._create_optimizer()
     metrics_type = []
     for metric in self._metrics:
@@ -218,30 +883,29 @@ class BaseModel(object):
       assert 0, "validation_split is not supported"
     if validation_data != None:
       assert 0, "validation_data is not supported"
-    if shuffle != True:
-      assert 0, "shuffle is not supported"
     if class_weight != None:
       assert 0, "class_weight is not supported"
     if sample_weight != None:
       assert 0, "sample_weight is not supported"
     if initial_epoch != 0:
       assert 0, "initial_epoch is not supported"
-    if steps_per_epoch != None:
-      assert 0, "steps_per_epoch is not supported"
     if validation_steps != None:
       assert 0, "validation_steps is not supported"
     if validation_batch_size != None:
       assert 0, "validation_batch_size is not supported"
     if validation_freq != 1:
       assert 0, "validation_freq is not supported"
-    if max_queue_size != 10:
-      assert 0, "max_queue_size is not supported"
-    if workers != 1:
-      assert 0, "workers is not supported"
-    if use_multiprocessing != False:
-      assert 0, "use_multiprocessing is not supported"
 
     assert self._output_tensor.ffhandle != None, "tensor is not init"
+    if self._is_batch_source(x) == True:
+      assert y == None, "y should not be given when x is a Sequence or a generator"
+      dataloader = self._create_enqueuer_data_loader(x, steps_per_epoch, shuffle, max_queue_size, workers, use_multiprocessing)
+      try:
+        return self._train(epochs, callbacks, eval=False, verbose=verbose)
+      finally:
+        dataloader.close()
+    if steps_per_epoch != None:
+      assert 0, "steps_per_epoch is only supported for Sequence or generator inputs"
     if (isinstance(x, list) == False):
       input_tensors = [x]
     else:
@@ -249,10 +913,16 @@ class BaseModel(object):
     label_tensor = y
     self._verify_tensors(input_tensors, label_tensor)
     self._create_data_loaders(input_tensors, label_tensor)
+    if shuffle == True:
+      # inputs and labels must draw the same permutation every epoch,
+      # the memory-mapped inputs only shuffle within their resident chunks
+      seed = np.random.randint(0, 2**31-1)
+      for dataloader in self._input_dataloaders + [self._label_dataloader]:
+        dataloader.set_shuffle(self._ffmodel, True, seed)
     if self._layer_inited == False:
       self._ffmodel.init_layers()
       self._layer_inited = True
-    self._train(epochs, callbacks, eval=False)
+    return self._train(epochs, callbacks, eval=False, verbose=verbose)
 
   def evaluate(self,
                x=None,
@@ -269,17 +939,73 @@ class BaseModel(object):
     if batch_size != None:
       assert self._ffconfig.batch_size == batch_size, "batch size is not correct use -b to set it"
     assert self._output_tensor.ffhandle != None, "tensor is not init"
+    if self._is_batch_source(x) == True:
+      assert y == None, "y should not be given when x is a Sequence or a generator"
+      dataloader = self._create_enqueuer_data_loader(x, steps, False, max_queue_size, workers, use_multiprocessing)
+      try:
+        history = self._train(1, callbacks, eval=True, verbose=verbose)
+      finally:
+        dataloader.close()
+    else:
+      if (isinstance(x, list) == False):
+        input_tensors = [x]
+      else:
+        input_tensors = x
+      label_tensor = y
+      self._verify_tensors(input_tensors, label_tensor)
+      self._create_data_loaders(input_tensors, label_tensor)
+      if self._layer_inited == False:
+        self._ffmodel.init_layers()
+        self._layer_inited = True
+      history = self._train(1, callbacks, eval=True, verbose=verbose)
+    logs = {}
+    for key in history.history:
+      logs[key] = history.history[key][-1]
+    if return_dict == True:
+      return logs
+    return [logs[key] for key in ['loss'] + [metric.name for metric in self._metrics] if key in logs]
+
+  def predict(self,
+              x,
+              batch_size=None,
+              verbose=0,
+              steps=None,
+              callbacks=None,
+              max_queue_size=10,
+              workers=1,
+              use_multiprocessing=False):
+    if batch_size != None:
+      assert self._ffconfig.batch_size == batch_size, "batch size is not correct use -b to set it"
+    if callbacks != None:
+      assert 0, "callbacks is not supported"
+    if max_queue_size != 10:
+      assert 0, "max_queue_size is not supported"
+    if workers != 1:
+      assert 0, "workers is not supported"
+    if use_multiprocessing != False:
+      assert 0, "use_multiprocessing is not supported"
+    assert self._output_tensor.ffhandle != None, "tensor is not init"
     if (isinstance(x, list) == False):
       input_tensors = [x]
     else:
       input_tensors = x
-    label_tensor = y
-    self._verify_tensors(input_tensors, label_tensor)
-    self._create_data_loaders(input_tensors, label_tensor)
-    if self._layer_inited == False:
-      self._ffmodel.init_layers()
-      self._layer_inited = True
-    self._train(1, callbacks, eval=True)
+    assert len(input_tensors) == len(self._input_tensors), "check len of input tensors"
+    self._num_samples = input_tensors[0].shape[0]
+    dataloaders = []
+    streamed = any(isinstance(np_array, np.memmap) for np_array in input_tensors)
+    try:
+      for idx, (np_array, t) in enumerate(zip(input_tensors, self._input_tensors)):
+        assert np_array.dtype == t.dtype_str, "check input dtype"
+        full_tensor, dataloader = self.__create_single_data_loader(idx, np_array, streamed)
+        dataloaders.append(dataloader)
+      self._data_cache.evict(self._ffmodel)
+      if self._layer_inited == False:
+        self._ffmodel.init_layers()
+        self._layer_inited = True
+      self.__tracing_id += 1
+      return self._ffmodel.predict(dataloaders, self._output_tensor.ffhandle, steps, self.__tracing_id)
+    finally:
+      self._close_streamed_data_loaders(dataloaders)
 
   def _create_input_tensor(self, idx):
     assert self._input_tensors[idx].batch_shape[0] != 0, "batch size is not set"
@@ -326,10 +1052,40 @@ class BaseModel(object):
     else:
       assert 0, "unknown optimizer"
 
-  def __create_single_data_loader(self, batch_tensor, full_array):
+  def _get_batch_stagers(self):
+    # one stager per input tensor and one for the label tensor, created once per
+    # compiled model and shared by the streamed and the enqueuer dataloaders
+    if self._batch_stagers == None:
+      batch_tensors = [t.ffhandle for t in self._input_tensors] + [self._label_tensor.ffhandle]
+      self._batch_stagers = [batch_tensor.create_batch_stager(self._ffmodel, num_buffers=4) for batch_tensor in batch_tensors]
+    return self._batch_stagers
+
+  def _close_streamed_data_loaders(self, dataloaders):
+    # stop the prefetching threads, the pinned dataloaders stay in the data cache
+    for dataloader in dataloaders:
+      if isinstance(dataloader, ff.MemmapDataLoader):
+        dataloader.close()
+
+  def __create_single_data_loader(self, tensor_idx, full_array, streamed):
+    # tensor_idx indexes the input tensors, len(self._input_tensors) is the label tensor
+    if tensor_idx < len(self._input_tensors):
+      batch_tensor = self._input_tensors[tensor_idx]
+    else:
+      batch_tensor = self._label_tensor
     array_shape = full_array.shape
     num_dim = len(array_shape)
     print("dataloader type:", full_array.dtype)
+    if streamed:
+      # stream memory-mapped arrays instead of pinning all of them
+      dataloader = ff.MemmapDataLoader(self._ffmodel, batch_tensor.ffhandle, full_array,
+                                       stager=self._get_batch_stagers()[tensor_idx])
+      return None, dataloader
+    cached = self._data_cache.lookup(full_array, batch_tensor)
+    if cached != None:
+      full_tensor, dataloader = cached
+      # undo the shuffling of a previous fit
+      dataloader.set_shuffle(self._ffmodel, False)
+      return full_tensor, dataloader
     if (full_array.dtype == "float32"):
       datatype = ff.DataType.DT_FLOAT
     elif (full_array.dtype == "int32"):
@@ -347,6 +1103,7 @@ class BaseModel(object):
     full_tensor.ffhandle.attach_numpy_array(self._ffconfig, full_array)
     dataloader = ff.SingleDataLoader(self._ffmodel, batch_tensor.ffhandle, full_tensor.ffhandle, self._num_samples, datatype)
     full_tensor.ffhandle.detach_numpy_array(self._ffconfig)
+    self._data_cache.insert(full_array, batch_tensor, full_tensor, dataloader)
 
     return full_tensor, dataloader
 
@@ -358,70 +1115,149 @@ class BaseModel(object):
     assert len(self._input_tensors) != 0, "input_tensor is not set"
     assert self._label_tensor != 0, "label_tensor is not set"
 
+    self._close_streamed_data_loaders(self._input_dataloaders + [self._label_dataloader])
+    self._full_input_tensors = []
+    self._input_dataloaders = []
+    self._input_dataloaders_dim = []
+    # the inputs and the label are either all streamed or all pinned,
+    # so that they draw the same samples when shuffled
+    streamed = any(isinstance(np_array, np.memmap) for np_array in list(x_trains) + [y_train])
     idx = 0
     for x_train in x_trains:
-      full_tensor, dataloader = self.__create_single_data_loader(self._input_tensors[idx], x_train)
+      full_tensor, dataloader = self.__create_single_data_loader(idx, x_train, streamed)
       self._full_input_tensors.append(full_tensor)
       self._input_dataloaders.append(dataloader)
       self._input_dataloaders_dim.append(len(input_shape))
       idx += 1
-    full_tensor, dataloader = self.__create_single_data_loader(self._label_tensor, y_train)
+    full_tensor, dataloader = self.__create_single_data_loader(len(self._input_tensors), y_train, streamed)
     self.__full_label_tensor = full_tensor
     self._label_dataloader = dataloader
     self._label_dataloader_dim = len(input_shape)
+    self._data_cache.evict(self._ffmodel)
+
+  def _is_batch_source(self, x):
+    return isinstance(x, Sequence) or inspect.isgenerator(x) or \
+           (hasattr(x, '__next__') and not isinstance(x, np.ndarray))
 
-  def _train(self, epochs, callbacks, eval=False):
+  def _create_enqueuer_data_loader(self, x, steps, shuffle, max_queue_size, workers, use_multiprocessing):
+    # full batches only, the stagers cannot take the partial last batch of a sequence
+    partial_batch_size = None
+    if isinstance(x, Sequence) and len(x) > 0:
+      last_batch_size = len(x[len(x)-1][1])
+      if last_batch_size < self._ffconfig.batch_size:
+        partial_batch_size = last_batch_size
+    if steps == None:
+      assert isinstance(x, Sequence), "steps is required when x is a generator"
+      steps = len(x)
+      if partial_batch_size != None:
+        steps -= 1
+    self._close_streamed_data_loaders(self._input_dataloaders + [self._label_dataloader])
+    dataloader = EnqueuerDataLoader(self._get_batch_stagers(), x, steps, shuffle,
+                                    max_queue_size, workers, use_multiprocessing,
+                                    partial_batch_size=partial_batch_size)
+    self._num_samples = dataloader.num_samples
+    self._input_dataloaders = []
+    self._label_dataloader = dataloader
+    if self._layer_inited == False:
+      self._ffmodel.init_layers()
+      self._layer_inited = True
+    return dataloader
+
+  def _train(self, epochs, callbacks, eval=False, verbose=0):
+    history = History()
     if callbacks != None:
-      for callback in callbacks:
-        callback.set_model(self)
+      callbacks = list(callbacks) + [history]
+    else:
+      callbacks = [history]
+    for callback in callbacks:
+      callback.set_model(self)
+
+    for callback in callbacks:
+      callback.on_train_begin()
 
+    # only fall back to one native call per step if a callback needs per-batch hooks
+    batch_callbacks = False
     if callbacks != None:
       for callback in callbacks:
-        callback.on_train_begin()
+        if callback._has_batch_hooks() == True:
+          batch_callbacks = True
+    dataloaders = self._input_dataloaders + [self._label_dataloader]
+    stats = self._training_stats
 
     ts_start = self._ffconfig.get_current_time()
     epoch = 0
     epoch_flag = True
     self.__tracing_id += 1
+    epoch_logs = None
     while (epoch < epochs) and (epoch_flag == True):
+      ts_epoch_start = self._ffconfig.get_current_time()
       if callbacks != None:
         for callback in callbacks:
           callback.on_epoch_begin(epoch)
 
-      for dataloader in self._input_dataloaders:
+      for dataloader in dataloaders:
         dataloader.reset()
-      self._label_dataloader.reset()
       self._ffmodel.reset_metrics()
       iterations = self._num_samples / self._ffconfig.batch_size
+      stats.reset_epoch()
+      progbar = None
+      if verbose > 0:
+        if epochs > 1:
+          print("Epoch %d/%d" %(epoch + 1, epochs))
+        progbar = Progbar(target=int(iterations), verbose=verbose,
+                          stateful_metrics=['step_time_p50', 'step_time_p99', 'samples_per_sec', 'load_time'])
 
-      for iter in range(0, int(iterations)):
-        if callbacks != None:
-          for callback in callbacks:
-            callback.on_batch_begin(iter)
-
-        for dataloader in self._input_dataloaders:
-          dataloader.next_batch(self._ffmodel)
-        self._label_dataloader.next_batch(self._ffmodel)
-
-        self._ffconfig.begin_trace(self.__tracing_id)
-        self._ffmodel.forward()
-        # for layer in self._layers:
-        #   layer.ffhandle.forward(self._ffmodel)
-        if eval == False:
-          self._ffmodel.zero_gradients()
-          self._ffmodel.backward()
-          self._ffmodel.update()
+      wall_time_measured = False
+      if batch_callbacks == False:
+        if verbose == 1:
+          # update the progress bar every few steps, the wall time is fenced at each update
+          chunk = max(1, int(iterations) // progbar_updates_per_epoch)
+          iter = 0
+          ts_chunk_start = ts_epoch_start
+          while iter < int(iterations):
+            num_steps = min(chunk, int(iterations) - iter)
+            load_times = np.zeros(num_steps, dtype=np.float64)
+            step_times = self._ffmodel.train_steps(dataloaders, num_steps, self.__tracing_id, eval, load_times)
+            stats.add_steps(step_times, load_times)
+            ts_chunk_end = self._ffconfig.get_current_time()
+            stats.add_wall_time(1e-6 * (ts_chunk_end - ts_chunk_start))
+            ts_chunk_start = ts_chunk_end
+            iter += num_steps
+            progbar.update(iter, self.__get_progbar_values(stats))
+          wall_time_measured = True
         else:
-          self._ffmodel.compute_metrics()
-        self._ffconfig.end_trace(self.__tracing_id)
+          load_times = np.zeros(int(iterations), dtype=np.float64)
+          step_times = self._ffmodel.train_steps(dataloaders, int(iterations), self.__tracing_id, eval, load_times)
+          stats.add_steps(step_times, load_times)
+      else:
+        load_times = np.zeros(1, dtype=np.float64)
+        for iter in range(0, int(iterations)):
+          batch_logs = {'batch': iter, 'size': self._ffconfig.batch_size}
+          for callback in callbacks:
+            callback.on_batch_begin(iter, batch_logs)
+
+          load_times[0] = 0
+          step_times = self._ffmodel.train_steps(dataloaders, 1, self.__tracing_id, eval, load_times)
+          stats.add_steps(step_times, load_times)
+          batch_logs['step_time'] = 1e-3 * step_times[0]
+          batch_logs['load_time'] = 1e-3 * load_times[0]
 
-        if callbacks != None:
           for callback in callbacks:
-            callback.on_batch_end(iter)
+            callback.on_batch_end(iter, batch_logs)
+          if verbose == 1:
+            progbar.update(iter + 1, self.__get_progbar_values(stats))
 
+      ts_epoch_end = self._ffconfig.get_current_time()
+      if wall_time_measured == False:
+        stats.add_wall_time(1e-6 * (ts_epoch_end - ts_epoch_start))
+      if verbose == 2:
+        progbar.update(int(iterations), self.__get_progbar_values(stats))
+      epoch_logs = EpochLogs(self._ffmodel.get_perf_metrics_async(), self._metrics, self._loss,
+                             int(iterations) * self._ffconfig.batch_size, 1e-6 * (ts_epoch_end - ts_epoch_start),
+                             stats.get_values())
       if callbacks != None:
         for callback in callbacks:
-          early_stop = callback.on_epoch_end(epoch)
+          early_stop = callback.on_epoch_end(epoch, epoch_logs)
           if early_stop == True:
             print("Accuracy reaches, now early stop, epoch: %d" %(epoch))
             epoch_flag = False
@@ -432,9 +1268,8 @@ class BaseModel(object):
     run_time = 1e-6 * (ts_end - ts_start);
     print("epochs %d, ELAPSED TIME = %.4fs, interations %d, samples %d, THROUGHPUT = %.2f samples/s\n" %(epochs, run_time, int(iterations), self._num_samples, self._num_samples * epochs / run_time));
 
-    if callbacks != None:
-      for callback in callbacks:
-        callback.on_train_end()
+    for callback in callbacks:
+      callback.on_train_end(epoch_logs)
 
     # self._input_tensors[0].ffhandle.inline_map(self._ffconfig)
     # input_array = self._input_tensors[0].ffhandle.get_flat_array(self._ffconfig, ff.DataType.DT_FLOAT)
@@ -448,57 +1283,24 @@ class BaseModel(object):
     # print(label_array.shape)
     # print(label_array)
     # self._label_tensor.ffhandle.inline_unmap(self._ffconfig)
+    return history
 
-  def _create_flexflow_layers(self):
-    out_t = 0
+  def __get_progbar_values(self, stats):
+    return [('samples_per_sec', stats.samples_per_sec),
+            ('step_time_p50', stats.step_time_percentile(50)),
+            ('step_time_p99', stats.step_time_percentile(99)),
+            ('load_time', stats.load_time)]
 
+  def _create_flexflow_layers(self):
     for layer in self._input_layers:
       layer.set_batch_size(self._ffconfig.batch_size)
 
     for layer in self._layers:
       layer.set_batch_size(self._ffconfig.batch_size)
 
-      if isinstance(layer, Activation) == True:
-        if layer.activation == 'softmax':
-          assert layer.layer_id == self._nb_layers-1, "softmax is not in the last layer"
-          out_t = self._ffmodel.softmax(layer.input_tensors[0].ffhandle)
-        elif layer.activation == 'relu':
-          out_t = self._ffmodel.relu(layer.input_tensors[0].ffhandle)
-        elif layer.activation == 'sigmoid':
-          out_t = self._ffmodel.sigmoid(layer.input_tensors[0].ffhandle)
-        elif layer.activation == 'tanh':
-          out_t = self._ffmodel.tanh(layer.input_tensors[0].ffhandle)
-        elif layer.activation == 'elu':
-          out_t = self._ffmodel.elu(layer.input_tensors[0].ffhandle)
-      elif isinstance(layer, Concatenate) == True:
-        t_ffhandle_list = []
-        for t in layer.input_tensors:
-          t_ffhandle_list.append(t.ffhandle)
-        out_t = self._ffmodel.concat(t_ffhandle_list, layer.axis)
-      elif isinstance(layer, Conv2D) == True:
-        out_t = self._ffmodel.conv2d(layer.input_tensors[0].ffhandle, layer.out_channels, layer.kernel_size[0], layer.kernel_size[1], layer.stride[0], layer.stride[1], layer.padding[0], layer.padding[1], layer.activation, layer.groups, layer.use_bias, None, layer.kernel_initializer.ffhandle, layer.bias_initializer.ffhandle)
-      elif isinstance(layer, Pooling2D) == True:
-        out_t = self._ffmodel.pool2d(layer.input_tensors[0].ffhandle, layer.kernel_size[1], layer.kernel_size[0], layer.stride[0], layer.stride[1], layer.padding[0], layer.padding[1], layer.pool_type)
-      elif isinstance(layer, Flatten) == True:
-        out_t = self._ffmodel.flat(layer.input_tensors[0].ffhandle)
-      elif isinstance(layer, Dense) == True:
-        out_t = self._ffmodel.dense(layer.input_tensors[0].ffhandle, layer.out_channels, layer.activation, layer.use_bias, None, layer.kernel_initializer.ffhandle, layer.bias_initializer.ffhandle)
-      elif isinstance(layer, Add) == True:
-        out_t = self._ffmodel.add(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
-      elif isinstance(layer, Subtract) == True:
-        out_t = self._ffmodel.subtract(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
-      elif isinstance(layer, Multiply) == True:
-        out_t = self._ffmodel.multiply(layer.input_tensors[0].ffhandle, layer.input_tensors[1].ffhandle)
-      elif isinstance(layer, Dropout) == True:
-        out_t = self._ffmodel.dropout(layer.input_tensors[0].ffhandle, layer.rate, layer.seed)
-      elif isinstance(layer, BatchNormalization) == True:
-        out_t = self._ffmodel.batch_norm(layer.input_tensors[0].ffhandle)
-      elif isinstance(layer, Embedding) == True:
-        out_t = self._ffmodel.embedding(layer.input_tensors[0].ffhandle, layer.input_dim, layer.out_channels, ff.AggrMode.AGGR_MODE_SUM, None, layer.embeddings_initializer.ffhandle)
-      elif isinstance(layer, Reshape) == True:
-        out_t = self._ffmodel.reshape(layer.input_tensors[0].ffhandle, layer.output_shape)
-      else:
-        assert 0, "unknow layer"
+      builder = _get_layer_builder(layer)
+      assert builder != None, "unknow layer"
+      out_t = builder(self, layer)
 
       layer.output_tensors[0].ffhandle = out_t
 
@@ -15,6 +15,7 @@
 
 import flexflow.core as ff
 from flexflow.core.flexflow_logger import fflogger
+import collections
 
 from .base_model import BaseModel
 from .tensor import Tensor
@@ -51,44 +52,56 @@ class Model(BaseModel):
     layer.layer_id = self._nb_layers
     self._nb_layers += 1       
 
-  def __traverse_dag_bfs(self):
-    bfs_queue = []
-    for input_layer in self._input_layers:
-      bfs_queue.append(input_layer)
-    while(len(bfs_queue) != 0):
-      layer = bfs_queue.pop(0)
-      if (isinstance(layer, InputLayer) == False):
-       #fflogger.debug(layer)
-        self._add_layer_metadata(layer)
+  def __build_graph(self):
+    # index every layer reachable from the inputs once, so that the sort below
+    # only touches integer ids instead of searching the layer lists
+    layer_ids = {}
+    graph_layers = []
+    stack = list(self._input_layers)
+    for layer in stack:
+      layer_ids[id(layer)] = len(graph_layers)
+      graph_layers.append(layer)
+    while (len(stack) != 0):
+      layer = stack.pop()
       for child in layer.next_layers:
-        assert child not in bfs_queue, "already in the stack"
-        if child.nb_visited_prev_layers == len(child.prev_layers)-1:
-          if child.has_visited == False:
-            child.has_visited = True
-            bfs_queue.append(child)
-        else:
-          child.nb_visited_prev_layers += 1
-    for layer in self._layers:
-      layer.nb_visited_prev_layers = 0
-      layer.has_visited = False
-    
-  def __traverse_dag_dfs(self):    
-    dfs_stack = []
-    for input_layer in reversed(self._input_layers):
-      dfs_stack.append(input_layer)
-    while(len(dfs_stack) != 0):
-      layer = dfs_stack.pop()
+        if id(child) not in layer_ids:
+          layer_ids[id(child)] = len(graph_layers)
+          graph_layers.append(child)
+          stack.append(child)
+    children = []
+    in_degrees = []
+    for layer in graph_layers:
+      children.append([layer_ids[id(child)] for child in layer.next_layers])
+      in_degrees.append(len(layer.prev_layers))
+    return graph_layers, children, in_degrees
+
+  def __traverse_dag(self, depth_first):
+    # Kahn's algorithm: a layer is added once all of its inputs have been added.
+    # A stack gives the depth first order, a queue the breadth first one.
+    graph_layers, children, in_degrees = self.__build_graph()
+    if depth_first == True:
+      ready = collections.deque(reversed(range(0, len(self._input_layers))))
+    else:
+      ready = collections.deque(range(0, len(self._input_layers)))
+    while (len(ready) != 0):
+      if depth_first == True:
+        idx = ready.pop()
+      else:
+        idx = ready.popleft()
+      layer = graph_layers[idx]
       if (isinstance(layer, InputLayer) == False):
-        #fflogger.debug(layer)
         self._add_layer_metadata(layer)
-      for child in reversed(layer.next_layers):
-        assert child not in dfs_stack, "already in the stack"
-        if child.nb_visited_prev_layers == len(child.prev_layers)-1:
-          if child.has_visited == False:
-            child.has_visited = True
-            dfs_stack.append(child)
-        else:
-          child.nb_visited_prev_layers += 1
-    for layer in self._layers:
-      layer.nb_visited_prev_layers = 0
-      layer.has_visited = False
+      if depth_first == True:
+        child_ids = reversed(children[idx])
+      else:
+        child_ids = children[idx]
+      for child_idx in child_ids:
+        in_degrees[child_idx] -= 1
+        if in_degrees[child_idx] == 0:
+          ready.append(child_idx)
+
+  def __traverse_dag_bfs(self):
+    self.__traverse_dag(depth_first=False)
+
+  def __traverse_dag_dfs(self):
+    self.__traverse_dag(depth_first=True)
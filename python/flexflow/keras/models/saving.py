@@ -0,0 +1,176 @@
+# Copyright 2020 Stanford University, Los Alamos National Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import flexflow.core as ff
+from flexflow.core.flexflow_logger import fflogger
+
+import json
+import os
+
+from .model import Model
+from flexflow.keras import layers as keras_layers
+from flexflow.keras import optimizers as keras_optimizers
+from flexflow.keras import losses as keras_losses
+from flexflow.keras import metrics as keras_metrics
+from flexflow.keras.layers import Input
+from flexflow.keras.layers.merge import _Merge
+from flexflow.keras.utils.generic_utils import serialize_keras_object, deserialize_keras_object
+
+# A saved model is a directory holding these files
+_model_config_name = 'model.json'
+_strategy_name = 'strategy.txt'
+_weights_name = 'weights.ckpt'
+_format_version = 1
+
+def _get_module_objects(module):
+  return dict((name, obj) for name, obj in vars(module).items() if isinstance(obj, type))
+
+def save_model(model, filepath, overwrite=True):
+  """Save a compiled model into the directory :attr:`filepath`:
+
+  - ``model.json``: the layer graph (:meth:`BaseModel.get_config`) and the
+    arguments of :meth:`BaseModel.compile`.
+  - ``strategy.txt``: the ParallelConfig of every op, in the format of
+    ``--export``. Start FlexFlow with ``--import filepath/strategy.txt``
+    instead of ``--budget`` to reuse it without searching again.
+  - ``weights.ckpt``: the parameters and the optimizer states, written by
+    :meth:`FFModel.save_checkpoint`.
+
+  :param model: the model to save, it must be compiled.
+  :type model: BaseModel
+
+  :param filepath: the directory to write.
+  :type filepath: str
+
+  :param overwrite: whether to overwrite a model saved in :attr:`filepath`.
+  :type overwrite: bool
+
+  :returns:  None -- no returns.
+  """
+  assert model.ffmodel != None, "the model is not compiled"
+  model_config_path = os.path.join(filepath, _model_config_name)
+  if os.path.isdir(filepath) == False:
+    os.makedirs(filepath)
+  elif overwrite == False:
+    assert os.path.exists(model_config_path) == False, "a model is already saved in %s" %(filepath)
+
+  if model._layer_inited == False:
+    model.ffmodel.init_layers()
+    model._layer_inited = True
+
+  comp_mode = None
+  if model._comp_mode != None:
+    comp_mode = model._comp_mode.name
+  model_config = {
+    'format_version': _format_version,
+    'class_name': model.__class__.__name__,
+    'config': model.get_config(),
+    'compile_config': {
+      'optimizer': serialize_keras_object(model.optimizer),
+      'loss': serialize_keras_object(model._loss),
+      'metrics': [serialize_keras_object(metric) for metric in model._metrics],
+      'comp_mode': comp_mode,
+    },
+    'batch_size': model.ffconfig.batch_size,
+  }
+  with open(model_config_path, 'w') as f:
+    json.dump(model_config, f, indent=1)
+  model.ffmodel.save_strategies(os.path.join(filepath, _strategy_name))
+  model.ffmodel.save_checkpoint(os.path.join(filepath, _weights_name))
+
+def model_from_config(config, custom_objects=None):
+  """Build a :class:`Model` from the layer graph returned by :meth:`BaseModel.get_config`.
+  The layers are connected in their saved order, so they get the same ids, and
+  the ops of the compiled model get the same names, as in the saved model.
+
+  :param config: the layer graph.
+  :type config: dict
+
+  :param custom_objects: classes of the user defined layers, by name.
+  :type custom_objects: dict
+
+  :returns:  Model -- the uncompiled model.
+  """
+  layer_objects = _get_module_objects(keras_layers)
+  input_tensors = []
+  for input_config in config['input_layers']:
+    input_tensors.append(Input(shape=tuple(input_config['shape']), dtype=input_config['dtype'], name=input_config['name']))
+  output_tensors = []
+  for layer_config in config['layers']:
+    layer = deserialize_keras_object(layer_config, module_objects=layer_objects,
+                                     custom_objects=custom_objects, printable_module_name='layer')
+    inbound_tensors = []
+    for kind, idx in layer_config['inbound_layers']:
+      if kind == 'input':
+        inbound_tensors.append(input_tensors[idx])
+      else:
+        inbound_tensors.append(output_tensors[idx])
+    if isinstance(layer, _Merge) == True:
+      output_tensors.append(layer(inbound_tensors))
+    else:
+      assert len(inbound_tensors) == 1, "[%s]: check inbound layers" %(layer.name)
+      output_tensors.append(layer(inbound_tensors[0]))
+  model = Model(input_tensors, output_tensors[config['output_layer']], name=config['name'])
+  for idx, layer_config in enumerate(config['layers']):
+    assert model.layers[idx].__class__.__name__ == layer_config['class_name'], "layer %d is rebuilt in a different order" %(idx)
+  return model
+
+def load_model(filepath, custom_objects=None, compile=True):
+  """Restore a model saved by :func:`save_model`. With :attr:`compile`, the model
+  is compiled with the saved optimizer, loss and metrics, its layers are
+  initialized and the saved weights and optimizer states are loaded, so it can
+  be trained or evaluated right away.
+
+  :param filepath: the directory written by :func:`save_model`.
+  :type filepath: str
+
+  :param custom_objects: classes of the user defined layers, by name.
+  :type custom_objects: dict
+
+  :param compile: whether to compile the model and load its weights.
+  :type compile: bool
+
+  :returns:  Model -- the restored model.
+  """
+  with open(os.path.join(filepath, _model_config_name), 'r') as f:
+    model_config = json.load(f)
+  assert model_config['format_version'] == _format_version, "unsupported model format version %d" %(model_config['format_version'])
+  model = model_from_config(model_config['config'], custom_objects)
+  if compile == False:
+    return model
+
+  compile_config = model_config['compile_config']
+  optimizer = deserialize_keras_object(compile_config['optimizer'],
+                                       module_objects=_get_module_objects(keras_optimizers),
+                                       custom_objects=custom_objects, printable_module_name='optimizer')
+  loss = deserialize_keras_object(compile_config['loss'],
+                                  module_objects=_get_module_objects(keras_losses),
+                                  custom_objects=custom_objects, printable_module_name='loss')
+  metrics = []
+  for metric_config in compile_config['metrics']:
+    metrics.append(deserialize_keras_object(metric_config,
+                                            module_objects=_get_module_objects(keras_metrics),
+                                            custom_objects=custom_objects, printable_module_name='metric'))
+  comp_mode = None
+  if compile_config['comp_mode'] != None:
+    comp_mode = ff.CompMode[compile_config['comp_mode']]
+  if model_config['batch_size'] != model.ffconfig.batch_size:
+    fflogger.warning("the model was saved with batch size %d, it is loaded with batch size %d" %(model_config['batch_size'], model.ffconfig.batch_size))
+  fflogger.info("to reuse the saved parallelization strategy, start FlexFlow with --import %s" %(os.path.join(filepath, _strategy_name)))
+  model.compile(optimizer=optimizer, loss=loss, metrics=metrics, comp_mode=comp_mode)
+  model.ffmodel.init_layers()
+  model._layer_inited = True
+  model.ffmodel.load_checkpoint(os.path.join(filepath, _weights_name))
+  return model
@@ -29,6 +29,9 @@ class SGD(Optimizer):
     self.momentum = momentum
     self.nesterov = nesterov
     super(SGD, self).__init__() 
+
+  def get_config(self):
+    return {'learning_rate': self.lr, 'momentum': self.momentum, 'nesterov': self.nesterov}
     
   def create_ffhandle(self, ffmodel):
     self._ffhandle = ff.SGDOptimizer(ffmodel, self.lr, self.momentum, self.nesterov)
@@ -45,6 +48,10 @@ class Adam(Optimizer):
     self.epsilon = epsilon
     self.amsgrad = amsgrad
     super(Adam, self).__init__() 
+
+  def get_config(self):
+    return {'learning_rate': self.lr, 'beta_1': self.beta1, 'beta_2': self.beta2, 
+            'epsilon': self.epsilon, 'amsgrad': self.amsgrad}
     
   def create_ffhandle(self, ffmodel):
     self._ffhandle = ff.AdamOptimizer(ffmodel, self.lr, self.beta1, self.beta2, epsilon=self.epsilon)
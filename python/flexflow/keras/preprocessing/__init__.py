@@ -4,7 +4,5 @@ from __future__ import print_function
 
 from .. import utils
 
-import keras_preprocessing
-
 from . import sequence
 from . import text
@@ -4,10 +4,381 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from keras_preprocessing import sequence
-from .. import utils
+import itertools
+import random
 
-pad_sequences = sequence.pad_sequences
-make_sampling_table = sequence.make_sampling_table
-skipgrams = sequence.skipgrams
-_remove_long_seq = sequence._remove_long_seq  # TODO: make it public?
\ No newline at end of file
+import numpy as np
+import six
+
+
+class RaggedSequences(object):
+    """Sequences of different lengths stored in two flat arrays.
+
+    `values` holds the concatenated sequences and the i-th sequence is
+    `values[offsets[i]:offsets[i + 1]]`. Indexing returns views, so the
+    sequences can be padded, counted or saved without a Python object
+    per element.
+
+    # Arguments
+        values: 1D array of the concatenated sequences.
+        offsets: 1D int64 array of `len(sequences) + 1` offsets into
+            `values`, starting at 0.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values)
+        self.offsets = np.asarray(offsets, dtype='int64')
+        if self.values.ndim != 1 or self.offsets.ndim != 1 or \
+                len(self.offsets) == 0 or self.offsets[-1] != len(self.values):
+            raise ValueError('`offsets` does not match `values`.')
+
+    @classmethod
+    def from_sequences(cls, sequences, dtype='int32'):
+        """Packs a list of sequences (lists or 1D arrays of integers).
+
+        # Arguments
+            sequences: iterable of sequences, or a `RaggedSequences`
+                which is returned as is.
+            dtype: type of the values.
+
+        # Returns
+            A `RaggedSequences`.
+        """
+        if isinstance(sequences, RaggedSequences):
+            return sequences
+        if not hasattr(sequences, '__len__'):
+            sequences = list(sequences)
+        try:
+            lengths = np.fromiter((len(s) for s in sequences),
+                                  dtype='int64', count=len(sequences))
+        except TypeError:
+            raise ValueError('`sequences` must be a list of iterables.')
+        offsets = np.zeros(len(lengths) + 1, dtype='int64')
+        np.cumsum(lengths, out=offsets[1:])
+        if len(sequences) > 0 and isinstance(sequences[0], np.ndarray):
+            values = np.concatenate(list(sequences) + [np.zeros(0, dtype=dtype)]).astype(dtype, copy=False)
+        else:
+            # astype wraps out-of-range values (e.g. -1 as uint8),
+            # np.fromiter raises OverflowError on them
+            values = np.asarray(list(itertools.chain.from_iterable(sequences)))
+            values = values.astype(dtype)
+        return cls(values, offsets)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError('sequence index out of range')
+        return self.values[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.values[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def to_list(self):
+        """Returns the sequences as a list of lists."""
+        values = self.values.tolist()
+        offsets = self.offsets.tolist()
+        return [values[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+
+
+# number of elements of the padded matrix filled at once by pad_sequences
+_pad_block_size = 1 << 22
+
+
+def _is_flat(sequences):
+    # the vectorized padding handles sequences of scalars only
+    for s in sequences:
+        if len(s):
+            return np.asarray(s).ndim == 1
+    return True
+
+
+def pad_sequences(sequences, maxlen=None, dtype='int32',
+                  padding='pre', truncating='pre', value=0.):
+    """Pads sequences to the same length.
+
+    This function transforms a list of
+    `num_samples` sequences (lists of integers)
+    into a 2D Numpy array of shape `(num_samples, num_timesteps)`.
+    `num_timesteps` is either the `maxlen` argument if provided,
+    or the length of the longest sequence otherwise.
+
+    Sequences that are shorter than `num_timesteps`
+    are padded with `value` at the beginning or the end
+    if padding='post.
+
+    Sequences longer than `num_timesteps` are truncated
+    so that they fit the desired length.
+    The position where padding or truncation happens is determined by
+    the arguments `padding` and `truncating`, respectively.
+
+    Pre-padding is the default.
+
+    Sequences of scalars are packed into a `RaggedSequences` and copied
+    into the padded matrix with vectorized masks, without a Python loop
+    over the samples.
+
+    # Arguments
+        sequences: List of lists, where each element is a sequence,
+            or a `RaggedSequences`.
+        maxlen: Int, maximum length of all sequences.
+        dtype: Type of the output sequences.
+            To pad sequences with variable length strings, you can use `object`.
+        padding: String, 'pre' or 'post':
+            pad either before or after each sequence.
+        truncating: String, 'pre' or 'post':
+            remove values from sequences larger than
+            `maxlen`, either at the beginning or at the end of the sequences.
+        value: Float or String, padding value.
+
+    # Returns
+        x: Numpy array with shape `(len(sequences), maxlen)`
+
+    # Raises
+        ValueError: In case of invalid values for `truncating` or `padding`,
+            or in case of invalid shape for a `sequences` entry.
+    """
+    if not hasattr(sequences, '__len__'):
+        raise ValueError('`sequences` must be iterable.')
+    if truncating not in ('pre', 'post'):
+        raise ValueError('Truncating type "%s" not understood' % truncating)
+    if padding not in ('pre', 'post'):
+        raise ValueError('Padding type "%s" not understood' % padding)
+
+    is_dtype_str = np.issubdtype(dtype, np.str_)
+    if isinstance(value, six.string_types) and dtype != object and not is_dtype_str:
+        raise ValueError("`dtype` {} is not compatible with `value`'s type: {}\n"
+                         "You should set `dtype=object` for variable length strings."
+                         .format(dtype, type(value)))
+
+    if dtype == object or is_dtype_str or \
+            (not isinstance(sequences, RaggedSequences) and not _is_flat(sequences)):
+        return _pad_sequences_loop(sequences, maxlen, dtype, padding, truncating, value)
+
+    ragged = RaggedSequences.from_sequences(sequences, dtype=dtype)
+    num_samples = len(ragged)
+    lengths = ragged.lengths
+    if maxlen is None:
+        maxlen = int(lengths.max()) if num_samples > 0 else 0
+
+    x = np.full((num_samples, maxlen), value, dtype=dtype)
+    kept = np.minimum(lengths, maxlen)
+    # first value kept in ragged.values and first column written in x, per sequence
+    if truncating == 'pre':
+        src_start = ragged.offsets[1:] - kept
+    else:
+        src_start = ragged.offsets[:-1]
+    if padding == 'pre':
+        dst_start = maxlen - kept
+    else:
+        dst_start = np.zeros(num_samples, dtype='int64')
+    dst_end = dst_start + kept
+    cols = np.arange(maxlen, dtype='int64')
+    # the index matrices are as large as x, so they are built a block of rows at a time
+    block = max(1, _pad_block_size // max(maxlen, 1))
+    for begin in range(0, num_samples, block):
+        end = min(begin + block, num_samples)
+        mask = (cols >= dst_start[begin:end, None]) & (cols < dst_end[begin:end, None])
+        src = (src_start[begin:end] - dst_start[begin:end])[:, None] + cols
+        x[begin:end][mask] = ragged.values[src[mask]]
+    return x
+
+
+def _pad_sequences_loop(sequences, maxlen, dtype, padding, truncating, value):
+    # sequences of strings or of multi-dimensional samples
+    num_samples = len(sequences)
+
+    lengths = []
+    sample_shape = ()
+    flag = True
+
+    # take the sample shape from the first non empty sequence
+    # checking for consistency in the main loop below.
+
+    for x in sequences:
+        try:
+            lengths.append(len(x))
+            if flag and len(x):
+                sample_shape = np.asarray(x).shape[1:]
+                flag = False
+        except TypeError:
+            raise ValueError('`sequences` must be a list of iterables. '
+                             'Found non-iterable: ' + str(x))
+
+    if maxlen is None:
+        maxlen = np.max(lengths)
+
+    x = np.full((num_samples, maxlen) + sample_shape, value, dtype=dtype)
+    for idx, s in enumerate(sequences):
+        if not len(s):
+            continue  # empty list/array was found
+        if truncating == 'pre':
+            trunc = s[-maxlen:]
+        else:
+            trunc = s[:maxlen]
+
+        # check `trunc` has expected shape
+        trunc = np.asarray(trunc, dtype=dtype)
+        if trunc.shape[1:] != sample_shape:
+            raise ValueError('Shape of sample %s of sequence at position %s '
+                             'is different from expected shape %s' %
+                             (trunc.shape[1:], idx, sample_shape))
+
+        if padding == 'post':
+            x[idx, :len(trunc)] = trunc
+        else:
+            x[idx, -len(trunc):] = trunc
+    return x
+
+
+def make_sampling_table(size, sampling_factor=1e-5):
+    """Generates a word rank-based probabilistic sampling table.
+
+    Used for generating the `sampling_table` argument for `skipgrams`.
+    `sampling_table[i]` is the probability of sampling
+    the word i-th most common word in a dataset
+    (more common words should be sampled less frequently, for balance).
+
+    The sampling probabilities are generated according
+    to the sampling distribution used in word2vec:
+
+    ```
+    p(word) = (min(1, sqrt(word_frequency / sampling_factor) /
+        (word_frequency / sampling_factor)))
+    ```
+
+    We assume that the word frequencies follow Zipf's law (s=1) to derive
+    a numerical approximation of frequency(rank):
+
+    `frequency(rank) ~ 1/(rank * (log(rank) + gamma) + 1/2 - 1/(12*rank))`
+    where `gamma` is the Euler-Mascheroni constant.
+
+    # Arguments
+        size: Int, number of possible words to sample.
+        sampling_factor: The sampling factor in the word2vec formula.
+
+    # Returns
+        A 1D Numpy array of length `size` where the ith entry
+        is the probability that a word of rank i should be sampled.
+    """
+    gamma = 0.577
+    rank = np.arange(size)
+    rank[0] = 1
+    inv_fq = rank * (np.log(rank) + gamma) + 0.5 - 1. / (12. * rank)
+    f = sampling_factor * inv_fq
+
+    return np.minimum(1., f / np.sqrt(f))
+
+
+def skipgrams(sequence, vocabulary_size,
+              window_size=4, negative_samples=1., shuffle=True,
+              categorical=False, sampling_table=None, seed=None):
+    """Generates skipgram word pairs.
+
+    This function transforms a sequence of word indexes (list of integers)
+    into tuples of words of the form:
+
+    - (word, word in the same window), with label 1 (positive samples).
+    - (word, random word from the vocabulary), with label 0 (negative samples).
+
+    # Arguments
+        sequence: A word sequence (sentence), encoded as a list
+            of word indices (integers). If using a `sampling_table`,
+            word indices are expected to match the rank
+            of the words in a reference dataset (e.g. 10 would encode
+            the 10-th most frequently occurring token).
+            Note that index 0 is expected to be a non-word and will be skipped.
+        vocabulary_size: Int, maximum possible word index + 1
+        window_size: Int, size of sampling windows (technically half-window).
+            The window of a word `w_i` will be
+            `[i - window_size, i + window_size+1]`.
+        negative_samples: Float >= 0. 0 for no negative (i.e. random) samples.
+            1 for same number as positive samples.
+        shuffle: Whether to shuffle the word couples before returning them.
+        categorical: bool. if False, labels will be
+            integers (eg. `[0, 1, 1 .. ]`),
+            if `True`, labels will be categorical, e.g.
+            `[[1,0],[0,1],[0,1] .. ]`.
+        sampling_table: 1D array of size `vocabulary_size` where the entry i
+            encodes the probability to sample a word of rank i.
+        seed: Random seed.
+
+    # Returns
+        couples, labels: where `couples` are int pairs and
+            `labels` are either 0 or 1.
+
+    # Note
+        By convention, index 0 in the vocabulary is
+        a non-word and will be skipped.
+    """
+    couples = []
+    labels = []
+    for i, wi in enumerate(sequence):
+        if not wi:
+            continue
+        if sampling_table is not None:
+            if sampling_table[wi] < random.random():
+                continue
+
+        window_start = max(0, i - window_size)
+        window_end = min(len(sequence), i + window_size + 1)
+        for j in range(window_start, window_end):
+            if j != i:
+                wj = sequence[j]
+                if not wj:
+                    continue
+                couples.append([wi, wj])
+                if categorical:
+                    labels.append([0, 1])
+                else:
+                    labels.append(1)
+
+    if negative_samples > 0:
+        num_negative_samples = int(len(labels) * negative_samples)
+        words = [c[0] for c in couples]
+        random.shuffle(words)
+
+        couples += [[words[i % len(words)],
+                     random.randint(1, vocabulary_size - 1)]
+                    for i in range(num_negative_samples)]
+        if categorical:
+            labels += [[1, 0]] * num_negative_samples
+        else:
+            labels += [0] * num_negative_samples
+
+    if shuffle:
+        if seed is None:
+            seed = random.randint(0, 10e6)
+        random.seed(seed)
+        random.shuffle(couples)
+        random.seed(seed)
+        random.shuffle(labels)
+
+    return couples, labels
+
+
+def _remove_long_seq(maxlen, seq, label):
+    """Removes sequences that exceed the maximum length.
+
+    # Arguments
+        maxlen: Int, maximum length of the output sequences.
+        seq: List of lists, where each sublist is a sequence.
+        label: List where each element is an integer.
+
+    # Returns
+        new_seq, new_label: shortened lists for `seq` and `label`.
+    """
+    new_seq, new_label = [], []
+    for x, y in zip(seq, label):
+        if len(x) < maxlen:
+            new_seq.append(x)
+            new_label.append(y)
+    return new_seq, new_label
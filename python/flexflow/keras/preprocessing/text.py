@@ -4,10 +4,601 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from keras_preprocessing import text
+import json
+import multiprocessing
+import warnings
+from collections import OrderedDict
+from collections import defaultdict
+from hashlib import md5
 
-text_to_word_sequence = text.text_to_word_sequence
-one_hot = text.one_hot
-hashing_trick = text.hashing_trick
-Tokenizer = text.Tokenizer
-tokenizer_from_json = text.tokenizer_from_json
+import numpy as np
+
+from .sequence import RaggedSequences
+
+_default_filters = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# translation tables of text_to_word_sequence, by (filters, split)
+_translate_tables = {}
+
+
+def text_to_word_sequence(text,
+                          filters=_default_filters,
+                          lower=True, split=" "):
+    """Converts a text to a sequence of words (or tokens).
+
+    # Arguments
+        text: Input text (string).
+        filters: list (or concatenation) of characters to filter out, such as
+            punctuation. Default: ``!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\\t\\n``,
+            includes basic punctuation, tabs, and newlines.
+        lower: boolean. Whether to convert the input to lowercase.
+        split: str. Separator for word splitting.
+
+    # Returns
+        A list of words (or tokens).
+    """
+    if lower:
+        text = text.lower()
+
+    translate_map = _translate_tables.get((filters, split))
+    if translate_map is None:
+        translate_map = str.maketrans({c: split for c in filters})
+        _translate_tables[(filters, split)] = translate_map
+    text = text.translate(translate_map)
+
+    seq = text.split(split)
+    return [i for i in seq if i]
+
+
+def one_hot(text, n,
+            filters=_default_filters,
+            lower=True,
+            split=' '):
+    """One-hot encodes a text into a list of word indexes of size n.
+
+    This is a wrapper to the `hashing_trick` function using `hash` as the
+    hashing function; unicity of word to index mapping non-guaranteed.
+
+    # Arguments
+        text: Input text (string).
+        n: int. Size of vocabulary.
+        filters: list (or concatenation) of characters to filter out, such as
+            punctuation. Default: ``!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\\t\\n``,
+            includes basic punctuation, tabs, and newlines.
+        lower: boolean. Whether to set the text to lowercase.
+        split: str. Separator for word splitting.
+
+    # Returns
+        List of integers in [1, n]. Each integer encodes a word
+        (unicity non-guaranteed).
+    """
+    return hashing_trick(text, n,
+                         hash_function=hash,
+                         filters=filters,
+                         lower=lower,
+                         split=split)
+
+
+def hashing_trick(text, n,
+                  hash_function=None,
+                  filters=_default_filters,
+                  lower=True,
+                  split=' '):
+    """Converts a text to a sequence of indexes in a fixed-size hashing space.
+
+    # Arguments
+        text: Input text (string).
+        n: Dimension of the hashing space.
+        hash_function: defaults to python `hash` function, can be 'md5' or
+            any function that takes in input a string and returns a int.
+            Note that 'hash' is not a stable hashing function, so
+            it is not consistent across different runs, while 'md5'
+            is a stable hashing function.
+        filters: list (or concatenation) of characters to filter out, such as
+            punctuation. Default: ``!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\\t\\n``,
+            includes basic punctuation, tabs, and newlines.
+        lower: boolean. Whether to set the text to lowercase.
+        split: str. Separator for word splitting.
+
+    # Returns
+        A list of integer word indices (unicity non-guaranteed).
+
+    `0` is a reserved index that won't be assigned to any word.
+
+    Two or more words may be assigned to the same index, due to possible
+    collisions by the hashing function.
+    """
+    if hash_function is None:
+        hash_function = hash
+    elif hash_function == 'md5':
+        def hash_function(w):
+            return int(md5(w.encode()).hexdigest(), 16)
+
+    seq = text_to_word_sequence(text,
+                                filters=filters,
+                                lower=lower,
+                                split=split)
+    return [(hash_function(w) % (n - 1) + 1) for w in seq]
+
+
+# The tokenizer read by the worker processes. With the fork start method
+# it is set before the pool is created, so the workers share the
+# vocabulary of the parent instead of receiving a pickled copy.
+_shared_tokenizer = None
+
+
+def _set_shared_tokenizer(tokenizer):
+    global _shared_tokenizer
+    _shared_tokenizer = tokenizer
+
+
+def _create_pool(tokenizer, workers):
+    _set_shared_tokenizer(tokenizer)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork').Pool(workers)
+    return multiprocessing.Pool(workers, initializer=_set_shared_tokenizer,
+                                initargs=(tokenizer,))
+
+
+def _split_chunks(texts, workers):
+    # a few chunks per worker to balance documents of different lengths
+    chunk_size = max(1, -(-len(texts) // (workers * 4)))
+    return [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+
+def _count_words(tokenizer, texts):
+    document_count = 0
+    word_counts = OrderedDict()
+    word_docs = OrderedDict()
+    for text in texts:
+        document_count += 1
+        seq = tokenizer._get_tokens(text)
+        for w in seq:
+            word_counts[w] = word_counts.get(w, 0) + 1
+        for w in set(seq):
+            word_docs[w] = word_docs.get(w, 0) + 1
+    return document_count, word_counts, word_docs
+
+
+def _texts_to_sequences(tokenizer, texts):
+    values = []
+    lengths = []
+    for vect in tokenizer.texts_to_sequences_generator(texts):
+        values.extend(vect)
+        lengths.append(len(vect))
+    return np.array(values, dtype='int32'), np.array(lengths, dtype='int64')
+
+
+def _count_words_chunk(texts):
+    return _count_words(_shared_tokenizer, texts)
+
+
+def _texts_to_sequences_chunk(texts):
+    return _texts_to_sequences(_shared_tokenizer, texts)
+
+
+class Tokenizer(object):
+    """Text tokenization utility class.
+
+    This class allows to vectorize a text corpus, by turning each
+    text into either a sequence of integers (each integer being the index
+    of a token in a dictionary) or into a vector where the coefficient
+    for each token could be binary, based on word count, based on tf-idf...
+
+    `fit_on_texts`, `texts_to_sequences` and `texts_to_ragged_sequences`
+    take a `workers` argument to split the texts across processes, which
+    read the vocabulary of the tokenizer without copying it when the
+    platform forks.
+
+    # Arguments
+        num_words: the maximum number of words to keep, based
+            on word frequency. Only the most common `num_words-1` words will
+            be kept.
+        filters: a string where each element is a character that will be
+            filtered from the texts. The default is all punctuation, plus
+            tabs and line breaks, minus the `'` character.
+        lower: boolean. Whether to convert the texts to lowercase.
+        split: str. Separator for word splitting.
+        char_level: if True, every character will be treated as a token.
+        oov_token: if given, it will be added to word_index and used to
+            replace out-of-vocabulary words during text_to_sequence calls
+
+    By default, all punctuation is removed, turning the texts into
+    space-separated sequences of words
+    (words maybe include the `'` character). These sequences are then
+    split into lists of tokens. They will then be indexed or vectorized.
+
+    `0` is a reserved index that won't be assigned to any word.
+    """
+
+    def __init__(self, num_words=None,
+                 filters=_default_filters,
+                 lower=True,
+                 split=' ',
+                 char_level=False,
+                 oov_token=None,
+                 document_count=0,
+                 **kwargs):
+        # Legacy support
+        if 'nb_words' in kwargs:
+            warnings.warn('The `nb_words` argument in `Tokenizer` '
+                          'has been renamed `num_words`.')
+            num_words = kwargs.pop('nb_words')
+        if kwargs:
+            raise TypeError('Unrecognized keyword arguments: ' + str(kwargs))
+
+        self.word_counts = OrderedDict()
+        self.word_docs = defaultdict(int)
+        self.filters = filters
+        self.split = split
+        self.lower = lower
+        self.num_words = num_words
+        self.document_count = document_count
+        self.char_level = char_level
+        self.oov_token = oov_token
+        self.index_docs = defaultdict(int)
+        self.word_index = {}
+        self.index_word = {}
+
+    def _get_tokens(self, text):
+        if self.char_level or isinstance(text, list):
+            if self.lower:
+                if isinstance(text, list):
+                    text = [text_elem.lower() for text_elem in text]
+                else:
+                    text = text.lower()
+            return text
+        return text_to_word_sequence(text,
+                                     self.filters,
+                                     self.lower,
+                                     self.split)
+
+    def fit_on_texts(self, texts, workers=1):
+        """Updates internal vocabulary based on a list of texts.
+
+        In the case where texts contains lists,
+        we assume each entry of the lists to be a token.
+
+        Required before using `texts_to_sequences` or `texts_to_matrix`.
+
+        # Arguments
+            texts: can be a list of strings,
+                a generator of strings (for memory-efficiency),
+                or a list of list of strings.
+            workers: number of processes counting the words.
+        """
+        if workers > 1:
+            texts = list(texts)
+            pool = _create_pool(self, workers)
+            try:
+                results = pool.map(_count_words_chunk, _split_chunks(texts, workers))
+            finally:
+                pool.close()
+                pool.join()
+                _set_shared_tokenizer(None)
+        else:
+            results = [_count_words(self, texts)]
+
+        # merged in order, so the words keep the order of their first occurrence
+        word_counts = self.word_counts
+        word_docs = self.word_docs
+        for document_count, chunk_word_counts, chunk_word_docs in results:
+            self.document_count += document_count
+            for w, c in chunk_word_counts.items():
+                word_counts[w] = word_counts.get(w, 0) + c
+            for w, c in chunk_word_docs.items():
+                word_docs[w] = word_docs.get(w, 0) + c
+
+        wcounts = list(self.word_counts.items())
+        wcounts.sort(key=lambda x: x[1], reverse=True)
+        # forcing the oov_token to index 1 if it exists
+        if self.oov_token is None:
+            sorted_voc = []
+        else:
+            sorted_voc = [self.oov_token]
+        sorted_voc.extend(wc[0] for wc in wcounts)
+
+        # note that index 0 is reserved, never assigned to an existing word
+        self.word_index = dict(
+            zip(sorted_voc, list(range(1, len(sorted_voc) + 1))))
+
+        self.index_word = {c: w for w, c in self.word_index.items()}
+
+        for w, c in list(self.word_docs.items()):
+            self.index_docs[self.word_index[w]] = c
+
+    def fit_on_sequences(self, sequences):
+        """Updates internal vocabulary based on a list of sequences.
+
+        Required before using `sequences_to_matrix`
+        (if `fit_on_texts` was never called).
+
+        # Arguments
+            sequences: A list of sequence.
+                A "sequence" is a list of integer word indices.
+        """
+        self.document_count += len(sequences)
+        for seq in sequences:
+            seq = set(seq)
+            for i in seq:
+                self.index_docs[i] += 1
+
+    def texts_to_sequences(self, texts, workers=1):
+        """Transforms each text in texts to a sequence of integers.
+
+        Only top `num_words-1` most frequent words will be taken into account.
+        Only words known by the tokenizer will be taken into account.
+
+        # Arguments
+            texts: A list of texts (strings).
+            workers: number of processes converting the texts.
+
+        # Returns
+            A list of sequences.
+        """
+        if workers > 1:
+            return self.texts_to_ragged_sequences(texts, workers).to_list()
+        return list(self.texts_to_sequences_generator(texts))
+
+    def texts_to_ragged_sequences(self, texts, workers=1):
+        """Transforms the texts into sequences of integers stored in a
+        `RaggedSequences`, which `pad_sequences` and `sequences_to_matrix`
+        consume without converting the sequences one by one.
+
+        # Arguments
+            texts: A list of texts (strings).
+            workers: number of processes converting the texts.
+
+        # Returns
+            A `RaggedSequences` of int32 word indices.
+        """
+        if workers > 1:
+            texts = list(texts)
+            pool = _create_pool(self, workers)
+            try:
+                results = pool.map(_texts_to_sequences_chunk, _split_chunks(texts, workers))
+            finally:
+                pool.close()
+                pool.join()
+                _set_shared_tokenizer(None)
+        else:
+            results = [_texts_to_sequences(self, texts)]
+        lengths = np.concatenate([chunk_lengths for _, chunk_lengths in results] +
+                                 [np.zeros(0, dtype='int64')])
+        offsets = np.zeros(len(lengths) + 1, dtype='int64')
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.concatenate([chunk_values for chunk_values, _ in results] +
+                                [np.zeros(0, dtype='int32')])
+        return RaggedSequences(values, offsets)
+
+    def texts_to_sequences_generator(self, texts):
+        """Transforms each text in `texts` to a sequence of integers.
+
+        Each item in texts can also be a list,
+        in which case we assume each item of that list to be a token.
+
+        Only top `num_words-1` most frequent words will be taken into account.
+        Only words known by the tokenizer will be taken into account.
+
+        # Arguments
+            texts: A list of texts (strings).
+
+        # Yields
+            Yields individual sequences.
+        """
+        num_words = self.num_words
+        word_index = self.word_index
+        oov_token_index = word_index.get(self.oov_token)
+        for text in texts:
+            vect = []
+            for w in self._get_tokens(text):
+                i = word_index.get(w)
+                if i is not None and not (num_words and i >= num_words):
+                    vect.append(i)
+                elif oov_token_index is not None:
+                    vect.append(oov_token_index)
+            yield vect
+
+    def sequences_to_texts(self, sequences):
+        """Transforms each sequence into a list of text.
+
+        Only top `num_words-1` most frequent words will be taken into account.
+        Only words known by the tokenizer will be taken into account.
+
+        # Arguments
+            sequences: A list of sequences (list of integers).
+
+        # Returns
+            A list of texts (strings)
+        """
+        return list(self.sequences_to_texts_generator(sequences))
+
+    def sequences_to_texts_generator(self, sequences):
+        """Transforms each sequence in `sequences` to a list of texts(strings).
+
+        Each sequence has to a list of integers.
+        In other words, sequences should be a list of sequences
+
+        Only top `num_words-1` most frequent words will be taken into account.
+        Only words known by the tokenizer will be taken into account.
+
+        # Arguments
+            sequences: A list of sequences.
+
+        # Yields
+            Yields individual texts.
+        """
+        num_words = self.num_words
+        oov_token_index = self.word_index.get(self.oov_token)
+        for seq in sequences:
+            vect = []
+            for num in seq:
+                word = self.index_word.get(num)
+                if word is not None:
+                    if num_words and num >= num_words:
+                        if oov_token_index is not None:
+                            vect.append(self.index_word[oov_token_index])
+                    else:
+                        vect.append(word)
+                elif self.oov_token is not None:
+                    vect.append(self.index_word[oov_token_index])
+            vect = ' '.join(vect)
+            yield vect
+
+    def texts_to_matrix(self, texts, mode='binary'):
+        """Convert a list of texts to a Numpy matrix.
+
+        # Arguments
+            texts: list of strings.
+            mode: one of "binary", "count", "tfidf", "freq".
+
+        # Returns
+            A Numpy matrix.
+        """
+        sequences = self.texts_to_ragged_sequences(texts)
+        return self.sequences_to_matrix(sequences, mode=mode)
+
+    def sequences_to_matrix(self, sequences, mode='binary'):
+        """Converts a list of sequences into a Numpy matrix.
+
+        The word counts of all the sequences are computed at once with
+        `np.bincount`.
+
+        # Arguments
+            sequences: list of sequences
+                (a sequence is a list of integer word indices),
+                or a `RaggedSequences`.
+            mode: one of "binary", "count", "tfidf", "freq"
+
+        # Returns
+            A Numpy matrix.
+
+        # Raises
+            ValueError: In case of invalid `mode` argument,
+                or if the Tokenizer requires to be fit to sample data.
+        """
+        if not self.num_words:
+            if self.word_index:
+                num_words = len(self.word_index) + 1
+            else:
+                raise ValueError('Specify a dimension (`num_words` argument), '
+                                 'or fit on some text data first.')
+        else:
+            num_words = self.num_words
+
+        if mode == 'tfidf' and not self.document_count:
+            raise ValueError('Fit the Tokenizer on some data '
+                             'before using tfidf mode.')
+        if mode not in ('binary', 'count', 'tfidf', 'freq'):
+            raise ValueError('Unknown vectorization mode:', mode)
+
+        ragged = RaggedSequences.from_sequences(sequences, dtype='int64')
+        num_samples = len(ragged)
+        lengths = ragged.lengths
+        rows = np.repeat(np.arange(num_samples, dtype='int64'), lengths)
+        cols = ragged.values.astype('int64', copy=False)
+        kept = (cols >= 0) & (cols < num_words)
+        counts = np.bincount(rows[kept] * num_words + cols[kept],
+                             minlength=num_samples * num_words)
+        counts = counts.reshape(num_samples, num_words)
+
+        if mode == 'count':
+            x = counts.astype('float64')
+        elif mode == 'freq':
+            x = counts / np.maximum(lengths, 1)[:, None]
+        elif mode == 'binary':
+            x = (counts > 0).astype('float64')
+        else:
+            # Use weighting scheme 2 in
+            # https://en.wikipedia.org/wiki/Tf%E2%80%93idf
+            tf = np.zeros((num_samples, num_words))
+            np.log(counts, out=tf, where=counts > 0)
+            tf[counts > 0] += 1
+            index_docs = np.zeros(num_words)
+            for j, c in self.index_docs.items():
+                if 0 <= j < num_words:
+                    index_docs[j] = c
+            idf = np.log(1 + self.document_count / (1 + index_docs))
+            x = tf * idf
+        return x
+
+    def get_config(self):
+        '''Returns the tokenizer configuration as Python dictionary.
+        The word count dictionaries used by the tokenizer get serialized
+        into plain JSON, so that the configuration can be read by other
+        projects.
+
+        # Returns
+            A Python dictionary with the tokenizer configuration.
+        '''
+        json_word_counts = json.dumps(self.word_counts)
+        json_word_docs = json.dumps(self.word_docs)
+        json_index_docs = json.dumps(self.index_docs)
+        json_word_index = json.dumps(self.word_index)
+        json_index_word = json.dumps(self.index_word)
+
+        return {
+            'num_words': self.num_words,
+            'filters': self.filters,
+            'lower': self.lower,
+            'split': self.split,
+            'char_level': self.char_level,
+            'oov_token': self.oov_token,
+            'document_count': self.document_count,
+            'word_counts': json_word_counts,
+            'word_docs': json_word_docs,
+            'index_docs': json_index_docs,
+            'index_word': json_index_word,
+            'word_index': json_word_index
+        }
+
+    def to_json(self, **kwargs):
+        """Returns a JSON string containing the tokenizer configuration.
+        To load a tokenizer from a JSON string, use
+        `tokenizer_from_json(json_string)`.
+
+        # Arguments
+            **kwargs: Additional keyword arguments
+                to be passed to `json.dumps()`.
+
+        # Returns
+            A JSON string containing the tokenizer configuration.
+        """
+        config = self.get_config()
+        tokenizer_config = {
+            'class_name': self.__class__.__name__,
+            'config': config
+        }
+        return json.dumps(tokenizer_config, **kwargs)
+
+
+def tokenizer_from_json(json_string):
+    """Parses a JSON tokenizer configuration file and returns a
+    tokenizer instance.
+
+    # Arguments
+        json_string: JSON string encoding a tokenizer configuration.
+
+    # Returns
+        A Keras Tokenizer instance
+    """
+    tokenizer_config = json.loads(json_string)
+    config = tokenizer_config.get('config')
+
+    word_counts = json.loads(config.pop('word_counts'))
+    word_docs = json.loads(config.pop('word_docs'))
+    index_docs = json.loads(config.pop('index_docs'))
+    # Integer indexing gets converted to strings with json.dumps()
+    index_docs = {int(k): v for k, v in index_docs.items()}
+    index_word = json.loads(config.pop('index_word'))
+    index_word = {int(k): v for k, v in index_word.items()}
+    word_index = json.loads(config.pop('word_index'))
+
+    tokenizer = Tokenizer(**config)
+    tokenizer.word_counts = word_counts
+    tokenizer.word_docs = word_docs
+    tokenizer.index_docs = index_docs
+    tokenizer.word_index = word_index
+    tokenizer.index_word = index_word
+
+    return tokenizer
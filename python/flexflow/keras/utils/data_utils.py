@@ -120,6 +120,31 @@ def _extract_archive(file_path, path='.', archive_format='auto'):
     return False
 
 
+def get_datadir(cache_subdir='datasets', cache_dir=None):
+    """Returns the directory where `get_file` caches its files, and creates it.
+
+    # Arguments
+        cache_subdir: Subdirectory under the Keras cache dir.
+        cache_dir: Location to store cached files, when None it
+            defaults to `$KERAS_HOME` or `~/.keras`.
+
+    # Returns
+        Path to the directory.
+    """
+    if cache_dir is None:
+        if 'KERAS_HOME' in os.environ:
+            cache_dir = os.environ.get('KERAS_HOME')
+        else:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.keras')
+    datadir_base = os.path.expanduser(cache_dir)
+    if not os.access(datadir_base, os.W_OK):
+        datadir_base = os.path.join('/tmp', '.keras')
+    datadir = os.path.join(datadir_base, cache_subdir)
+    if not os.path.exists(datadir):
+        os.makedirs(datadir)
+    return datadir
+
+
 def get_file(fname,
              origin,
              untar=False,
@@ -169,20 +194,10 @@ def get_file(fname,
     # Returns
         Path to the downloaded file
     """  # noqa
-    if cache_dir is None:
-        if 'KERAS_HOME' in os.environ:
-            cache_dir = os.environ.get('KERAS_HOME')
-        else:
-            cache_dir = os.path.join(os.path.expanduser('~'), '.keras')
     if md5_hash is not None and file_hash is None:
         file_hash = md5_hash
         hash_algorithm = 'md5'
-    datadir_base = os.path.expanduser(cache_dir)
-    if not os.access(datadir_base, os.W_OK):
-        datadir_base = os.path.join('/tmp', '.keras')
-    datadir = os.path.join(datadir_base, cache_subdir)
-    if not os.path.exists(datadir):
-        os.makedirs(datadir)
+    datadir = get_datadir(cache_subdir, cache_dir)
 
     if untar:
         untar_fpath = os.path.join(datadir, fname)
@@ -0,0 +1,272 @@
+# Copyright 2020 Stanford University, Los Alamos National Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import numpy as np
+import onnx
+from onnx import numpy_helper
+
+def _get_attribute(node, name, default):
+    for attribute in node.attribute:
+        if attribute.name == name:
+            return onnx.helper.get_attribute_value(attribute)
+    return default
+
+def _get_input(inputs, i):
+    # the optional inputs are either missing or empty names
+    if i < len(inputs):
+        return inputs[i]
+    return None
+
+def _get_axes(node, inputs):
+    # axes is an attribute before opset 13 and an input since
+    axes = _get_input(inputs, 1)
+    if axes is None:
+        axes = _get_attribute(node, 'axes', None)
+    return axes
+
+# the attributes of Constant holding its value besides value (since opset 12),
+# and the dtype of the tensor they make
+_constant_value_attributes = {
+    'value_float': np.float32,
+    'value_floats': np.float32,
+    'value_int': np.int64,
+    'value_ints': np.int64,
+}
+
+def _eval_constant(node, inputs):
+    # a Constant has exactly one of its value attributes
+    for attribute in node.attribute:
+        if attribute.name == 'value':
+            return [numpy_helper.to_array(onnx.helper.get_attribute_value(attribute))]
+        if attribute.name in _constant_value_attributes:
+            value = onnx.helper.get_attribute_value(attribute)
+            return [np.array(value, dtype=_constant_value_attributes[attribute.name])]
+    # sparse_value and the strings are left to the graph
+    return None
+
+def _eval_shape(node, inputs):
+    # the input is not evaluated, fold_constants passes its static shape instead
+    shape = inputs[0]
+    start = _get_attribute(node, 'start', 0)
+    end = _get_attribute(node, 'end', len(shape))
+    return [np.array(shape[start:end], dtype=np.int64)]
+
+def _eval_size(node, inputs):
+    return [np.array(np.prod(inputs[0]), dtype=np.int64)]
+
+def _eval_gather(node, inputs):
+    return [np.take(inputs[0], inputs[1], axis=_get_attribute(node, 'axis', 0))]
+
+def _eval_concat(node, inputs):
+    return [np.concatenate(inputs, axis=_get_attribute(node, 'axis', 0))]
+
+def _eval_unsqueeze(node, inputs):
+    data = inputs[0]
+    ndim = data.ndim + len(_get_axes(node, inputs))
+    axes = sorted(axis % ndim for axis in _get_axes(node, inputs))
+    for axis in axes:
+        data = np.expand_dims(data, axis)
+    return [data]
+
+def _eval_squeeze(node, inputs):
+    axes = _get_axes(node, inputs)
+    if axes is None:
+        return [np.squeeze(inputs[0])]
+    return [np.squeeze(inputs[0], axis=tuple(int(axis) for axis in axes))]
+
+def _eval_cast(node, inputs):
+    to = _get_attribute(node, 'to', None)
+    return [inputs[0].astype(onnx.helper.tensor_dtype_to_np_dtype(to))]
+
+def _eval_reshape(node, inputs):
+    return [inputs[0].reshape(get_reshape_dims(inputs[0].shape, inputs[1], _get_attribute(node, 'allowzero', 0)))]
+
+def _eval_range(node, inputs):
+    start, limit, delta = inputs
+    return [np.arange(start, limit, delta, dtype=np.result_type(start, limit, delta))]
+
+def _eval_slice(node, inputs):
+    data = inputs[0]
+    # starts, ends and axes are attributes before opset 10 and inputs since
+    if len(inputs) > 1:
+        starts, ends = inputs[1], inputs[2]
+        axes = _get_input(inputs, 3)
+        steps = _get_input(inputs, 4)
+    else:
+        starts = _get_attribute(node, 'starts', None)
+        ends = _get_attribute(node, 'ends', None)
+        axes = _get_attribute(node, 'axes', None)
+        steps = None
+    if axes is None:
+        axes = range(len(starts))
+    if steps is None:
+        steps = [1] * len(starts)
+    slices = [slice(None)] * data.ndim
+    for start, end, axis, step in zip(starts, ends, axes, steps):
+        slices[axis] = slice(int(start), int(end), int(step))
+    return [data[tuple(slices)]]
+
+def _eval_constant_of_shape(node, inputs):
+    value = _get_attribute(node, 'value', None)
+    if value is None:
+        value = np.zeros(1, dtype=np.float32)
+    else:
+        value = numpy_helper.to_array(value)
+    return [np.full(tuple(int(dim) for dim in inputs[0]), value.reshape(-1)[0], dtype=value.dtype)]
+
+def _eval_transpose(node, inputs):
+    return [np.transpose(inputs[0], _get_attribute(node, 'perm', None))]
+
+def _eval_div(node, inputs):
+    if np.issubdtype(inputs[0].dtype, np.integer):
+        # integer division truncates toward zero
+        return [(np.trunc(inputs[0] / inputs[1])).astype(inputs[0].dtype)]
+    return [inputs[0] / inputs[1]]
+
+def _eval_where(node, inputs):
+    return [np.where(inputs[0], inputs[1], inputs[2])]
+
+def _eval_expand(node, inputs):
+    shape = np.broadcast_shapes(inputs[0].shape, tuple(int(dim) for dim in inputs[1]))
+    return [np.broadcast_to(inputs[0], shape).copy()]
+
+def _eval_unary(fn):
+    return lambda node, inputs: [fn(inputs[0])]
+
+def _eval_binary(fn):
+    return lambda node, inputs: [fn(inputs[0], inputs[1])]
+
+# op type -> function evaluating the op on numpy arrays
+_constant_ops = {
+    'Constant': _eval_constant,
+    'Shape': _eval_shape,
+    'Size': _eval_size,
+    'Gather': _eval_gather,
+    'Concat': _eval_concat,
+    'Unsqueeze': _eval_unsqueeze,
+    'Squeeze': _eval_squeeze,
+    'Cast': _eval_cast,
+    'Reshape': _eval_reshape,
+    'Range': _eval_range,
+    'Slice': _eval_slice,
+    'ConstantOfShape': _eval_constant_of_shape,
+    'Transpose': _eval_transpose,
+    'Identity': _eval_unary(lambda x: x),
+    'Neg': _eval_unary(np.negative),
+    'Sqrt': _eval_unary(np.sqrt),
+    'Add': _eval_binary(np.add),
+    'Sub': _eval_binary(np.subtract),
+    'Mul': _eval_binary(np.multiply),
+    'Div': _eval_div,
+    'Pow': _eval_binary(np.power),
+    'Equal': _eval_binary(np.equal),
+    'Where': _eval_where,
+    'Expand': _eval_expand,
+}
+
+def get_reshape_dims(input_dims, shape, allowzero=0):
+    """Resolve the 0 (copy the input dim) and -1 (infer the dim) of the shape
+    of an ONNX Reshape applied to a tensor of dims input_dims.
+    """
+    dims = [int(dim) for dim in shape]
+    for i, dim in enumerate(dims):
+        if dim == 0 and allowzero == 0:
+            dims[i] = input_dims[i]
+    if -1 in dims:
+        known = int(np.prod([dim for dim in dims if dim != -1]))
+        dims[dims.index(-1)] = int(np.prod(input_dims)) // known
+    return dims
+
+def _get_static_shapes(model):
+    # the dims of every tensor whose shape is fully known, by name
+    inferred_model = onnx.shape_inference.infer_shapes(model)
+    shapes = {}
+    graph = inferred_model.graph
+    for value_info in list(graph.input) + list(graph.value_info) + list(graph.output):
+        tensor_type = value_info.type.tensor_type
+        if not tensor_type.HasField('shape'):
+            continue
+        dims = []
+        for dim in tensor_type.shape.dim:
+            if not dim.HasField('dim_value'):
+                dims = None
+                break
+            dims.append(dim.dim_value)
+        if dims != None:
+            shapes[value_info.name] = dims
+    return shapes
+
+def fold_constants(model, input_dims, get_array):
+    """Evaluate on CPU the nodes of model whose outputs do not depend on the
+    values of the graph inputs, and remove them from the graph. The shapes of
+    the graph inputs are set to input_dims and propagated by the ONNX shape
+    inference, so that the Shape nodes of the static tensors are folded too,
+    and with them the subgraphs computing the shapes of Reshape, Expand, Range...
+
+    model: the onnx.ModelProto to fold in place.
+    input_dims: the dims of the graph inputs, by name.
+    get_array: function returning the numpy array of an initializer, or None
+        for a parameter passed as a graph input, which has no value.
+
+    Returns the values of the folded tensors, by name.
+    """
+    graph = model.graph
+    for graph_input in graph.input:
+        if graph_input.name not in input_dims:
+            continue
+        shape = graph_input.type.tensor_type.shape
+        del shape.dim[:]
+        for dim in input_dims[graph_input.name]:
+            shape.dim.add().dim_value = dim
+    shapes = _get_static_shapes(model)
+    initializers = set(initializer.name for initializer in graph.initializer)
+    outputs = set(output.name for output in graph.output)
+    constants = {}
+
+    def get_constant(name):
+        if name in constants:
+            return constants[name]
+        if name in initializers:
+            # the initializers are only read when a constant node needs them
+            array = get_array(name)
+            if array is not None:
+                constants[name] = array
+            return array
+        return None
+
+    nodes = []
+    for node in graph.node:
+        folded = None
+        if node.op_type in _constant_ops and not any(name in outputs for name in node.output):
+            if node.op_type == 'Shape':
+                inputs = [shapes.get(node.input[0])]
+            else:
+                inputs = [get_constant(name) if name != '' else None for name in node.input]
+                # only the trailing optional inputs may be missing
+                while len(inputs) > 0 and inputs[-1] is None and node.input[len(inputs)-1] == '':
+                    inputs.pop()
+            if all(value is not None for value in inputs):
+                folded = _constant_ops[node.op_type](node, inputs)
+        if folded == None:
+            nodes.append(node)
+            continue
+        for name, value in zip(node.output, folded):
+            constants[name] = np.asarray(value)
+            shapes[name] = list(np.shape(value))
+    logging.debug("fold {} nodes".format(len(graph.node) - len(nodes)))
+    del graph.node[:]
+    graph.node.extend(nodes)
+    return dict((name, value) for name, value in constants.items() if name not in initializers)
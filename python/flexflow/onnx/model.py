@@ -14,10 +14,15 @@
 #
 
 import logging
+import os
 import onnx
 import struct
+from onnx import numpy_helper
+from .rewrite import rewrite_graph, default_rewrite_passes, FoldBatchNorm
+from .constant_folding import fold_constants, get_reshape_dims
 from flexflow.core import ActiMode
-from flexflow.core import PoolType, DataType
+from flexflow.core import PoolType, DataType, CompMode
+import numpy as np
 
 # logging.basicConfig(level=logging.DEBUG)
 
@@ -27,9 +32,9 @@ def onnx_to_ff_dt(datatype):
     elif datatype == onnx.TensorProto.DOUBLE:
         return DataType.DT_DOUBLE
     elif datatype == onnx.TensorProto.INT32:
-        return DataTyoe.DT_INT32
+        return DataType.DT_INT32
     elif datatype == onnx.TensorProto.INT64:
-        return DataTyoe.DT_INT64
+        return DataType.DT_INT64
     else:
         assert 0, "Unsupported datatype"
 
@@ -53,11 +58,33 @@ class ONNXTensor(object):
         for i in range(len(dims)):
             self.dims[i] = dims[i]
 
+# activation attribute added by the rewrite passes -> ActiMode
+_activations = {
+    b'': ActiMode.AC_MODE_NONE,
+    b'Relu': ActiMode.AC_MODE_RELU,
+    b'Sigmoid': ActiMode.AC_MODE_SIGMOID,
+}
+
 class ONNXModel(object):
-    def __init__(self, filename):
+    def __init__(self, filename, mmap_external_data=False):
+        """filename: the path of the .onnx file, or an onnx.ModelProto.
+        mmap_external_data: for the models saved with external data, memory-map
+            the data files instead of reading them into the protobuf, and upload
+            the initializers one at a time, so that the host memory used by
+            load_weights stays bounded by the largest initializer.
+        """
+        self.mmap_external_data = mmap_external_data
+        # the directory of the external data files, and their np.memmap by location
+        self.base_dir = None
+        self.external_data_files = {}
         if type(filename) == str:
-            model = onnx.load(filename)
+            if mmap_external_data:
+                model = onnx.load(filename, load_external_data=False)
+                self.base_dir = os.path.dirname(os.path.abspath(filename))
+            else:
+                model = onnx.load(filename)
         else:
+            assert not mmap_external_data, "mmap_external_data needs the path of the model"
             model = filename
         # for node in model.graph.node:
         #     print(node)
@@ -68,8 +95,96 @@ class ONNXModel(object):
         self.outputs = {}
         for output in model.graph.output:
             self.outputs[output.name] = output
+        self.initializers = {}
+        for initializer in model.graph.initializer:
+            self.initializers[initializer.name] = initializer
+            if initializer.name not in self.inputs:
+                self.inputs[initializer.name] = ONNXTensor(initializer.name, initializer.dims, 2)
         self.model = model
         self.symbol_table = {}
+        # (op, parameter id, initializer name, transform) of the weights to load
+        self.parameter_table = []
+        # the RewritePass run by apply before creating the ops, see rewrite.py
+        self.rewrite_passes = list(default_rewrite_passes)
+        # the tensors computed on import by the constant folding and the
+        # rewrite passes, name -> numpy array
+        self.folded_weights = {}
+
+    def _add_parameters(self, ffmodel, inputs, transforms=None):
+        # Map the initializers in inputs onto the parameters of the op created last,
+        # in the order of its parameters. A transform turns the ONNX array into
+        # the layout of the FlexFlow parameter.
+        layers = ffmodel.get_layers()
+        op = layers[len(layers)-1]
+        for i, name in enumerate(inputs):
+            if name not in self.initializers and name not in self.folded_weights:
+                continue
+            transform = None
+            if transforms != None:
+                transform = transforms[i]
+            self.parameter_table.append((op, i, name, transform))
+
+    def _get_initializer_array(self, name):
+        if name in self.folded_weights:
+            return self.folded_weights[name]
+        initializer = self.initializers[name]
+        if initializer.data_location == onnx.TensorProto.EXTERNAL and self.base_dir != None:
+            return self._get_external_data_array(initializer)
+        return numpy_helper.to_array(initializer)
+
+    def _get_external_data_array(self, initializer):
+        # a read-only view of the initializer in its memory-mapped data file,
+        # the pages are read by the copy into the FlexFlow parameter
+        info = {entry.key: entry.value for entry in initializer.external_data}
+        location = info["location"]
+        if location not in self.external_data_files:
+            path = os.path.join(self.base_dir, location)
+            self.external_data_files[location] = np.memmap(path, dtype=np.uint8, mode='r')
+        data = self.external_data_files[location]
+        dtype = np.dtype(onnx.helper.tensor_dtype_to_np_dtype(initializer.data_type)).newbyteorder('<')
+        offset = int(info.get("offset", 0))
+        length = int(info.get("length", int(np.prod(initializer.dims)) * dtype.itemsize))
+        return data[offset:offset+length].view(dtype).reshape(tuple(initializer.dims))
+
+    def _get_weight_dims(self, name):
+        # the weights computed by the constant folding and the rewrite passes,
+        # e.g. the kernels of FoldBatchNorm, are not in the inputs of the graph
+        if name in self.folded_weights:
+            return list(self.folded_weights[name].shape)
+        return self.inputs[name].dims
+
+    def _get_constant(self, name):
+        # the parameters passed as graph inputs have no value
+        if name in self.initializers or name in self.folded_weights:
+            return self._get_initializer_array(name)
+        return None
+
+    def load_weights(self, ffmodel):
+        """Copy the initializers of the ONNX graph into the parameters of the ops
+        created by apply. Call it after ffmodel.init_layers(), which initializes
+        the parameters. The weights of the ONNX models exported without
+        parameters are left to the initializers of FlexFlow.
+        """
+        parameters = []
+        np_arrays = []
+        for op, parameter_id, name, transform in self.parameter_table:
+            np_array = self._get_initializer_array(name)
+            if transform != None:
+                np_array = transform(np_array)
+            if np_array.dtype != 'float32':
+                np_array = np_array.astype('float32')
+            parameters.append(op.get_parameter_tensor_by_id(parameter_id))
+            # a no-op for the arrays of raw_data and of the memory-mapped
+            # external data, which are used in place
+            np_arrays.append(np.ascontiguousarray(np_array))
+            if self.mmap_external_data:
+                # upload now, so that the transformed copy can be freed
+                ffmodel.set_parameters(parameters, np_arrays)
+                parameters = []
+                np_arrays = []
+        if len(parameters) > 0:
+            ffmodel.set_parameters(parameters, np_arrays)
+        logging.debug("load {} initializers".format(len(self.parameter_table)))
 
     def handleAdd(self, ffmodel, node):
         input0 = self.symbol_table[node.input[0]]
@@ -79,7 +194,6 @@ class ONNXModel(object):
         logging.debug("ffmodel.add({}, {}, name={})".format(node.input[0], node.input[1], node.name))
         
     def handleSub(self, ffmodel, node):
-        print(node)
         input0 = self.symbol_table[node.input[0]]
         input1 = self.symbol_table[node.input[1]]
         output = ffmodel.subtract(input0, input1, name=node.name)
@@ -142,9 +256,13 @@ class ONNXModel(object):
 
     def handleBatchNormalization(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
-        output = ffmodel.batch_norm(input)
+        attribute = {x.name: x for x in node.attribute}
+        relu = "activation" in attribute and attribute["activation"].s == b'Relu'
+        output = ffmodel.batch_norm(input, relu, name=node.name)
+        # FlexFlow normalizes with the batch statistics, only scale and bias are parameters
+        self._add_parameters(ffmodel, node.input[1:3])
         self.symbol_table[node.output[0]] = output
-        logging.debug("ffmodel.batch_norm({})".format(node.input[0]))
+        logging.debug("ffmodel.batch_norm({}, {}, name={})".format(node.input[0], relu, node.name))
 
     def handleConv(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
@@ -164,10 +282,14 @@ class ONNXModel(object):
         else:
             assert 0, "padding is missing"
         group = attribute["group"].i
-        out_channels = self.inputs[node.input[1]].dims[0]
-        output = ffmodel.conv2d(input, out_channels, kernel[0], kernel[1], stride[0], stride[1], padding[0], padding[1], ActiMode.AC_MODE_NONE, group, name=node.name)
+        out_channels = self._get_weight_dims(node.input[1])[0]
+        use_bias = len(node.input) > 2
+        activation = _activations[attribute["activation"].s] if "activation" in attribute else ActiMode.AC_MODE_NONE
+        output = ffmodel.conv2d(input, out_channels, kernel[0], kernel[1], stride[0], stride[1], padding[0], padding[1], activation, group, use_bias, name=node.name)
+        # ONNX and FlexFlow both lay out the kernel as (out_channels, in_channels/group, kernel_h, kernel_w)
+        self._add_parameters(ffmodel, node.input[1:])
         self.symbol_table[node.output[0]] = output
-        logging.debug("ffmodel.conv2d({}, {}, {}, {}, {}, {}, {}, {}, name={})".format(node.input[0], out_channels, kernel[0], kernel[1], stride[0], stride[1], padding[0], padding[1], node.name))
+        logging.debug("ffmodel.conv2d({}, {}, {}, {}, {}, {}, {}, {}, {}, name={})".format(node.input[0], out_channels, kernel[0], kernel[1], stride[0], stride[1], padding[0], padding[1], activation, node.name))
 
     def handleDropout(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
@@ -195,9 +317,28 @@ class ONNXModel(object):
         input = self.symbol_table[node.input[0]]
         attribute = {x.name: x for x in node.attribute}
         dim = attribute["out_dim"].i
-        output = ffmodel.dense(input, dim, name=node.name)
+        use_bias = len(node.input) > 2
+        activation = _activations[attribute["activation"].s] if "activation" in attribute else ActiMode.AC_MODE_NONE
+        output = ffmodel.dense(input, dim, activation, use_bias, name=node.name)
+        # FlexFlow lays out the kernel as (out_dim, in_dim), like Gemm with transB,
+        # MatMul lays it out as (in_dim, out_dim)
+        trans_b = attribute["trans_b"].i if "trans_b" in attribute else 1
+        alpha = attribute["alpha"].f if "alpha" in attribute else 1.0
+        beta = attribute["beta"].f if "beta" in attribute else 1.0
+        def kernel_transform(kernel):
+            if trans_b == 0:
+                kernel = kernel.T
+            if alpha != 1.0:
+                kernel = kernel * alpha
+            return kernel
+        def bias_transform(bias):
+            bias = bias.reshape(-1)
+            if beta != 1.0:
+                bias = bias * beta
+            return bias
+        self._add_parameters(ffmodel, node.input[1:], [kernel_transform, bias_transform])
         self.symbol_table[node.output[0]] = output
-        logging.debug("ffmodel.dense({}, {}, name={})".format(node.input[0], dim, node.name))
+        logging.debug("ffmodel.dense({}, {}, {}, name={})".format(node.input[0], dim, activation, node.name))
 
     def handleMaxPool(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
@@ -227,10 +368,16 @@ class ONNXModel(object):
         logging.debug("ffmodel.relu({})".format(node.input[0]))
 
     def handlePad(self, ffmodel, node):
+        # the zero paddings before a Conv are fused into it by FusePadConv
         input = self.symbol_table[node.input[0]]
-        output = input
-        self.symbol_table[node.output[0]] = output
-        logging.warn("pass-through pad")
+        attribute = {x.name: x for x in node.attribute}
+        if len(node.input) > 1:
+            pads = self._get_constant(node.input[1])
+        else:
+            pads = attribute["pads"].ints
+        assert pads is not None and all(pad == 0 for pad in pads), "Pad is only supported before a Conv"
+        self.symbol_table[node.output[0]] = input
+        logging.debug("pass-through pad({})".format(node.input[0]))
 
     def handleSoftmax(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
@@ -240,24 +387,40 @@ class ONNXModel(object):
 
     def handleReshape(self, ffmodel, node):
         input = self.symbol_table[node.input[0]]
-        shape = self.symbol_table[node.input[1]]
-        output = ffmodel.reshape(input, list(shape.int64_data), name=node.name)
+        attribute = {x.name: x for x in node.attribute}
+        # the shapes computed from the input shapes are folded by fold_constants
+        shape = self._get_constant(node.input[1])
+        assert shape is not None, "the shape of Reshape {} is not a constant".format(node.name)
+        allowzero = attribute["allowzero"].i if "allowzero" in attribute else 0
+        dims = get_reshape_dims(input.dims, shape, allowzero)
+        output = ffmodel.reshape(input, dims, name=node.name)
         self.symbol_table[node.output[0]] = output
-        logging.debug("ffmodel.reshape({}, {}, name={})".format(node.input[0], list(shape.int64_data), node.name))
+        logging.debug("ffmodel.reshape({}, {}, name={})".format(node.input[0], dims, node.name))
     
     def handleCast(self, ffmodel, node):
-        # TODO: add cast
+        # the casts of constants are folded, FlexFlow has no op to cast the other tensors
         input = self.symbol_table[node.input[0]]
+        attribute = {x.name: x for x in node.attribute}
+        to = attribute["to"].i
+        if to not in (onnx.TensorProto.FLOAT, onnx.TensorProto.DOUBLE, onnx.TensorProto.INT32, onnx.TensorProto.INT64) or onnx_to_ff_dt(to) != input.data_type:
+            logging.warning("Cast {} is not supported, the tensor keeps its data type".format(node.name))
         self.symbol_table[node.output[0]] = input
-        logging.warning("Not implemented handle: {}".format(node.op_type))
         
     def handleUnsqueeze(self, ffmodel, node):
-        # TODO: add unsqueeze
         input = self.symbol_table[node.input[0]]
         attribute = {x.name: x for x in node.attribute}
-        axes = attribute["axes"].ints
-        self.symbol_table[node.output[0]] = input
-        logging.warning("Not implemented handle: {}".format(node.op_type))
+        # axes is an attribute before opset 13 and an input since
+        if len(node.input) > 1:
+            axes = self._get_constant(node.input[1])
+        else:
+            axes = attribute["axes"].ints
+        dims = list(input.dims)
+        ndim = len(dims) + len(axes)
+        for axis in sorted(int(axis) % ndim for axis in axes):
+            dims.insert(axis, 1)
+        output = ffmodel.reshape(input, dims, name=node.name)
+        self.symbol_table[node.output[0]] = output
+        logging.debug("ffmodel.reshape({}, {}, name={})".format(node.input[0], dims, node.name))
         
     def handleConstant(self, ffmodel, node):
         attribute = {x.name: x for x in node.attribute}
@@ -277,15 +440,17 @@ class ONNXModel(object):
         self.symbol_table[node.output[0]] = output
         
     def handleRange(self, ffmodel, node):
-        # TODO: add range
-        start = self.symbol_table[node.input[0]]
-        limit = self.symbol_table[node.input[1]]
-        delta = self.symbol_table[node.input[2]]
-        self.symbol_table[node.output[0]] = start
-        logging.warning("Not implemented handle: {}".format(node.op_type))
+        # the ranges of constants and of static shapes are folded by fold_constants
+        assert 0, "Range {} of computed tensors is not supported".format(node.name)
 
-    def apply(self, ffmodel, input_dict):
-        self._fusion()
+    def apply(self, ffmodel, input_dict, comp_mode=None):
+        """Create the ops of the ONNX graph in ffmodel, after rewriting the graph
+        with rewrite_passes. With CompMode.INFERENCE, the BatchNormalizations are
+        also folded into the Conv or Dense before them, which only holds for a
+        model compiled with the same comp_mode. Returns the output tensor.
+        """
+        self._fold_constants(input_dict)
+        self._rewrite(comp_mode)
         self.symbol_table.update(input_dict)
         # self.symbol_table = input_dict.copy()
         # for initializer in self.model.graph.initializer:
@@ -299,53 +464,31 @@ class ONNXModel(object):
                 logging.warning("Can't handle: {}".format(node.op_type))
                 #assert 0
         return self.symbol_table[self.model.graph.output[0].name]
-        
-    def _fusion(self):
-        flag = True
-        while flag == True:
-            idx = 0
-            flag_found = False
-            for node in self.model.graph.node:
-                if node.op_type == 'MatMul':
-                    output = node.output[0]
-                    for add_node in self.model.graph.node:
-                        if add_node.op_type == 'Add' and (add_node.input[0] == output or add_node.input[1] == output):
-                            #print(node, add_node)
-                            flag_found = True
-                            dim = self.inputs[node.input[1]].dims[1]
-                            dense_node = onnx.helper.make_node('Dense', inputs=[node.input[0]], outputs=[add_node.output[0]], out_dim=dim)
-                            #print(dense_node)
-                            break
-                    if flag_found:
-                        self.model.graph.node.insert(idx, dense_node)
-                        self.model.graph.node.remove(add_node)
-                        self.model.graph.node.remove(node)
-                        break
-                
-                elif node.op_type == 'Gemm':
-                    flag_found = True
-                    dim = self.inputs[node.input[1]].dims[0]
-                    dense_node = onnx.helper.make_node('Dense', inputs=[node.input[0]], outputs=[node.output[0]], out_dim=dim)
-                    self.model.graph.node.insert(idx, dense_node)
-                    self.model.graph.node.remove(node)
-                    break
-                    
-                idx += 1
-            flag = flag_found
-        
-        for node in self.model.graph.node:
-            print(node)
-        
+
+    def _fold_constants(self, input_dict):
+        # evaluate the constant subgraphs with the dims of the FlexFlow inputs,
+        # so that the graph only keeps the ops computed by FlexFlow
+        input_dims = {name: list(tensor.dims) for name, tensor in input_dict.items()}
+        constants = fold_constants(self.model, input_dims, self._get_constant)
+        self.folded_weights.update(constants)
+        for name, value in constants.items():
+            # the scalars are passed as numbers, as handleConstant does
+            if value.ndim == 0 and value.dtype == np.float32:
+                self.symbol_table[name] = float(value)
+
+    def _rewrite(self, comp_mode=None):
+        weights = {name: tensor.dims for name, tensor in self.inputs.items()}
+        for name, value in self.folded_weights.items():
+            weights[name] = list(value.shape)
+        passes = self.rewrite_passes
+        if comp_mode == CompMode.INFERENCE:
+            passes = passes + [FoldBatchNorm()]
+        folded_weights = rewrite_graph(self.model.graph, weights, passes, self._get_constant)
+        self.folded_weights.update(folded_weights)
+
 class ONNXModelKeras(ONNXModel):
-    def __init__(self, filename, ffconfig=None, ffmodel=None):
-        super(ONNXModelKeras, self).__init__(filename)
-        for initializer in self.model.graph.initializer:
-            if ('/bias' in initializer.name or '/BiasAdd/ReadVariableOp' in initializer.name )and 'dense' in initializer.name:
-                # self.symbol_table[initializer.name] = self._create_initializer_tensor(ffconfig, ffmodel, initializer)
-                pass
-            else:
-                tensor = ONNXTensor(initializer.name, initializer.dims, 2)
-                self.inputs[initializer.name] = tensor
+    def __init__(self, filename, ffconfig=None, ffmodel=None, mmap_external_data=False):
+        super(ONNXModelKeras, self).__init__(filename, mmap_external_data)
         
     # def handleMatMul(self, ffmodel, node):
     #     print("########################################I am in Keras MatMul")
@@ -361,15 +504,4 @@ class ONNXModelKeras(ONNXModel):
         logging.debug("ffmodel.tranpose({})".format(node.input[0]))
         
     def handleReshape(self, ffmodel, node):
-        print("########################################I am in Keras Reshape")
         self.handleFlatten(ffmodel, node)
-    
-    def _create_initializer_tensor(self, ffconfig, ffmodel, input):
-        if len(input.dims) == 1:
-            dims = [ffconfig.batch_size, input.dims[0]]
-            print("dims", dims)
-        else:
-            assert 0
-        tensor = ffmodel.create_constant(dims, 0.0, DataType.DT_FLOAT)
-        print("create constant", input.name)
-        return tensor
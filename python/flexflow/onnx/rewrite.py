@@ -0,0 +1,416 @@
+# Copyright 2020 Stanford University, Los Alamos National Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+from collections import deque
+import numpy as np
+import onnx
+
+class ONNXGraph(object):
+    """The nodes of an ONNX graph with an index of the producer and the consumers
+    of every tensor, so that the rewrite passes find their patterns and splice
+    the graph in constant time. The removed nodes leave a None in the node list,
+    which keeps the ids of the other nodes and the topological order.
+    """
+    def __init__(self, graph, weights, get_array=None):
+        self.nodes = list(graph.node)
+        # the tensors that are not computed by the graph: initializers and
+        # parameters passed as graph inputs, name -> dims
+        self.weights = weights
+        # name -> numpy array of an initializer, None for the parameters
+        # passed as graph inputs, which have no value
+        self._get_array = get_array
+        # the weights computed by the passes, name -> numpy array
+        self.new_weights = {}
+        self.outputs = set(output.name for output in graph.output)
+        self.producers = {}
+        self.consumers = {}
+        for node_id, node in enumerate(self.nodes):
+            self._add_index(node_id, node)
+        # ids of the nodes around the last rewrites, which may match again
+        self.touched = []
+
+    def _add_index(self, node_id, node):
+        for name in node.output:
+            self.producers[name] = node_id
+        for name in node.input:
+            self.consumers.setdefault(name, set()).add(node_id)
+
+    def _remove_index(self, node_id, node):
+        for name in node.output:
+            if self.producers.get(name) == node_id:
+                del self.producers[name]
+        for name in node.input:
+            self.consumers[name].discard(node_id)
+
+    def _touch(self, node):
+        for name in node.input:
+            if name in self.producers:
+                self.touched.append(self.producers[name])
+        for name in node.output:
+            self.touched.extend(self.consumers.get(name, ()))
+
+    def get_producer(self, name):
+        """Return the node computing the tensor name, None for the inputs and weights."""
+        node_id = self.producers.get(name)
+        if node_id == None:
+            return None, None
+        return node_id, self.nodes[node_id]
+
+    def get_only_consumer(self, name):
+        """Return the node reading the tensor name if it is its only reader and
+        name is not a graph output, so the tensor can be fused away.
+        """
+        consumers = self.consumers.get(name, ())
+        if len(consumers) != 1 or name in self.outputs:
+            return None, None
+        node_id = next(iter(consumers))
+        return node_id, self.nodes[node_id]
+
+    def is_weight(self, name):
+        return name in self.weights and name not in self.producers
+
+    def get_array(self, name):
+        if name in self.new_weights:
+            return self.new_weights[name]
+        if self._get_array == None or not self.is_weight(name):
+            return None
+        return self._get_array(name)
+
+    def add_weight(self, name, array):
+        self.new_weights[name] = array
+        self.weights[name] = list(array.shape)
+
+    def replace(self, node_ids, new_node):
+        """Replace the nodes node_ids by new_node, which takes the place of the
+        last of them, after all its inputs are computed.
+        """
+        for node_id in node_ids:
+            self._remove_index(node_id, self.nodes[node_id])
+            self.nodes[node_id] = None
+        new_id = max(node_ids)
+        self.nodes[new_id] = new_node
+        self._add_index(new_id, new_node)
+        self.touched.append(new_id)
+        self._touch(new_node)
+        return new_id
+
+    def bypass(self, node_id, input_name):
+        """Remove the node node_id, whose only output equals the tensor
+        input_name, and let its consumers read input_name.
+        """
+        node = self.nodes[node_id]
+        output_name = node.output[0]
+        if output_name in self.outputs:
+            return False
+        self._remove_index(node_id, node)
+        self.nodes[node_id] = None
+        for consumer_id in self.consumers.pop(output_name, ()):
+            consumer = self.nodes[consumer_id]
+            for i, name in enumerate(consumer.input):
+                if name == output_name:
+                    consumer.input[i] = input_name
+            self.consumers.setdefault(input_name, set()).add(consumer_id)
+            self.touched.append(consumer_id)
+        if input_name in self.producers:
+            self.touched.append(self.producers[input_name])
+        return True
+
+    def remove_if_unused(self, node_id):
+        """Remove the node node_id if none of its outputs is read."""
+        node = self.nodes[node_id]
+        for name in node.output:
+            if len(self.consumers.get(name, ())) > 0 or name in self.outputs:
+                return False
+        self._remove_index(node_id, node)
+        self.nodes[node_id] = None
+        self._touch(node)
+        return True
+
+    def to_graph(self, graph):
+        """Write the rewritten nodes back into graph, in topological order."""
+        nodes = [node for node in self.nodes if node != None]
+        del graph.node[:]
+        graph.node.extend(nodes)
+
+def _get_attribute(node, name, default):
+    for attribute in node.attribute:
+        if attribute.name == name:
+            return onnx.helper.get_attribute_value(attribute)
+    return default
+
+class RewritePass(object):
+    """A pattern rewrite rooted at the nodes of op_types. apply returns whether
+    it rewrote the graph.
+    """
+    op_types = ()
+
+    def apply(self, graph, node_id, node):
+        raise NotImplementedError
+
+class MatMulToDense(RewritePass):
+    """MatMul by a weight -> Dense without bias. The kernel keeps the
+    (in_dim, out_dim) layout of MatMul, see ONNXModel.handleDense.
+    """
+    op_types = ('MatMul',)
+
+    def apply(self, graph, node_id, node):
+        weight = node.input[1]
+        if not graph.is_weight(weight) or len(graph.weights[weight]) != 2:
+            return False
+        dense_node = onnx.helper.make_node('Dense', inputs=[node.input[0], weight], outputs=[node.output[0]],
+                                           name=node.name, out_dim=graph.weights[weight][1], trans_b=0)
+        graph.replace([node_id], dense_node)
+        return True
+
+class FuseDenseAdd(RewritePass):
+    """Dense without bias + Add of a bias -> Dense."""
+    op_types = ('Add',)
+
+    def apply(self, graph, node_id, node):
+        for i in range(2):
+            dense_id, dense_node = graph.get_producer(node.input[i])
+            bias = node.input[1-i]
+            if dense_node == None or dense_node.op_type != 'Dense' or len(dense_node.input) != 2:
+                continue
+            if _get_attribute(dense_node, 'activation', b'') != b'' or not graph.is_weight(bias):
+                continue
+            out_dim = _get_attribute(dense_node, 'out_dim', 0)
+            # a bias of shape (out_dim,) or (1, out_dim)
+            dims = list(graph.weights[bias])
+            if len(dims) == 0 or dims[-1] != out_dim or any(dim != 1 for dim in dims[:-1]):
+                continue
+            if graph.get_only_consumer(dense_node.output[0])[0] != node_id:
+                continue
+            new_node = onnx.helper.make_node('Dense', inputs=[dense_node.input[0], dense_node.input[1], bias],
+                                             outputs=[node.output[0]], name=dense_node.name)
+            new_node.attribute.extend(dense_node.attribute)
+            graph.replace([dense_id, node_id], new_node)
+            return True
+        return False
+
+class GemmToDense(RewritePass):
+    """Gemm -> Dense, whose kernel is transposed unless transB is set. A Gemm
+    with transA has no Dense equivalent and is not rewritten.
+    """
+    op_types = ('Gemm',)
+
+    def apply(self, graph, node_id, node):
+        if _get_attribute(node, 'transA', 0) != 0:
+            return False
+        if any(not graph.is_weight(name) for name in node.input[1:]):
+            return False
+        trans_b = _get_attribute(node, 'transB', 0)
+        dim = graph.weights[node.input[1]][0 if trans_b == 1 else 1]
+        dense_node = onnx.helper.make_node('Dense', inputs=list(node.input), outputs=[node.output[0]], name=node.name,
+                                           out_dim=dim, trans_b=trans_b,
+                                           alpha=_get_attribute(node, 'alpha', 1.0),
+                                           beta=_get_attribute(node, 'beta', 1.0))
+        graph.replace([node_id], dense_node)
+        return True
+
+class FuseActivation(RewritePass):
+    """Conv/Dense + activation -> Conv/Dense with the activation attribute, for
+    the activations the FlexFlow ops compute in place.
+    """
+    op_types = ('Relu', 'Sigmoid')
+    fusable_activations = {
+        'BatchNormalization': ('Relu',),
+        'Conv': ('Relu',),
+        'Dense': ('Relu', 'Sigmoid'),
+    }
+
+    def apply(self, graph, node_id, node):
+        producer_id, producer = graph.get_producer(node.input[0])
+        if producer == None or node.op_type not in self.fusable_activations.get(producer.op_type, ()):
+            return False
+        if _get_attribute(producer, 'activation', b'') != b'':
+            return False
+        if graph.get_only_consumer(producer.output[0])[0] != node_id:
+            return False
+        new_node = onnx.helper.make_node(producer.op_type, inputs=list(producer.input), outputs=[node.output[0]],
+                                         name=producer.name, activation=node.op_type)
+        new_node.attribute.extend(producer.attribute)
+        graph.replace([producer_id, node_id], new_node)
+        return True
+
+class FusePadConv(RewritePass):
+    """Pad with zeros + Conv -> Conv with the padding, FlexFlow has no Pad op.
+    Only the symmetric padding of the spatial dims can be fused.
+    """
+    op_types = ('Pad',)
+
+    def apply(self, graph, node_id, node):
+        conv_id, conv = graph.get_only_consumer(node.output[0])
+        if conv == None or conv.op_type != 'Conv' or conv.input[0] != node.output[0]:
+            return False
+        if _get_attribute(node, 'mode', b'constant') != b'constant':
+            return False
+        # pads and value are attributes before opset 11 and inputs since
+        pads = _get_attribute(node, 'pads', None)
+        value = _get_attribute(node, 'value', 0.0)
+        if len(node.input) > 1:
+            pads = graph.get_array(node.input[1])
+        if len(node.input) > 2 and node.input[2] != '':
+            value = graph.get_array(node.input[2])
+        if pads is None or value is None or float(value) != 0.0 or len(node.input) > 3:
+            return False
+        pads = [int(pad) for pad in pads]
+        ndim = len(pads) // 2
+        begins, ends = pads[:ndim], pads[ndim:]
+        if begins != ends or begins[0] != 0 or begins[1] != 0:
+            return False
+        if _get_attribute(conv, 'auto_pad', b'NOTSET') not in (b'NOTSET', b'VALID'):
+            return False
+        conv_pads = list(_get_attribute(conv, 'pads', [0] * (2 * (ndim - 2))))
+        for i in range(ndim - 2):
+            conv_pads[i] += begins[i+2]
+            conv_pads[i+ndim-2] += ends[i+2]
+        attributes = [attribute for attribute in conv.attribute if attribute.name not in ('pads', 'auto_pad')]
+        new_node = onnx.helper.make_node('Conv', inputs=[node.input[0]] + list(conv.input[1:]), outputs=list(conv.output),
+                                         name=conv.name, pads=conv_pads)
+        new_node.attribute.extend(attributes)
+        graph.replace([node_id, conv_id], new_node)
+        return True
+
+class FoldBatchNorm(RewritePass):
+    """Conv/Dense + BatchNormalization -> Conv/Dense whose kernel and bias are
+    scaled by the statistics of the BatchNormalization. It is only valid at
+    inference, where BatchNormalization uses its running statistics.
+    """
+    op_types = ('BatchNormalization',)
+
+    def apply(self, graph, node_id, node):
+        producer_id, producer = graph.get_producer(node.input[0])
+        if producer == None or producer.op_type not in ('Conv', 'Dense') or len(node.output) != 1:
+            return False
+        activation = _get_attribute(node, 'activation', b'')
+        if _get_attribute(producer, 'activation', b'') != b'':
+            return False
+        if activation != b'' and activation.decode() not in FuseActivation.fusable_activations[producer.op_type]:
+            return False
+        if graph.get_only_consumer(producer.output[0])[0] != node_id:
+            return False
+        scale, shift, mean, var = [graph.get_array(name) for name in node.input[1:5]]
+        kernel = graph.get_array(producer.input[1])
+        if any(array is None for array in (scale, shift, mean, var, kernel)):
+            return False
+        bias = None
+        if len(producer.input) > 2:
+            bias = graph.get_array(producer.input[2])
+            if bias is None:
+                return False
+        factor = scale / np.sqrt(var + _get_attribute(node, 'epsilon', 1e-5))
+        attributes = [attribute for attribute in producer.attribute if attribute.name not in ('trans_b', 'alpha', 'beta')]
+        if producer.op_type == 'Dense':
+            # fold alpha and beta too, and keep the (out_dim, in_dim) layout of FlexFlow
+            if _get_attribute(producer, 'trans_b', 1) == 0:
+                kernel = kernel.T
+            kernel = kernel * _get_attribute(producer, 'alpha', 1.0)
+            if bias is not None:
+                bias = bias.reshape(-1) * _get_attribute(producer, 'beta', 1.0)
+            attributes.append(onnx.helper.make_attribute('trans_b', 1))
+        if bias is None:
+            bias = np.zeros_like(mean)
+        kernel = kernel * factor.reshape((-1,) + (1,) * (kernel.ndim - 1))
+        bias = (bias - mean) * factor + shift
+        kernel_name = node.output[0] + '_folded_kernel'
+        bias_name = node.output[0] + '_folded_bias'
+        graph.add_weight(kernel_name, kernel.astype(np.float32))
+        graph.add_weight(bias_name, bias.astype(np.float32))
+        new_node = onnx.helper.make_node(producer.op_type, inputs=[producer.input[0], kernel_name, bias_name],
+                                         outputs=[node.output[0]], name=producer.name)
+        new_node.attribute.extend(attributes)
+        if activation != b'':
+            new_node.attribute.extend([onnx.helper.make_attribute('activation', activation)])
+        graph.replace([producer_id, node_id], new_node)
+        return True
+
+class EliminateIdentity(RewritePass):
+    op_types = ('Identity',)
+
+    def apply(self, graph, node_id, node):
+        return graph.bypass(node_id, node.input[0])
+
+class EliminateTranspose(RewritePass):
+    """Drop the Transposes that keep the order of the axes and the pairs of
+    Transposes that cancel each other.
+    """
+    op_types = ('Transpose',)
+
+    def apply(self, graph, node_id, node):
+        perm = _get_attribute(node, 'perm', None)
+        if perm != None and list(perm) == list(range(len(perm))):
+            return graph.bypass(node_id, node.input[0])
+        producer_id, producer = graph.get_producer(node.input[0])
+        if perm == None or producer == None or producer.op_type != 'Transpose':
+            return False
+        producer_perm = _get_attribute(producer, 'perm', None)
+        if producer_perm == None or len(producer_perm) != len(perm):
+            return False
+        if [producer_perm[p] for p in perm] != list(range(len(perm))):
+            return False
+        if not graph.bypass(node_id, producer.input[0]):
+            return False
+        graph.remove_if_unused(producer_id)
+        return True
+
+default_rewrite_passes = [
+    EliminateIdentity(),
+    EliminateTranspose(),
+    FusePadConv(),
+    MatMulToDense(),
+    FuseDenseAdd(),
+    GemmToDense(),
+    FuseActivation(),
+]
+
+def rewrite_graph(graph, weights, passes=None, get_array=None):
+    """Run the rewrite passes over the nodes of graph until none of them
+    matches. A rewrite only revisits the nodes around it, so the graph is
+    rewritten in a time linear in its size.
+
+    graph: the onnx.GraphProto to rewrite in place.
+    weights: the dims of the initializers and parameters, by name.
+    passes: the RewritePass to run, default_rewrite_passes by default.
+    get_array: function returning the numpy array of an initializer, for the
+        passes computing new weights.
+
+    Returns the weights computed by the passes, by name.
+    """
+    if passes == None:
+        passes = default_rewrite_passes
+    passes_by_op_type = {}
+    for rewrite_pass in passes:
+        for op_type in rewrite_pass.op_types:
+            passes_by_op_type.setdefault(op_type, []).append(rewrite_pass)
+    onnx_graph = ONNXGraph(graph, weights, get_array)
+    worklist = deque(range(len(onnx_graph.nodes)))
+    num_rewrites = 0
+    while len(worklist) > 0:
+        node_id = worklist.popleft()
+        node = onnx_graph.nodes[node_id]
+        if node == None:
+            continue
+        for rewrite_pass in passes_by_op_type.get(node.op_type, ()):
+            if rewrite_pass.apply(onnx_graph, node_id, node) == True:
+                logging.debug("{}: {}".format(type(rewrite_pass).__name__, node.name))
+                num_rewrites += 1
+                worklist.extend(onnx_graph.touched)
+                break
+        onnx_graph.touched = []
+    onnx_graph.to_graph(graph)
+    logging.debug("{} rewrites, {} nodes".format(num_rewrites, len(graph.node)))
+    return onnx_graph.new_weights
@@ -13,9 +13,10 @@
 # limitations under the License.
 #
 
+import struct
 import torch.fx
 import torch
-from flexflow.core.flexflow_type import ActiMode, AggrMode, PoolType, DataType, LossType, MetricsType, OpType, enum_to_int, enum_to_str
+from flexflow.core.flexflow_type import ActiMode, AggrMode, PoolType, DataType, LossType, MetricsType, OpType, enum_to_int, enum_to_str, str_to_enum
 #import onnx
 #from onnx import helper
 
@@ -53,7 +54,6 @@ def __symbolic_trace(model):
     
   graph = list()
   for node in traced.graph.nodes:
-    print(vars(node))
     if node.op == "call_module":
       assert node.target in modules_by_name, "cannot find module %s in model".format(node.target)
       graph.append(ModuleNode(node.name, node.args, node.users, modules_by_name[node.target]))
@@ -69,162 +69,196 @@ def __symbolic_trace(model):
       assert False, "Encounter unhandled operator type: {}".format(node.op)
   return graph
   
-def parse_input(op_str, node):
+class IRNode(object):
+  """An op of a traced model, in the order of execution. The inputs are the 
+  indices of the nodes producing the input tensors, the attrs are the numbers 
+  laid out as in _ir_attr_formats[op_type].
+  """
+  __slots__ = ('name', 'op_type', 'inputs', 'attrs')
+  
+  def __init__(self, name, op_type, inputs, attrs=()):
+    self.name = name
+    self.op_type = op_type
+    self.inputs = inputs
+    self.attrs = attrs
+    
+  def __repr__(self):
+    return "IRNode(%s, %s, %s, %s)" %(self.name, self.op_type.name, self.inputs, self.attrs)
+
+# op type -> struct format of the attrs, 'i' for the ints and 'd' for the floats
+_ir_attr_formats = {
+  OpType.INPUT: "",
+  OpType.OUTPUT: "",
+  OpType.ADD: "",
+  OpType.MULTIPLY: "",
+  # axis
+  OpType.CONCAT: "i",
+  # number of outputs, axis
+  OpType.SPLIT: "ii",
+  # index
+  OpType.GETITEM: "i",
+  OpType.FLAT: "",
+  # out_dim, activation, use_bias
+  OpType.LINEAR: "iii",
+  # out_channels, kernel_h, kernel_w, stride_h, stride_w, padding_h, padding_w, activation, groups, use_bias
+  OpType.CONV2D: "iiiiiiiiii",
+  # kernel, stride, padding, pool_type, activation
+  OpType.POOL2D: "iiiii",
+  OpType.BATCH_NORM: "",
+  # rate
+  OpType.DROPOUT: "d",
+  OpType.RELU: "",
+  OpType.SIGMOID: "",
+  OpType.TANH: "",
+  OpType.ELU: "",
+  OpType.SOFTMAX: "",
+}
+
+# header of the binary form: magic, version, number of nodes
+_IR_MAGIC = b"FFIR"
+_IR_VERSION = 1
+_ir_header = struct.Struct("<4sII")
+# node: op type, length of the name, number of inputs
+_ir_node = struct.Struct("<iHH")
+
+def _get_int(value):
+  # the sizes of the modules are either ints or (h, w) tuples
+  if type(value) == tuple:
+    return value[0]
+  return value
+
+def parse_input(node):
   assert node.inedges == None, "wrong format"
-  op_str = op_str + enum_to_str(OpType, OpType.INPUT) + "\n"
-  return op_str
+  return OpType.INPUT, ()
   
-def parse_output(op_str, node):
+def parse_output(node):
   #FIXME assume there is 1 output
   assert len(node.inedges) == 1, "wrong format"
-  op_str = op_str + enum_to_str(OpType, OpType.OUTPUT) + "\n"
-  return op_str
+  return OpType.OUTPUT, ()
   
-def parse_add(op_str, node):
+def parse_add(node):
   assert len(node.inedges) == 2, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.ADD) + "\n"
-  return op_str
+  return OpType.ADD, ()
   
-def parse_concat(op_str, node):
+def parse_concat(node):
   #FIXME assume it is a merge
-  print(node.inedges)
   assert len(node.inedges[0]) >= 2, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.CONCAT) + ", "
   if len(node.inedges) == 1:
-    op_str = op_str + str(1) + "\n"
+    return OpType.CONCAT, (1,)
   else:
-    op_str = op_str + str(node.inedges[1]) + "\n"
-  return op_str
+    return OpType.CONCAT, (int(node.inedges[1]),)
   
-def parse_split(op_str, node):
+def parse_split(node):
   #FIXME may be 3
   assert len(node.inedges) == 2, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.SPLIT) + ", "
-  op_str = op_str + str(node.inedges[1]) + "\n"
-  return op_str
+  return OpType.SPLIT, (len(node.outedges), int(node.inedges[1]))
   
-def parse_getitem(op_str, node):
+def parse_getitem(node):
   assert len(node.inedges) == 2, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.GETITEM) + ", "
-  op_str = op_str + str(node.inedges[1]) + "\n"
-  return op_str
+  return OpType.GETITEM, (int(node.inedges[1]),)
   
-def parse_flat(op_str, node):
+def parse_flat(node):
   if type(node) == FunctionNode:
     assert len(node.inedges) == 2, "wrong number of inputs"
   elif type(node) == ModuleNode:
     assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.FLAT) + "\n"
-  return op_str
+  return OpType.FLAT, ()
 
-def parse_linear(op_str, node):
+def parse_linear(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.LINEAR) + ", "
-  op_str = op_str + str(node.module.out_features) + ", "
-  op_str = op_str + str(enum_to_int(ActiMode, ActiMode.AC_MODE_NONE)) + ", "
-  if node.module.bias != None:
-    op_str = op_str + "1\n"
-  else:
-    op_str = op_str + "0\n"
-  return op_str
+  use_bias = 1 if node.module.bias != None else 0
+  return OpType.LINEAR, (node.module.out_features, enum_to_int(ActiMode, ActiMode.AC_MODE_NONE), use_bias)
   
-def parse_conv2d(op_str, node):
+def parse_conv2d(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.CONV2D) + ", "
-  op_str = op_str + str(node.module.out_channels) + ", "
-  op_str = op_str + str(node.module.kernel_size[0]) + ", "
-  op_str = op_str + str(node.module.kernel_size[1]) + ", "
-  op_str = op_str + str(node.module.stride[0]) + ", "
-  op_str = op_str + str(node.module.stride[1]) + ", "
-  op_str = op_str + str(node.module.padding[1]) + ", "
-  op_str = op_str + str(node.module.padding[1]) + ", "
-  op_str = op_str + str(enum_to_int(ActiMode, ActiMode.AC_MODE_NONE)) + ", "
-  op_str = op_str + str(node.module.groups) + ", "
-  if node.module.bias != None:
-    op_str = op_str + "1\n"
-  else:
-    op_str = op_str + "0\n"
-  return op_str
+  module = node.module
+  use_bias = 1 if module.bias != None else 0
+  return OpType.CONV2D, (module.out_channels, module.kernel_size[0], module.kernel_size[1], 
+                         module.stride[0], module.stride[1], module.padding[1], module.padding[1], 
+                         enum_to_int(ActiMode, ActiMode.AC_MODE_NONE), module.groups, use_bias)
   
-def parse_pool2d(op_str, node, pool_type):
+def parse_pool2d(node, pool_type):
   assert len(node.inedges) == 1, "wrong number of inputs"
   #FIXME MaxPool2d supports ceil_mode
-  op_str = op_str + enum_to_str(OpType, OpType.POOL2D) + ", "
-  op_str = op_str + str(node.module.kernel_size) + ", "
-  op_str = op_str + str(node.module.stride) + ", "
-  op_str = op_str + str(node.module.padding) + ", "
-  op_str = op_str + str(enum_to_int(PoolType, pool_type)) + ", "
-  op_str = op_str + str(enum_to_int(ActiMode, ActiMode.AC_MODE_NONE)) + "\n"
-  return op_str
+  module = node.module
+  return OpType.POOL2D, (_get_int(module.kernel_size), _get_int(module.stride), _get_int(module.padding), 
+                         enum_to_int(PoolType, pool_type), enum_to_int(ActiMode, ActiMode.AC_MODE_NONE))
   
-def parse_adaptivepool2d(op_str, node, pool_type):
+def parse_adaptivepool2d(node, pool_type):
   assert len(node.inedges) == 1, "wrong number of inputs"
   #FIXME fix kernel, stride and padding
-  op_str = op_str + enum_to_str(OpType, OpType.POOL2D) + ", "
-  op_str = op_str + str(3) + ", "
-  op_str = op_str + str(1) + ", "
-  op_str = op_str + str(0) + ", "
-  op_str = op_str + str(enum_to_int(PoolType, pool_type)) + ", "
-  op_str = op_str + str(enum_to_int(ActiMode, ActiMode.AC_MODE_NONE)) + "\n"
-  return op_str
+  return OpType.POOL2D, (3, 1, 0, enum_to_int(PoolType, pool_type), enum_to_int(ActiMode, ActiMode.AC_MODE_NONE))
   
-def parse_batchnorm2d(op_str, node):
+def parse_batchnorm2d(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
   # FIXME BatchNorm2d(64, eps=1e-05, momentum=0.1, affine=True, track_running_stats=True) args are not in FF 
-  op_str = op_str + enum_to_str(OpType, OpType.BATCH_NORM) + "\n"
-  return op_str
+  return OpType.BATCH_NORM, ()
   
-def parse_dropout(op_str, node):
+def parse_dropout(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.DROPOUT) + ", "
-  op_str = op_str + str(node.module.p) + "\n"
-  return op_str
+  return OpType.DROPOUT, (float(node.module.p),)
   
-def parse_relu(op_str, node):
+def parse_relu(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.RELU) + "\n"
-  return op_str
+  return OpType.RELU, ()
   
-def parse_sigmoid(op_str, node):
+def parse_sigmoid(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.SIGMOID) + "\n"
-  return op_str
+  return OpType.SIGMOID, ()
   
-def parse_tanh(op_str, node):
+def parse_tanh(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.TANH) + "\n"
-  return op_str
+  return OpType.TANH, ()
   
-def parse_elu(op_str, node):
+def parse_elu(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.ELU) + "\n"
-  return op_str
+  return OpType.ELU, ()
   
-def parse_softmax(op_str, node):
+def parse_softmax(node):
   assert len(node.inedges) == 1, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.SOFTMAX) + "\n"
-  return op_str
+  return OpType.SOFTMAX, ()
 
-def parse_mul(op_str,node):
+def parse_mul(node):
   assert len(node.inedges) == 2, "wrong number of inputs"
-  op_str = op_str + enum_to_str(OpType, OpType.MULTIPLY) + "\n"
-  return op_str
-  
-def parse_inoutedge(op_str, inedges, outedges):
-  if inedges == None:
-    pass
-  else:
-    for inedge in inedges:
-      op_str = op_str + inedge.name + ":"
-  op_str = op_str + ", "
-  
-  if outedges == None:
-    pass
+  return OpType.MULTIPLY, ()
+
+# module type -> function returning the op type and attrs of a ModuleNode
+_module_parsers = {
+  torch.nn.modules.linear.Linear: parse_linear,
+  torch.nn.modules.conv.Conv2d: parse_conv2d,
+  torch.nn.modules.pooling.MaxPool2d: lambda node: parse_pool2d(node, PoolType.POOL_MAX),
+  torch.nn.modules.pooling.AvgPool2d: lambda node: parse_pool2d(node, PoolType.POOL_AVG),
+  torch.nn.modules.pooling.AdaptiveAvgPool2d: lambda node: parse_adaptivepool2d(node, PoolType.POOL_AVG),
+  torch.nn.modules.batchnorm.BatchNorm2d: parse_batchnorm2d,
+  torch.nn.modules.dropout.Dropout: parse_dropout,
+  torch.nn.modules.flatten.Flatten: parse_flat,
+  torch.nn.modules.activation.ReLU: parse_relu,
+  torch.nn.modules.activation.Sigmoid: parse_sigmoid,
+  torch.nn.modules.activation.Tanh: parse_tanh,
+  torch.nn.modules.activation.ELU: parse_elu,
+  torch.nn.modules.activation.Softmax: parse_softmax,
+}
+
+def _parse_function(node):
+  # returns the input edges, the op type and the attrs of a FunctionNode
+  function_name = str(node.function)
+  if function_name.find('add') >= 0:
+    return node.inedges, parse_add(node)
+  elif function_name.find('cat') >= 0:
+    return node.inedges[0], parse_concat(node)
+  elif function_name.find('split') >= 0:
+    return (node.inedges[0],), parse_split(node)
+  elif function_name.find('flatten') >= 0:
+    return (node.inedges[0],), parse_flat(node)
+  elif function_name.find('relu') >= 0:
+    return node.inedges, parse_relu(node)
+  elif function_name.find('getitem') >= 0:
+    return (node.inedges[0],), parse_getitem(node)
+  elif function_name.find('mul') >= 0:
+    return node.inedges, parse_mul(node)
   else:
-    for outedge in outedges:
-      op_str = op_str + outedge.name + ":"
-  op_str = op_str + ", "
-  return op_str
+    # Unrecogonized type
+    assert False, "Unrecogonized built-in function: {}".format(function_name)
   
 # def parse_linear_onnx(node):
 #   assert len(node.inedges) == 1, "wrong number of inputs"
@@ -238,128 +272,131 @@ def parse_inoutedge(op_str, inedges, outedges):
 #   print(node)
 #   return node_def
 
-def torch_to_flexflow(model, filename):
-  out_file = open(filename, "w")
-  lines = torch_to_flexflow_str(model)
-  for line in lines:
-    out_file.write(line)
+def torch_to_flexflow(model, filename, binary=False):
+  """Trace model and save it for PyTorchModel, in the comma-separated text 
+  format, or in the versioned binary form of the IR if binary is True.
+  """
+  nodes = torch_to_flexflow_ir(model)
+  if binary:
+    out_file = open(filename, "wb")
+    out_file.write(ir_to_bytes(nodes))
+  else:
+    out_file = open(filename, "w")
+    for line in ir_to_str(nodes):
+      out_file.write(line)
   out_file.close()
   
 def torch_to_flexflow_str(model):
+  return ir_to_str(torch_to_flexflow_ir(model))
+  
+def torch_to_flexflow_ir(model):
+  """Trace model into a list of IRNode, in the order of execution."""
   graph = __symbolic_trace(model)
-  lines = []
+  nodes = []
+  node_ids = {}
   
   for node in graph:
-    # op name
-    op_str = node.name + ", "
-    print(node.name, type(node))
-    
-    #op type
     if type(node) == InputNode:
-      op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-      op_str = parse_input(op_str, node)
+      inedges = ()
+      op_type, attrs = parse_input(node)
       
-    if type(node) == OutputNode:
+    elif type(node) == OutputNode:
       if type(node.inedges[0]) == tuple:
-        op_str = parse_inoutedge(op_str, node.inedges[0], node.outedges)
+        inedges = node.inedges[0]
       else:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-      op_str = parse_output(op_str, node)
+        inedges = node.inedges
+      op_type, attrs = parse_output(node)
     
-    if type(node) == FunctionNode:
-      function_name = str(node.function)
-      if function_name.find('add') >= 0:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_add(op_str, node)
-        
-      elif function_name.find('cat') >= 0:
-        op_str = parse_inoutedge(op_str, node.inedges[0], node.outedges)
-        op_str = parse_concat(op_str, node)
-        
-      elif function_name.find('split') >= 0:
-        op_str = parse_inoutedge(op_str, (node.inedges[0],), node.outedges)
-        op_str = parse_split(op_str, node)
-      
-      elif function_name.find('flatten') >= 0:
-        op_str = parse_inoutedge(op_str, (node.inedges[0],), node.outedges)
-        op_str = parse_flat(op_str, node)
-        
-      elif function_name.find('relu') >= 0:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_relu(op_str, node)
-        
-      elif function_name.find('getitem') >= 0:
-        op_str = parse_inoutedge(op_str, (node.inedges[0],), node.outedges)
-        op_str = parse_getitem(op_str, node)
-      elif function_name.find('mul') >= 0:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_mul(op_str,node)
-      
-      else:
-        # Unrecogonized type
-        assert False, "Unrecogonized built-in function: {}".format(function_name)
+    elif type(node) == FunctionNode:
+      inedges, (op_type, attrs) = _parse_function(node)
     
-    if type(node) == ModuleNode:
+    elif type(node) == ModuleNode:
       assert len(node.inedges) == 1, "wrong format"
+      assert type(node.module) in _module_parsers, "unknown op {}".format(node.module)
+      inedges = node.inedges
+      op_type, attrs = _module_parsers[type(node.module)](node)
       
-      if type(node.module) == torch.nn.modules.linear.Linear:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_linear(op_str, node)
-        #parse_linear_onnx(node)
-      
-      elif type(node.module) == torch.nn.modules.conv.Conv2d:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_conv2d(op_str, node)
-          
-      elif type(node.module) == torch.nn.modules.pooling.MaxPool2d:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_pool2d(op_str, node, PoolType.POOL_MAX)
-        
-      elif type(node.module) == torch.nn.modules.pooling.AvgPool2d:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_pool2d(op_str, node, PoolType.POOL_AVG)
-        
-      elif type(node.module) == torch.nn.modules.pooling.AdaptiveAvgPool2d:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_adaptivepool2d(op_str, node, PoolType.POOL_AVG)
-        
-      elif type(node.module) == torch.nn.modules.batchnorm.BatchNorm2d:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_batchnorm2d(op_str, node)
-
-      elif type(node.module) == torch.nn.modules.dropout.Dropout:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_dropout(op_str, node)
-        
-      elif type(node.module) == torch.nn.modules.flatten.Flatten:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_flat(op_str, node)
-          
-      elif type(node.module) == torch.nn.modules.activation.ReLU:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_relu(op_str, node)
-        
-      elif type(node.module) == torch.nn.modules.activation.Sigmoid:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_sigmoid(op_str, node)
-        
-      elif type(node.module) == torch.nn.modules.activation.Tanh:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_tanh(op_str, node)
-        
-      elif type(node.module) == torch.nn.modules.activation.ELU:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_elu(op_str, node)
-        
-      elif type(node.module) == torch.nn.modules.activation.Softmax:
-        op_str = parse_inoutedge(op_str, node.inedges, node.outedges)
-        op_str = parse_softmax(op_str, node)
-      
-      else:
-        print(node.module)
-        assert 0, "unknown op"
-      
-    print(op_str)
-    lines.append(op_str)
+    inputs = [node_ids[inedge.name] for inedge in inedges]
+    node_ids[node.name] = len(nodes)
+    nodes.append(IRNode(node.name, op_type, inputs, attrs))
     
-  return lines
\ No newline at end of file
+  return nodes
+
+def ir_to_str(nodes):
+  """Format nodes in the comma-separated text format, one line per node: 
+  name, input names, output names, op type, attrs.
+  """
+  consumers = [[] for node in nodes]
+  for node in nodes:
+    for input in node.inputs:
+      consumers[input].append(node.name)
+  lines = []
+  for i, node in enumerate(nodes):
+    attrs = node.attrs
+    if node.op_type == OpType.SPLIT:
+      # the number of outputs is the number of consumers
+      attrs = attrs[1:]
+    items = [node.name, 
+             "".join(nodes[input].name + ":" for input in node.inputs), 
+             "".join(name + ":" for name in consumers[i]), 
+             enum_to_str(OpType, node.op_type)]
+    items.extend(str(attr) for attr in attrs)
+    lines.append(", ".join(items) + "\n")
+  return lines
+  
+def ir_from_str(lines):
+  """Parse the lines of the comma-separated text format into a list of IRNode."""
+  nodes = []
+  node_ids = {}
+  for line in lines:
+    items = [item.strip() for item in line.split(",")]
+    assert len(items) >= 4, "wrong format"
+    name = items[0]
+    inputs = [node_ids[input] for input in items[1].split(":") if input != ""]
+    num_outputs = len([output for output in items[2].split(":") if output != ""])
+    op_type = str_to_enum(OpType, items[3])
+    attr_format = _ir_attr_formats[op_type]
+    if op_type == OpType.SPLIT:
+      items.insert(4, str(num_outputs))
+    assert len(items) == 4 + len(attr_format), "wrong format"
+    attrs = tuple(int(item) if f == "i" else float(item) for f, item in zip(attr_format, items[4:]))
+    node_ids[name] = len(nodes)
+    nodes.append(IRNode(name, op_type, inputs, attrs))
+  return nodes
+  
+def ir_to_bytes(nodes):
+  """Serialize nodes into the binary form: a header with the version, then 
+  for each node its op type, name, input indices and attrs, little-endian.
+  """
+  chunks = [_ir_header.pack(_IR_MAGIC, _IR_VERSION, len(nodes))]
+  for node in nodes:
+    name = node.name.encode("utf-8")
+    chunks.append(_ir_node.pack(node.op_type.value, len(name), len(node.inputs)))
+    chunks.append(name)
+    chunks.append(struct.pack("<%di" %(len(node.inputs)), *node.inputs))
+    chunks.append(struct.pack("<" + _ir_attr_formats[node.op_type], *node.attrs))
+  return b"".join(chunks)
+  
+def is_ir_bytes(data):
+  return data[:len(_IR_MAGIC)] == _IR_MAGIC
+  
+def ir_from_bytes(data):
+  """Deserialize the binary form written by ir_to_bytes into a list of IRNode."""
+  magic, version, num_nodes = _ir_header.unpack_from(data, 0)
+  assert magic == _IR_MAGIC, "not a FlexFlow IR file"
+  assert version == _IR_VERSION, "unsupported IR version %d, expected %d" %(version, _IR_VERSION)
+  offset = _ir_header.size
+  nodes = []
+  for i in range(num_nodes):
+    op_value, name_length, num_inputs = _ir_node.unpack_from(data, offset)
+    offset += _ir_node.size
+    name = bytes(data[offset:offset+name_length]).decode("utf-8")
+    offset += name_length
+    inputs = list(struct.unpack_from("<%di" %(num_inputs), data, offset))
+    offset += 4 * num_inputs
+    op_type = OpType(op_value)
+    attr_struct = struct.Struct("<" + _ir_attr_formats[op_type])
+    attrs = attr_struct.unpack_from(data, offset)
+    offset += attr_struct.size
+    nodes.append(IRNode(name, op_type, inputs, attrs))
+  return nodes
@@ -13,19 +13,13 @@
 # limitations under the License.
 #
 
-from flexflow.core.flexflow_type import ActiMode, AggrMode, PoolType, DataType, LossType, MetricsType, OpType, str_to_enum, int_to_enum
+from flexflow.core.flexflow_type import ActiMode, AggrMode, PoolType, DataType, LossType, MetricsType, OpType
 import flexflow.torch.fx as fx
 
-class FXTensor(object):
-  def __init__(self, fftensor):
-    self.fftensor = fftensor;
-
 class PyTorchModel(object):
   def __init__(self, filename=None, model=None):
-    self.tensor_dict = {}
-    self.lines = None
-    self.input_ops_list = None
-    self.output_ops_list = None
+    # the IRNode of the traced model, see flexflow.torch.fx
+    self.nodes = None
     
     if filename != None:
       self._init_from_file(filename)
@@ -35,217 +29,121 @@ class PyTorchModel(object):
   def apply(self, ffmodel, input_tensors):
     output_tensors = []
     input_idx = 0
-    for line in self.lines:
-      items = line.strip().split(",")
-      assert len(items) >= 3, "wrong format"
-      items = [i.strip() for i in items]
-      print(items)
-
-      #get op name
-      op_name = items[0]
-
-      #get input ops' name
-      self.input_ops_list = items[1].split(":")
-      self.input_ops_list = [i.strip() for i in self.input_ops_list]
-      for i in self.input_ops_list:
-        if i == "":
-          self.input_ops_list.remove(i)
-          
-      #get output ops' name
-      self.output_ops_list = items[2].split(":")
-      self.output_ops_list = [i.strip() for i in self.output_ops_list]
-      for i in self.output_ops_list:
-        if i == "":
-          self.output_ops_list.remove(i)
-
-      #get op type
-      op_type = str_to_enum(OpType, items[3])
+    # the output of each node, a list for SPLIT
+    outputs = [None] * len(self.nodes)
+    for node_idx, node in enumerate(self.nodes):
+      op_name = node.name
+      op_type = node.op_type
+      inputs = [outputs[i] for i in node.inputs]
           
       if op_type == OpType.INPUT:
-        assert len(self.input_ops_list) == 0, "wrong format"
+        assert len(inputs) == 0, "wrong format"
         output = input_tensors[input_idx]
-        output = FXTensor(output)
         input_idx += 1
 
       elif op_type == OpType.LINEAR:
-        assert len(items) == 7, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        od = int(items[4])
-        activ = int_to_enum(ActiMode, int(items[5]))
-        bias = bool(int(items[6]))
-        output = ffmodel.dense(input=input_tensor, out_dim=od, activation=activ, use_bias=bias, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        od, activ, bias = node.attrs
+        output = ffmodel.dense(input=inputs[0], out_dim=od, activation=ActiMode(activ), use_bias=bool(bias), name=op_name)
 
       elif op_type == OpType.CONV2D:
-        assert len(items) == 14, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        oc = int(items[4])
-        kh = int(items[5])
-        kw = int(items[6])
-        sh = int(items[7])
-        sw = int(items[8])
-        ph = int(items[9])
-        pw = int(items[10])
-        activ = int_to_enum(ActiMode, int(items[11]))
-        group = int(items[12])
-        bias = bool(int(items[13]))
-        output = ffmodel.conv2d(input=input_tensor, out_channels=oc, kernel_h=kh, kernel_w=kw, stride_h=sh, stride_w=sw, padding_h=ph, padding_w=pw, activation=activ, groups=group, use_bias=bias, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        oc, kh, kw, sh, sw, ph, pw, activ, group, bias = node.attrs
+        output = ffmodel.conv2d(input=inputs[0], out_channels=oc, kernel_h=kh, kernel_w=kw, stride_h=sh, stride_w=sw, padding_h=ph, padding_w=pw, activation=ActiMode(activ), groups=group, use_bias=bool(bias), name=op_name)
 
       elif op_type == OpType.POOL2D:
-        assert len(items) == 9, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        kh = int(items[4])
-        sh = int(items[5])
-        ph = int(items[6])
-        pt = int_to_enum(PoolType, int(items[7]))
-        activ = int_to_enum(ActiMode, int(items[8]))
-        output = ffmodel.pool2d(input=input_tensor, kernel_h=kh, kernel_w=kh, stride_h=sh, stride_w=sh, padding_h=ph, padding_w=ph, pool_type=pt, activation=activ, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        kh, sh, ph, pt, activ = node.attrs
+        output = ffmodel.pool2d(input=inputs[0], kernel_h=kh, kernel_w=kh, stride_h=sh, stride_w=sh, padding_h=ph, padding_w=ph, pool_type=PoolType(pt), activation=ActiMode(activ), name=op_name)
 
       elif op_type == OpType.DROPOUT:
-        assert len(items) == 5, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        r = float(items[4])
-        output = ffmodel.dropout(input=input_tensor, rate=r, seed=0, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        r, = node.attrs
+        output = ffmodel.dropout(input=inputs[0], rate=r, seed=0, name=op_name)
 
       elif op_type == OpType.FLAT:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.flat(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.flat(input=inputs[0], name=op_name)
 
       elif op_type == OpType.RELU:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.relu(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.relu(input=inputs[0], name=op_name)
 
       elif op_type == OpType.SIGMOID:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.sigmoid(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.sigmoid(input=inputs[0], name=op_name)
 
       elif op_type == OpType.TANH:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.tanh(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.tanh(input=inputs[0], name=op_name)
 
       elif op_type == OpType.ELU:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.elu(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.elu(input=inputs[0], name=op_name)
         
       elif op_type == OpType.SOFTMAX:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.softmax(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.softmax(input=inputs[0], name=op_name)
 
       elif op_type == OpType.CONCAT:
-        assert len(items) == 5, "wrong format"
-        assert len(self.input_ops_list) >= 2, "wrong format"
-        input_tensors = []
-        for i in range(0, len(self.input_ops_list)):
-          input_tensors.append(self.tensor_dict[self._get_input_key(op_name, i)].fftensor)
-        ax = int(items[4])
-        output = ffmodel.concat(tensors=input_tensors, axis=ax, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) >= 2, "wrong format"
+        ax, = node.attrs
+        output = ffmodel.concat(tensors=inputs, axis=ax, name=op_name)
         
       elif op_type == OpType.SPLIT:
-        assert len(items) == 5, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        size = len(self.output_ops_list)
+        assert len(inputs) == 1, "wrong format"
+        size, ax = node.attrs
         assert size >= 2, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        ax = int(items[4])
-        output = ffmodel.split(input=input_tensor, sizes=size, axis=ax, name=op_name)
+        output = ffmodel.split(input=inputs[0], sizes=size, axis=ax, name=op_name)
         assert type(output) == list
-        output = FXTensor(output)
         
       elif op_type == OpType.GETITEM:
-        assert len(items) == 5, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        assert type(input_tensor) == list
-        idx = int(items[4])
-        output = input_tensor[idx]
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        assert type(inputs[0]) == list
+        idx, = node.attrs
+        output = inputs[0][idx]
         
       elif op_type == OpType.BATCH_NORM:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 1, "wrong format"
-        input_tensor = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        output = ffmodel.batch_norm(input=input_tensor, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 1, "wrong format"
+        output = ffmodel.batch_norm(input=inputs[0], name=op_name)
         
       elif op_type == OpType.ADD:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 2, "wrong format"
-        input_tensor1 = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        input_tensor2 = self.tensor_dict[self._get_input_key(op_name, 1)].fftensor
-        output = ffmodel.add(x=input_tensor1, y=input_tensor2, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 2, "wrong format"
+        output = ffmodel.add(x=inputs[0], y=inputs[1], name=op_name)
      
       elif op_type == OpType.MULTIPLY:
-        assert len(items) == 4, "wrong format"
-        assert len(self.input_ops_list) == 2, "wrong format"
-        input_tensor1 = self.tensor_dict[self._get_input_key(op_name, 0)].fftensor
-        input_tensor2 = self.tensor_dict[self._get_input_key(op_name, 1)].fftensor
-        output = ffmodel.multiply(x=input_tensor1, y=input_tensor2, name=op_name)
-        output = FXTensor(output)
+        assert len(inputs) == 2, "wrong format"
+        output = ffmodel.multiply(x=inputs[0], y=inputs[1], name=op_name)
 
       elif op_type == OpType.OUTPUT:
-        assert len(self.input_ops_list) >= 1, "wrong format"
-        for i in range(0, len(self.input_ops_list)):
-          output_tensors.append(self.tensor_dict[self._get_input_key(op_name, i)].fftensor)
+        assert len(inputs) >= 1, "wrong format"
+        output_tensors.extend(inputs)
         output = None
-        #print(output_tensors[1].handle.impl)
 
       else:
-        print(op_type)
-        assert 0, "unknown op"
+        assert 0, "unknown op {}".format(op_type)
         
-      if type(output) == FXTensor:
-        for i in range(0, len(self.output_ops_list)):
-          self.tensor_dict[self._get_output_key(op_name, i)] = output
-      elif output == None:
-        pass
-      else:
-        assert 0
-      #self.tensor_dict[self._get_output_key(op_name, 0)] = output
+      outputs[node_idx] = output
 
     return output_tensors
     
-  def _get_input_key(self, op_name, index):
-    return self.input_ops_list[index] + ":" + op_name
-    #return self.input_ops_list[index]
-  
-  def _get_output_key(self, op_name, index):
-    #return op_name
-    if len(self.output_ops_list) == 0:
-      return op_name
-    else:
-      return op_name + ":" + self.output_ops_list[index]
+  def save(self, filename):
+    """Save the traced model in the binary form of the IR, which loads 
+    without tracing or parsing text.
+    """
+    out_file = open(filename, "wb")
+    out_file.write(fx.ir_to_bytes(self.nodes))
+    out_file.close()
       
   def _init_from_file(self, filename):
-    in_file = open(filename, "r")
-    self.lines = in_file.readlines()
+    # either the binary form or the comma-separated text format
+    in_file = open(filename, "rb")
+    data = in_file.read()
     in_file.close()
+    if fx.is_ir_bytes(data):
+      self.nodes = fx.ir_from_bytes(data)
+    else:
+      self.nodes = fx.ir_from_str(data.decode("utf-8").splitlines())
       
   def _init_from_model(self, model):
-    self.lines = fx.torch_to_flexflow_str(model)
\ No newline at end of file
+    self.nodes = fx.torch_to_flexflow_ir(model)
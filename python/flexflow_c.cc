@@ -54,6 +54,9 @@ public:
   FF_NEW_OPAQUE_WRAPPER(flexflow_dataloader_4d_t, ImgDataLoader4D *);
   FF_NEW_OPAQUE_WRAPPER(flexflow_dataloader_2d_t, ImgDataLoader2D *);
   FF_NEW_OPAQUE_WRAPPER(flexflow_single_dataloader_t, SingleDataLoader *);
+  FF_NEW_OPAQUE_WRAPPER(flexflow_batch_stager_t, BatchStager *);
+  FF_NEW_OPAQUE_WRAPPER(flexflow_batch_reader_t, BatchReader *);
+  FF_NEW_OPAQUE_WRAPPER(flexflow_perf_metrics_future_t, Future *);
 };
 
 Logger ffc_log("flexflow_c");
@@ -252,6 +255,117 @@ flexflow_model_zero_gradients(
   handle->zero_gradients();
 }
 
+void
+flexflow_model_train_steps(
+  flexflow_model_t handle_,
+  flexflow_single_dataloader_t *dataloaders_,
+  int num_dataloaders,
+  flexflow_batch_stager_t *stagers_,
+  int num_stagers,
+  int num_steps,
+  int trace_id,
+  bool eval,
+  double *step_times,
+  double *load_times)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  Context ctx = handle->config.lg_ctx;
+  Runtime *runtime = handle->config.lg_hlr;
+  std::vector<SingleDataLoader*> dataloaders;
+  for (int i = 0; i < num_dataloaders; i++) {
+    dataloaders.push_back(FFCObjectWrapper::unwrap(dataloaders_[i]));
+  }
+  // The stagers feed the streamed inputs, their buffers of the num_steps
+  // batches have been filled by the caller
+  std::vector<BatchStager*> stagers;
+  for (int i = 0; i < num_stagers; i++) {
+    stagers.push_back(FFCObjectWrapper::unwrap(stagers_[i]));
+    assert(stagers[i]->num_filled >= num_steps);
+  }
+  double ts_prev = Realm::Clock::current_time_in_microseconds();
+  for (int step = 0; step < num_steps; step++) {
+    for (size_t i = 0; i < dataloaders.size(); i++) {
+      dataloaders[i]->next_batch(*handle);
+    }
+    for (size_t i = 0; i < stagers.size(); i++) {
+      stagers[i]->stage_next_buffer(*handle);
+    }
+    if (load_times != NULL) {
+      load_times[step] = Realm::Clock::current_time_in_microseconds() - ts_prev;
+    }
+    runtime->begin_trace(ctx, trace_id);
+    handle->forward();
+    if (eval) {
+      handle->compute_metrics();
+    } else {
+      handle->zero_gradients();
+      handle->backward();
+      handle->update();
+    }
+    runtime->end_trace(ctx, trace_id);
+    // Legion is deferred, so this is the time spent issuing the step
+    double ts_now = Realm::Clock::current_time_in_microseconds();
+    if (step_times != NULL) {
+      step_times[step] = ts_now - ts_prev;
+    }
+    ts_prev = ts_now;
+  }
+  DEBUG_PRINT("[FFModel] train %d steps, %d stagers, trace_id %d, eval %d",
+    num_steps, num_stagers, trace_id, eval);
+}
+
+void
+flexflow_model_predict_steps(
+  flexflow_model_t handle_,
+  flexflow_single_dataloader_t *dataloaders_,
+  int num_dataloaders,
+  flexflow_batch_stager_t *stagers_,
+  int num_stagers,
+  flexflow_batch_reader_t reader_,
+  int num_steps,
+  int trace_id,
+  void *result)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  // The reader of the output is kept across calls, so its buffers are
+  // only allocated and attached once
+  BatchReader& reader = *FFCObjectWrapper::unwrap(reader_);
+  Context ctx = handle->config.lg_ctx;
+  Runtime *runtime = handle->config.lg_hlr;
+  std::vector<SingleDataLoader*> dataloaders;
+  for (int i = 0; i < num_dataloaders; i++) {
+    dataloaders.push_back(FFCObjectWrapper::unwrap(dataloaders_[i]));
+  }
+  std::vector<BatchStager*> stagers;
+  for (int i = 0; i < num_stagers; i++) {
+    stagers.push_back(FFCObjectWrapper::unwrap(stagers_[i]));
+    assert(stagers[i]->num_filled >= num_steps);
+  }
+  char *result_ptr = static_cast<char*>(result);
+  int prev_idx = -1;
+  for (int step = 0; step < num_steps; step++) {
+    for (size_t i = 0; i < dataloaders.size(); i++) {
+      dataloaders[i]->next_batch(*handle);
+    }
+    for (size_t i = 0; i < stagers.size(); i++) {
+      stagers[i]->stage_next_buffer(*handle);
+    }
+    runtime->begin_trace(ctx, trace_id);
+    handle->forward();
+    runtime->end_trace(ctx, trace_id);
+    int idx = reader.read_next_buffer(*handle);
+    // Batch step-1 is read back while the forward pass of this step runs
+    if (prev_idx >= 0) {
+      reader.copy_buffer(prev_idx, result_ptr + (size_t)(step - 1) * reader.buffer_size);
+    }
+    prev_idx = idx;
+  }
+  if (prev_idx >= 0) {
+    reader.copy_buffer(prev_idx, result_ptr + (size_t)(num_steps - 1) * reader.buffer_size);
+  }
+  DEBUG_PRINT("[FFModel] predict %d steps, trace_id %d", num_steps, trace_id);
+}
+
 flexflow_tensor_t
 flexflow_model_add_exp(
   flexflow_model_t handle_,
@@ -779,6 +893,257 @@ flexflow_model_get_perf_metrics(
   return FFCObjectWrapper::wrap(perf_metrics);
 }
 
+flexflow_perf_metrics_future_t
+flexflow_model_get_perf_metrics_future(
+  flexflow_model_t handle_)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  // Only the future is copied, the metrics task is not waited on
+  Future *future = new Future(handle->current_metrics);
+  DEBUG_PRINT("[Model] create PerfMetrics future %p", future);
+  return FFCObjectWrapper::wrap(future);
+}
+
+// Optimizer states saved next to the weights: none, the SGD momentum,
+// or the Adam first and second moments
+static int
+get_num_optimizer_states(
+  FFModel *model)
+{
+  if (SGDOptimizer *sgd = dynamic_cast<SGDOptimizer*>(model->optimizer)) {
+    return sgd->momentum > 0.0f ? 1 : 0;
+  } else if (dynamic_cast<AdamOptimizer*>(model->optimizer) != NULL) {
+    return 2;
+  }
+  return 0;
+}
+
+// Checkpoint tensors are ordered by state, then by parameter
+static void
+get_checkpoint_tensors(
+  FFModel *model,
+  std::vector<Tensor> &tensors)
+{
+  for (size_t i = 0; i < model->parameters.size(); i++) {
+    tensors.push_back(model->parameters[i]);
+  }
+  if (get_num_optimizer_states(model) == 0) {
+    return;
+  }
+  if (SGDOptimizer *sgd = dynamic_cast<SGDOptimizer*>(model->optimizer)) {
+    for (size_t i = 0; i < model->parameters.size(); i++) {
+      assert(sgd->v_values.find(model->parameters[i].region) != sgd->v_values.end());
+      tensors.push_back(sgd->v_values[model->parameters[i].region]);
+    }
+  } else if (AdamOptimizer *adam = dynamic_cast<AdamOptimizer*>(model->optimizer)) {
+    for (size_t i = 0; i < model->parameters.size(); i++) {
+      assert(adam->m_values.find(model->parameters[i].region) != adam->m_values.end());
+      tensors.push_back(adam->m_values[model->parameters[i].region]);
+    }
+    for (size_t i = 0; i < model->parameters.size(); i++) {
+      assert(adam->v_values.find(model->parameters[i].region) != adam->v_values.end());
+      tensors.push_back(adam->v_values[model->parameters[i].region]);
+    }
+  }
+}
+
+int
+flexflow_model_get_num_optimizer_states(
+  flexflow_model_t handle_)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  return get_num_optimizer_states(handle);
+}
+
+int
+flexflow_model_get_num_checkpoint_tensors(
+  flexflow_model_t handle_)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  return handle->parameters.size() * (1 + get_num_optimizer_states(handle));
+}
+
+size_t
+flexflow_model_get_checkpoint_tensor_size(
+  flexflow_model_t handle_,
+  int idx)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  Context ctx = handle->config.lg_ctx;
+  Runtime *runtime = handle->config.lg_hlr;
+  std::vector<Tensor> tensors;
+  get_checkpoint_tensors(handle, tensors);
+  assert(idx >= 0 && idx < (int)tensors.size());
+  // The whole region, including the replicas of NCCL parameters
+  Domain domain = runtime->get_index_space_domain(ctx, tensors[idx].region.get_index_space());
+  return domain.get_volume() * sizeof(float);
+}
+
+void
+flexflow_model_copy_checkpoint_tensors(
+  flexflow_model_t handle_,
+  void **ptrs,
+  bool restore)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  Context ctx = handle->config.lg_ctx;
+  Runtime *runtime = handle->config.lg_hlr;
+  std::vector<Tensor> tensors;
+  get_checkpoint_tensors(handle, tensors);
+  const Memory local_sysmem = Machine::MemoryQuery(Machine::get_machine())
+       .has_affinity_to(runtime->get_executing_processor(ctx))
+       .only_kind(Memory::SYSTEM_MEM)
+       .first();
+  std::vector<FieldID> fields(1, FID_DATA);
+  std::vector<LogicalRegion> host_regions;
+  std::vector<PhysicalRegion> host_physical_regions;
+  // Every host buffer is attached to a region of its own and all the
+  // copies are issued before waiting on any of them
+  for (size_t i = 0; i < tensors.size(); i++) {
+    LogicalRegion host_region = runtime->create_logical_region(ctx,
+        tensors[i].region.get_index_space(), tensors[i].region.get_field_space());
+    AttachLauncher attach_launcher(EXTERNAL_INSTANCE, host_region, host_region);
+    attach_launcher.attach_array_soa(ptrs[i], true/*column_major*/,
+                                     fields, local_sysmem);
+    host_physical_regions.push_back(runtime->attach_external_resource(ctx, attach_launcher));
+    host_regions.push_back(host_region);
+    LogicalRegion src = restore ? host_region : tensors[i].region;
+    LogicalRegion dst = restore ? tensors[i].region : host_region;
+    CopyLauncher copy_launcher;
+    copy_launcher.add_copy_requirements(
+        RegionRequirement(src, READ_ONLY, EXCLUSIVE, src),
+        RegionRequirement(dst, WRITE_DISCARD, EXCLUSIVE, dst));
+    copy_launcher.add_src_field(0, FID_DATA);
+    copy_launcher.add_dst_field(0, FID_DATA);
+    runtime->issue_copy_operation(ctx, copy_launcher);
+  }
+  for (size_t i = 0; i < tensors.size(); i++) {
+    runtime->detach_external_resource(ctx, host_physical_regions[i]).get_void_result();
+    runtime->destroy_logical_region(ctx, host_regions[i]);
+  }
+  DEBUG_PRINT("[FFModel] %s %zu checkpoint tensors", restore ? "restore" : "save", tensors.size());
+}
+
+void
+flexflow_model_set_parameters_float(
+  flexflow_model_t handle_,
+  int num_parameters,
+  flexflow_parameter_t *parameters,
+  const float **data)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  Context ctx = handle->config.lg_ctx;
+  Runtime *runtime = handle->config.lg_hlr;
+  const Memory local_sysmem = Machine::MemoryQuery(Machine::get_machine())
+       .has_affinity_to(runtime->get_executing_processor(ctx))
+       .only_kind(Memory::SYSTEM_MEM)
+       .first();
+  std::vector<FieldID> fields(1, FID_DATA);
+  std::vector<LogicalRegion> host_regions;
+  std::vector<PhysicalRegion> host_physical_regions;
+  // The host buffers are attached in place and copied into every replica
+  // of the parameters, all the copies are issued before waiting on any of them
+  for (int i = 0; i < num_parameters; i++) {
+    Parameter *parameter = FFCObjectWrapper::unwrap(parameters[i]);
+    std::vector<LogicalRegion> replicas;
+    if (parameter->sync_type == ParameterSyncType::PS) {
+      replicas.push_back(parameter->region);
+    } else {
+      assert(parameter->sync_type == ParameterSyncType::NCCL);
+      Domain domain = runtime->get_index_space_domain(ctx, parameter->owner_op->task_is);
+      for (Domain::DomainPointIterator it(domain); it; it++) {
+        replicas.push_back(runtime->get_logical_subregion_by_color(ctx, parameter->part, *it));
+      }
+    }
+    for (size_t r = 0; r < replicas.size(); r++) {
+      LogicalRegion host_region = runtime->create_logical_region(ctx,
+          replicas[r].get_index_space(), replicas[r].get_field_space());
+      AttachLauncher attach_launcher(EXTERNAL_INSTANCE, host_region, host_region);
+      attach_launcher.attach_array_soa(const_cast<float*>(data[i]), true/*column_major*/,
+                                       fields, local_sysmem);
+      host_physical_regions.push_back(runtime->attach_external_resource(ctx, attach_launcher));
+      host_regions.push_back(host_region);
+      CopyLauncher copy_launcher;
+      copy_launcher.add_copy_requirements(
+          RegionRequirement(host_region, READ_ONLY, EXCLUSIVE, host_region),
+          RegionRequirement(replicas[r], WRITE_DISCARD, EXCLUSIVE, parameter->region));
+      copy_launcher.add_src_field(0, FID_DATA);
+      copy_launcher.add_dst_field(0, FID_DATA);
+      runtime->issue_copy_operation(ctx, copy_launcher);
+    }
+  }
+  for (size_t i = 0; i < host_regions.size(); i++) {
+    runtime->detach_external_resource(ctx, host_physical_regions[i]).get_void_result();
+    runtime->destroy_logical_region(ctx, host_regions[i]);
+  }
+  DEBUG_PRINT("[FFModel] set %d parameters with %zu copies", num_parameters, host_regions.size());
+}
+
+void
+flexflow_model_get_optimizer_scalars(
+  flexflow_model_t handle_,
+  double *scalars)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  if (AdamOptimizer *adam = dynamic_cast<AdamOptimizer*>(handle->optimizer)) {
+    scalars[0] = adam->alpha_t;
+    scalars[1] = adam->beta1_t;
+    scalars[2] = adam->beta2_t;
+  }
+}
+
+void
+flexflow_model_set_optimizer_scalars(
+  flexflow_model_t handle_,
+  const double *scalars)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  if (AdamOptimizer *adam = dynamic_cast<AdamOptimizer*>(handle->optimizer)) {
+    adam->alpha_t = scalars[0];
+    adam->beta1_t = scalars[1];
+    adam->beta2_t = scalars[2];
+  }
+}
+
+bool
+flexflow_model_save_strategies(
+  flexflow_model_t handle_,
+  const char *filename)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  // Write the ParallelConfig each op was partitioned with, in the format read by --import
+  std::map<std::string, ParallelConfig> strategies;
+  for (size_t l = 0; l < handle->layers.size(); l++) {
+    Op *op = handle->layers[l];
+    ParallelConfig pc;
+    handle->config.find_parallel_config(op->outputs[0].numDim, op->name, pc);
+    strategies[op->name] = pc;
+  }
+  DEBUG_PRINT("[Model] save %zu strategies to %s", strategies.size(), filename);
+  return save_strategies_to_file(std::string(filename), strategies);
+}
+
+void
+flexflow_model_measure_operator_costs(
+  flexflow_model_t handle_,
+  float *forward_times,
+  float *backward_times,
+  size_t *memory_requirements,
+  int *num_parts)
+{
+  FFModel *handle = FFCObjectWrapper::unwrap(handle_);
+  std::vector<CostMetrics> costs;
+  std::vector<int> parts;
+  handle->measure_operator_costs(costs, parts);
+  for (size_t l = 0; l < handle->layers.size(); l++) {
+    forward_times[l] = costs[l].forward_time;
+    backward_times[l] = costs[l].backward_time;
+    memory_requirements[l] = costs[l].memory_requirement;
+    num_parts[l] = parts[l];
+  }
+  DEBUG_PRINT("[Model] measure the costs of %zu ops", handle->layers.size());
+}
+
 // -----------------------------------------------------------------------
 // Tensor
 // -----------------------------------------------------------------------
@@ -895,6 +1260,69 @@ flexflow_tensor_get_raw_ptr_int32(
   return raw_ptr;
 }
 
+int64_t*
+flexflow_tensor_get_raw_ptr_int64(
+  flexflow_tensor_t handle_,
+  flexflow_config_t config_)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  FFConfig *config = FFCObjectWrapper::unwrap(config_);
+  int64_t *raw_ptr = handle->get_raw_ptr<int64_t>(*config);
+  return raw_ptr;
+}
+
+double*
+flexflow_tensor_get_raw_ptr_double(
+  flexflow_tensor_t handle_,
+  flexflow_config_t config_)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  FFConfig *config = FFCObjectWrapper::unwrap(config_);
+  double *raw_ptr = handle->get_raw_ptr<double>(*config);
+  return raw_ptr;
+}
+
+bool*
+flexflow_tensor_get_raw_ptr_bool(
+  flexflow_tensor_t handle_,
+  flexflow_config_t config_)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  FFConfig *config = FFCObjectWrapper::unwrap(config_);
+  bool *raw_ptr = handle->get_raw_ptr<bool>(*config);
+  return raw_ptr;
+}
+
+void
+flexflow_tensor_get_raw_strides(
+  flexflow_tensor_t handle_,
+  flexflow_config_t config_,
+  size_t *strides)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  FFConfig *config = FFCObjectWrapper::unwrap(config_);
+  switch (handle->data_type) {
+    case DT_FLOAT:
+      handle->get_raw_strides<float>(*config, strides);
+      break;
+    case DT_DOUBLE:
+      handle->get_raw_strides<double>(*config, strides);
+      break;
+    case DT_INT32:
+      handle->get_raw_strides<int32_t>(*config, strides);
+      break;
+    case DT_INT64:
+      handle->get_raw_strides<int64_t>(*config, strides);
+      break;
+    case DT_BOOLEAN:
+      handle->get_raw_strides<bool>(*config, strides);
+      break;
+    default:
+      assert(false && "Unsupported data type");
+  }
+  DEBUG_PRINT("[Tensor] get raw strides %p", handle);
+}
+
 int
 flexflow_tensor_get_num_dims(
   flexflow_tensor_t handle_)
@@ -1019,6 +1447,96 @@ flexflow_tensor_get_tensor_int(
   return handle->get_tensor<int>(model, data, comm_type);
 }
 
+bool
+flexflow_tensor_set_tensor_int64(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  int num_dim,
+  int *dims,
+  const int64_t *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  std::vector<int> dims_vec;
+  for (int i = 0; i < num_dim; i++ ) {
+    dims_vec.push_back(dims[i]);
+  }
+  return handle->set_tensor<int64_t>(model, dims_vec, data, comm_type);
+}
+
+bool
+flexflow_tensor_get_tensor_int64(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  int64_t *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  return handle->get_tensor<int64_t>(model, data, comm_type);
+}
+
+bool
+flexflow_tensor_set_tensor_double(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  int num_dim,
+  int *dims,
+  const double *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  std::vector<int> dims_vec;
+  for (int i = 0; i < num_dim; i++ ) {
+    dims_vec.push_back(dims[i]);
+  }
+  return handle->set_tensor<double>(model, dims_vec, data, comm_type);
+}
+
+bool
+flexflow_tensor_get_tensor_double(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  double *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  return handle->get_tensor<double>(model, data, comm_type);
+}
+
+bool
+flexflow_tensor_set_tensor_bool(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  int num_dim,
+  int *dims,
+  const bool *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  std::vector<int> dims_vec;
+  for (int i = 0; i < num_dim; i++ ) {
+    dims_vec.push_back(dims[i]);
+  }
+  return handle->set_tensor<bool>(model, dims_vec, data, comm_type);
+}
+
+bool
+flexflow_tensor_get_tensor_bool(
+  flexflow_tensor_t handle_,
+  flexflow_model_t model_,
+  bool *data,
+  enum ParameterSyncType comm_type)
+{
+  Tensor *handle = FFCObjectWrapper::unwrap(handle_);
+  const FFModel *model = FFCObjectWrapper::unwrap_const(model_);
+  return handle->get_tensor<bool>(model, data, comm_type);
+}
+
 // -----------------------------------------------------------------------
 // Parameter
 // -----------------------------------------------------------------------
@@ -1246,6 +1764,48 @@ flexflow_per_metrics_get_accuracy(
   return accuracy;
 }
 
+void
+flexflow_per_metrics_get_values(
+  flexflow_perf_metrics_t handle_,
+  double *values)
+{
+  PerfMetrics *handle = FFCObjectWrapper::unwrap(handle_);
+  values[0] = handle->train_all;
+  values[1] = handle->train_correct;
+  values[2] = handle->cce_loss;
+  values[3] = handle->sparse_cce_loss;
+  values[4] = handle->mse_loss;
+  values[5] = handle->rmse_loss;
+  values[6] = handle->mae_loss;
+}
+
+void
+flexflow_perf_metrics_future_destroy(
+  flexflow_perf_metrics_future_t handle_)
+{
+  Future *handle = FFCObjectWrapper::unwrap(handle_);
+  delete handle;
+  DEBUG_PRINT("[PerfMetrics] delete PerfMetrics future %p", handle);
+}
+
+bool
+flexflow_perf_metrics_future_is_ready(
+  flexflow_perf_metrics_future_t handle_)
+{
+  Future *handle = FFCObjectWrapper::unwrap(handle_);
+  return handle->is_ready();
+}
+
+flexflow_perf_metrics_t
+flexflow_perf_metrics_future_get(
+  flexflow_perf_metrics_future_t handle_)
+{
+  Future *handle = FFCObjectWrapper::unwrap(handle_);
+  PerfMetrics *perf_metrics = new PerfMetrics();
+  *perf_metrics = handle->get_result<PerfMetrics>();
+  return FFCObjectWrapper::wrap(perf_metrics);
+}
+
 // -----------------------------------------------------------------------
 // NetConfig
 // -----------------------------------------------------------------------
@@ -1595,6 +2155,53 @@ flexflow_single_dataloader_reset(
   handle->reset();
 }
 
+void
+flexflow_single_dataloader_set_shuffle(
+  flexflow_single_dataloader_t handle_,
+  flexflow_model_t ffmodel_,
+  bool shuffle,
+  int seed,
+  bool sharded)
+{
+  SingleDataLoader *handle = FFCObjectWrapper::unwrap(handle_);
+  FFModel *ffmodel = FFCObjectWrapper::unwrap(ffmodel_);
+  handle->set_shuffle(*ffmodel, shuffle, seed, sharded);
+  DEBUG_PRINT("[SingleDataLoader] set shuffle %d, seed %d, sharded %d", shuffle, seed, sharded);
+}
+
+void
+flexflow_single_dataloader_get_position(
+  flexflow_single_dataloader_t handle_,
+  int *position)
+{
+  SingleDataLoader *handle = FFCObjectWrapper::unwrap(handle_);
+  position[0] = handle->next_index;
+  position[1] = handle->epoch;
+  position[2] = handle->seed;
+}
+
+void
+flexflow_single_dataloader_set_position(
+  flexflow_single_dataloader_t handle_,
+  int next_index,
+  int epoch,
+  int seed)
+{
+  SingleDataLoader *handle = FFCObjectWrapper::unwrap(handle_);
+  handle->set_position(next_index, epoch, seed);
+}
+
+void
+flexflow_single_dataloader_release(
+  flexflow_single_dataloader_t handle_,
+  flexflow_model_t ffmodel_)
+{
+  SingleDataLoader *handle = FFCObjectWrapper::unwrap(handle_);
+  FFModel *ffmodel = FFCObjectWrapper::unwrap(ffmodel_);
+  DEBUG_PRINT("[SingleDataLoader] release %p", handle);
+  handle->release(*ffmodel);
+}
+
 void
 flowflow_single_dataloader_next_batch(
   flexflow_single_dataloader_t handle_,
@@ -1605,6 +2212,78 @@ flowflow_single_dataloader_next_batch(
   handle->next_batch(*ffmodel);
 }
 
+// -----------------------------------------------------------------------
+// BatchStager
+// -----------------------------------------------------------------------
+
+flexflow_batch_stager_t
+flexflow_batch_stager_create(
+  flexflow_model_t ffmodel_,
+  flexflow_tensor_t input_,
+  int num_buffers,
+  enum DataType data_type)
+{
+  FFModel *ffmodel = FFCObjectWrapper::unwrap(ffmodel_);
+  Tensor *input = FFCObjectWrapper::unwrap(input_);
+  BatchStager *stager = new BatchStager(*ffmodel, *input, num_buffers, data_type);
+  DEBUG_PRINT("[BatchStager] new %p, input %p, num_buffers %d", stager, input, num_buffers);
+  return FFCObjectWrapper::wrap(stager);
+}
+
+void
+flexflow_batch_stager_destroy(
+  flexflow_batch_stager_t handle_)
+{
+  BatchStager *handle = FFCObjectWrapper::unwrap(handle_);
+  DEBUG_PRINT("[BatchStager] delete %p", handle);
+  delete handle;
+}
+
+void*
+flexflow_batch_stager_next_buffer(
+  flexflow_batch_stager_t handle_)
+{
+  BatchStager *handle = FFCObjectWrapper::unwrap(handle_);
+  return handle->next_buffer();
+}
+
+void
+flexflow_batch_stager_stage_next_buffer(
+  flexflow_batch_stager_t handle_,
+  flexflow_model_t ffmodel_)
+{
+  BatchStager *handle = FFCObjectWrapper::unwrap(handle_);
+  FFModel *ffmodel = FFCObjectWrapper::unwrap(ffmodel_);
+  handle->stage_next_buffer(*ffmodel);
+}
+
+// -----------------------------------------------------------------------
+// BatchReader
+// -----------------------------------------------------------------------
+
+flexflow_batch_reader_t
+flexflow_batch_reader_create(
+  flexflow_model_t ffmodel_,
+  flexflow_tensor_t output_,
+  int num_buffers,
+  enum DataType data_type)
+{
+  FFModel *ffmodel = FFCObjectWrapper::unwrap(ffmodel_);
+  Tensor *output = FFCObjectWrapper::unwrap(output_);
+  BatchReader *reader = new BatchReader(*ffmodel, *output, num_buffers, data_type);
+  DEBUG_PRINT("[BatchReader] new %p, output %p, num_buffers %d", reader, output, num_buffers);
+  return FFCObjectWrapper::wrap(reader);
+}
+
+void
+flexflow_batch_reader_destroy(
+  flexflow_batch_reader_t handle_)
+{
+  BatchReader *handle = FFCObjectWrapper::unwrap(handle_);
+  DEBUG_PRINT("[BatchReader] delete %p", handle);
+  delete handle;
+}
+
 // -----------------------------------------------------------------------
 // Timer
 // -----------------------------------------------------------------------
@@ -42,6 +42,9 @@ FF_NEW_OPAQUE_TYPE(flexflow_dlrm_config_t);
 FF_NEW_OPAQUE_TYPE(flexflow_dataloader_4d_t);
 FF_NEW_OPAQUE_TYPE(flexflow_dataloader_2d_t);
 FF_NEW_OPAQUE_TYPE(flexflow_single_dataloader_t);
+FF_NEW_OPAQUE_TYPE(flexflow_batch_stager_t);
+FF_NEW_OPAQUE_TYPE(flexflow_batch_reader_t);
+FF_NEW_OPAQUE_TYPE(flexflow_perf_metrics_future_t);
 
 // -----------------------------------------------------------------------
 // FFConfig
@@ -138,6 +141,31 @@ void
 flexflow_model_zero_gradients(
   flexflow_model_t handle);
 
+void
+flexflow_model_train_steps(
+  flexflow_model_t handle,
+  flexflow_single_dataloader_t *dataloaders,
+  int num_dataloaders,
+  flexflow_batch_stager_t *stagers,
+  int num_stagers,
+  int num_steps,
+  int trace_id,
+  bool eval,
+  double *step_times,
+  double *load_times);
+
+void
+flexflow_model_predict_steps(
+  flexflow_model_t handle,
+  flexflow_single_dataloader_t *dataloaders,
+  int num_dataloaders,
+  flexflow_batch_stager_t *stagers,
+  int num_stagers,
+  flexflow_batch_reader_t reader,
+  int num_steps,
+  int trace_id,
+  void *result);
+
 flexflow_tensor_t
 flexflow_model_add_exp(
   flexflow_model_t handle,
@@ -368,6 +396,59 @@ flexflow_perf_metrics_t
 flexflow_model_get_perf_metrics(
   flexflow_model_t handle);
 
+flexflow_perf_metrics_future_t
+flexflow_model_get_perf_metrics_future(
+  flexflow_model_t handle);
+
+int
+flexflow_model_get_num_optimizer_states(
+  flexflow_model_t handle);
+
+int
+flexflow_model_get_num_checkpoint_tensors(
+  flexflow_model_t handle);
+
+size_t
+flexflow_model_get_checkpoint_tensor_size(
+  flexflow_model_t handle,
+  int idx);
+
+void
+flexflow_model_copy_checkpoint_tensors(
+  flexflow_model_t handle,
+  void **ptrs,
+  bool restore);
+
+void
+flexflow_model_set_parameters_float(
+  flexflow_model_t handle,
+  int num_parameters,
+  flexflow_parameter_t *parameters,
+  const float **data);
+
+void
+flexflow_model_get_optimizer_scalars(
+  flexflow_model_t handle,
+  double *scalars);
+
+void
+flexflow_model_set_optimizer_scalars(
+  flexflow_model_t handle,
+  const double *scalars);
+
+bool
+flexflow_model_save_strategies(
+  flexflow_model_t handle,
+  const char *filename);
+
+void
+flexflow_model_measure_operator_costs(
+  flexflow_model_t handle,
+  float *forward_times,
+  float *backward_times,
+  size_t *memory_requirements,
+  int *num_parts);
+
 // -----------------------------------------------------------------------
 // Tensor
 // -----------------------------------------------------------------------
@@ -412,6 +493,27 @@ flexflow_tensor_get_raw_ptr_int32(
   flexflow_tensor_t handle,
   flexflow_config_t config);
 
+int64_t*
+flexflow_tensor_get_raw_ptr_int64(
+  flexflow_tensor_t handle,
+  flexflow_config_t config);
+
+double*
+flexflow_tensor_get_raw_ptr_double(
+  flexflow_tensor_t handle,
+  flexflow_config_t config);
+
+bool*
+flexflow_tensor_get_raw_ptr_bool(
+  flexflow_tensor_t handle,
+  flexflow_config_t config);
+
+void
+flexflow_tensor_get_raw_strides(
+  flexflow_tensor_t handle,
+  flexflow_config_t config,
+  size_t *strides);
+
 int
 flexflow_tensor_get_num_dims(
   flexflow_tensor_t handle);
@@ -476,6 +578,54 @@ flexflow_tensor_get_tensor_int(
   int *data,
   enum ParameterSyncType comm_type);
 
+bool
+flexflow_tensor_set_tensor_int64(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  int num_dim,
+  int *dims,
+  const int64_t *data,
+  enum ParameterSyncType comm_type);
+
+bool
+flexflow_tensor_get_tensor_int64(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  int64_t *data,
+  enum ParameterSyncType comm_type);
+
+bool
+flexflow_tensor_set_tensor_double(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  int num_dim,
+  int *dims,
+  const double *data,
+  enum ParameterSyncType comm_type);
+
+bool
+flexflow_tensor_get_tensor_double(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  double *data,
+  enum ParameterSyncType comm_type);
+
+bool
+flexflow_tensor_set_tensor_bool(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  int num_dim,
+  int *dims,
+  const bool *data,
+  enum ParameterSyncType comm_type);
+
+bool
+flexflow_tensor_get_tensor_bool(
+  flexflow_tensor_t handle,
+  flexflow_model_t model,
+  bool *data,
+  enum ParameterSyncType comm_type);
+
 // -----------------------------------------------------------------------
 // Parameter
 // -----------------------------------------------------------------------
@@ -605,6 +755,23 @@ float
 flexflow_per_metrics_get_accuracy(
   flexflow_perf_metrics_t handle);
 
+void
+flexflow_per_metrics_get_values(
+  flexflow_perf_metrics_t handle,
+  double *values);
+
+void
+flexflow_perf_metrics_future_destroy(
+  flexflow_perf_metrics_future_t handle);
+
+bool
+flexflow_perf_metrics_future_is_ready(
+  flexflow_perf_metrics_future_t handle);
+
+flexflow_perf_metrics_t
+flexflow_perf_metrics_future_get(
+  flexflow_perf_metrics_future_t handle);
+
 // -----------------------------------------------------------------------
 // NetConfig
 // -----------------------------------------------------------------------
@@ -781,11 +948,75 @@ void
 flexflow_single_dataloader_reset(
   flexflow_single_dataloader_t handle);
 
+void
+flexflow_single_dataloader_set_shuffle(
+  flexflow_single_dataloader_t handle,
+  flexflow_model_t ffmodel,
+  bool shuffle,
+  int seed,
+  bool sharded);
+
+void
+flexflow_single_dataloader_get_position(
+  flexflow_single_dataloader_t handle,
+  int *position);
+
+void
+flexflow_single_dataloader_set_position(
+  flexflow_single_dataloader_t handle,
+  int next_index,
+  int epoch,
+  int seed);
+
+void
+flexflow_single_dataloader_release(
+  flexflow_single_dataloader_t handle,
+  flexflow_model_t ffmodel);
+
 void
 flowflow_single_dataloader_next_batch(
   flexflow_single_dataloader_t handle,
   flexflow_model_t ffmodel);
 
+// -----------------------------------------------------------------------
+// BatchStager
+// -----------------------------------------------------------------------
+
+flexflow_batch_stager_t
+flexflow_batch_stager_create(
+  flexflow_model_t ffmodel,
+  flexflow_tensor_t input,
+  int num_buffers,
+  enum DataType data_type);
+
+void
+flexflow_batch_stager_destroy(
+  flexflow_batch_stager_t handle);
+
+void*
+flexflow_batch_stager_next_buffer(
+  flexflow_batch_stager_t handle);
+
+void
+flexflow_batch_stager_stage_next_buffer(
+  flexflow_batch_stager_t handle,
+  flexflow_model_t ffmodel);
+
+// -----------------------------------------------------------------------
+// BatchReader
+// -----------------------------------------------------------------------
+
+flexflow_batch_reader_t
+flexflow_batch_reader_create(
+  flexflow_model_t ffmodel,
+  flexflow_tensor_t output,
+  int num_buffers,
+  enum DataType data_type);
+
+void
+flexflow_batch_reader_destroy(
+  flexflow_batch_reader_t handle);
+
 // -----------------------------------------------------------------------
 // Timer
 // -----------------------------------------------------------------------
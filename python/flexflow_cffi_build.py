@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# Copyright 2020 Stanford University, Los Alamos National Laboratory
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import hashlib
+import os
+import subprocess
+
+import cffi
+
+# The headers whose content determines the cdef handed to cffi. Any change
+# to one of them invalidates both the compiled module and the cached header.
+_header_names = [('python', 'flexflow_c.h'), ('include', 'ffconst.h')]
+
+def find_flexflow_header(ff_home):
+    flexflow_h_path = os.path.join(ff_home, 'python', 'flexflow_c.h')
+    if os.path.exists(flexflow_h_path):
+        return os.path.join(ff_home, 'include'), flexflow_h_path
+
+    raise Exception('Unable to locate flexflow_c.h header file')
+
+def header_key(ff_home):
+    sha = hashlib.sha1()
+    for subdir, name in _header_names:
+        with open(os.path.join(ff_home, subdir, name), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+def default_cache_dir():
+    if 'FF_CFFI_CACHE_DIR' in os.environ:
+        return os.environ['FF_CFFI_CACHE_DIR']
+    xdg_cache = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(xdg_cache, 'flexflow')
+
+def cached_header_path(cache_dir, key):
+    return os.path.join(cache_dir, 'flexflow_c.%s.h' % key)
+
+def build(ff_home, output_dir, cache_dir):
+    include_dir, flexflow_h_path = find_flexflow_header(ff_home)
+    key = header_key(ff_home)
+
+    header = subprocess.check_output(['gcc', '-I', include_dir, '-E', '-P', flexflow_h_path]).decode('utf-8')
+
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'flexflow', 'core')
+
+    # Out-of-line ABI mode: the cdef is parsed once here and serialized into
+    # _flexflow_cffi.py, so importing flexflow.core never needs a C compiler.
+    ffibuilder = cffi.FFI()
+    ffibuilder.cdef(header)
+    ffibuilder.set_source('_flexflow_cffi', None)
+    module_path = os.path.join(output_dir, '_flexflow_cffi.py')
+    ffibuilder.emit_python_code(module_path)
+    with open(module_path, 'a') as f:
+        f.write('header_key = %r\n' % key)
+
+    if cache_dir is not None:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with open(cached_header_path(cache_dir, key), 'wb') as f:
+            f.write(header.encode('utf-8'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ff-home', required=False)
+    parser.add_argument('--output-dir', required=False)
+    parser.add_argument('--cache-dir', required=False)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    ff_home = args.ff_home
+    if ff_home is None:
+        ff_home = os.environ.get('FF_HOME', os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    cache_dir = None if args.no_cache else (args.cache_dir or default_cache_dir())
+
+    build(ff_home, args.output_dir, cache_dir)
@@ -16,6 +16,9 @@
 #include <sstream>
 #include <fstream>
 #include <string>
+#include <random>
+#include <numeric>
+#include <algorithm>
 #include "flexflow_dataloader.h"
 
 ImgDataLoader::ImgDataLoader()
@@ -488,6 +491,7 @@ void ImgDataLoader2D::next_batch(FFModel& ff)
 }
 
 SingleDataLoader::SingleDataLoader(FFModel& ff, Tensor input, Tensor full_input_, int num_samples_, DataType datatype_)
+: shuffle(false), sharded(false), seed(0), epoch(0), num_shards(1)
 {
   Context ctx = ff.config.lg_ctx;
   Runtime* runtime = ff.config.lg_hlr;
@@ -544,6 +548,7 @@ SingleDataLoader::SingleDataLoader(FFModel& ff, Tensor input, Tensor full_input_
 }
 
 SingleDataLoader::SingleDataLoader(FFModel& ff, Tensor input, void *full_input_ptr, int num_samples_, DataType datatype_)
+: shuffle(false), sharded(false), seed(0), epoch(0), num_shards(1)
 {
   num_samples = num_samples_;
   datatype = datatype_;
@@ -644,6 +649,88 @@ void SingleDataLoader::index_loader_xd_launcher(FFModel& ff, int task_id, void *
 void SingleDataLoader::reset()
 {
   next_index = 0;
+  if (shuffle) {
+    // Every loader of a model is reset once per epoch, so loaders sharing
+    // a seed keep their inputs and labels aligned
+    assert(num_samples % num_shards == 0);
+    int shard_size = num_samples / num_shards;
+    permutation.resize(num_samples);
+    std::mt19937 rng(seed + epoch);
+    for (int i = 0; i < num_shards; i++) {
+      std::vector<int>::iterator begin = permutation.begin() + i * shard_size;
+      std::iota(begin, begin + shard_size, sharded ? 0 : i * shard_size);
+      std::shuffle(begin, begin + shard_size, rng);
+    }
+    epoch++;
+  }
+}
+
+void SingleDataLoader::set_shuffle(FFModel& ff, bool shuffle_, int seed_, bool sharded_)
+{
+  shuffle = shuffle_;
+  sharded = sharded_;
+  seed = seed_;
+  epoch = 0;
+  num_shards = 1;
+  if (sharded) {
+    switch (full_input.numDim) {
+#define DIMFUNC(DIM) \
+      case DIM: \
+        num_shards = get_num_shards<DIM>(ff); \
+        break;
+      LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+      default:
+        assert(false);
+    }
+  }
+  reset();
+}
+
+void SingleDataLoader::release(FFModel& ff)
+{
+  // Free the zero-copy copy of the dataset, the dataloader cannot be used afterwards
+  Context ctx = ff.config.lg_ctx;
+  Runtime* runtime = ff.config.lg_hlr;
+  runtime->destroy_logical_region(ctx, full_input.region);
+  full_input.region = LogicalRegion::NO_REGION;
+  full_input.part = LogicalPartition::NO_PART;
+  num_samples = 0;
+}
+
+void SingleDataLoader::set_position(int next_index_, int epoch_, int seed_)
+{
+  seed = seed_;
+  if (shuffle) {
+    // epoch counts the permutations drawn so far, so draw the last one again
+    epoch = epoch_ - 1;
+    reset();
+    assert(epoch == epoch_);
+  } else {
+    epoch = epoch_;
+  }
+  next_index = next_index_;
+}
+
+template<int NDIM>
+int SingleDataLoader::get_num_shards(FFModel& ff)
+{
+  Context ctx = ff.config.lg_ctx;
+  Runtime* runtime = ff.config.lg_hlr;
+  IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
+  Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
+  return rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1;
+}
+
+int SingleDataLoader::get_sample_index(int shard, int pos) const
+{
+  // The last batch of predict is padded with the last sample
+  int shard_size = num_samples / num_shards;
+  if (pos >= shard_size)
+    pos = shard_size - 1;
+  if (!shuffle)
+    return pos;
+  return permutation[shard * (num_samples / num_shards) + pos];
 }
 
 void SingleDataLoader::next_batch(FFModel& ff)
@@ -673,67 +760,342 @@ void SingleDataLoader::next_batch_xd_launcher(FFModel& ff, int task_id)
   Context ctx = ff.config.lg_ctx;
   Runtime* runtime = ff.config.lg_hlr;
   // Load input
-#if 1
-  {  
-    IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
-    Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
-    ArgumentMap argmap;
-    int idx = next_index;
-    for (PointInRectIterator<NDIM> it(rect); it(); it++) {
-      SampleIdxs meta;
-      assert(ff.config.batchSize % (rect.hi[1] - rect.lo[NDIM-1] + 1) == 0);
-      meta.num_samples = ff.config.batchSize / (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1);
+  IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
+  Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
+  int num_parts = rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1;
+  assert(ff.config.batchSize % num_parts == 0);
+  int samples_per_part = ff.config.batchSize / num_parts;
+  ArgumentMap argmap;
+  int idx = next_index;
+  for (PointInRectIterator<NDIM> it(rect); it(); it++) {
+    SampleIdxs meta;
+    meta.num_samples = samples_per_part;
+    if (sharded) {
+      // Indices are local to the slice of full_input read by this point
+      int shard = (*it)[NDIM-1] - rect.lo[NDIM-1];
       for (int i = 0; i < meta.num_samples; i++)
-        meta.idxs[i] = idx++;
-      argmap.set_point(*it, TaskArgument(&meta, sizeof(SampleIdxs)));
-    }
-    IndexLauncher launcher(task_id, task_is,
-                           TaskArgument(NULL,0), argmap,
-                           Predicate::TRUE_PRED, false/*must*/, 0/*mapper_id*/,
-                           FFConfig::get_hash_id(""));
-    launcher.add_region_requirement(
-        RegionRequirement(full_input.region, 0/*projection id*/,
-                          READ_ONLY, EXCLUSIVE, full_input.region,
-                          MAP_TO_ZC_MEMORY));
-    launcher.add_field(0, FID_DATA);                    
-    launcher.add_region_requirement(
-        RegionRequirement(batch_input.part, 0/*projection id*/,
-                          WRITE_ONLY, EXCLUSIVE, batch_input.region));
-    launcher.add_field(1, FID_DATA);
-    runtime->execute_index_space(ctx, launcher);
-  }
-  next_index += ff.config.batchSize;
-#else
-  {  
-    IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
-    Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
-    ArgumentMap argmap;
-    for (PointInRectIterator<NDIM> it(rect); it(); it++) {
-      int idx = next_index;
-      SampleIdxs meta;
-      assert(ff.config.batchSize % (rect.hi[1] - rect.lo[NDIM-1] + 1) == 0);
-      meta.num_samples = ff.config.batchSize / (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1);
+        meta.idxs[i] = get_sample_index(shard, next_index + i);
+    } else {
       for (int i = 0; i < meta.num_samples; i++)
-        meta.idxs[i] = idx++;
-      argmap.set_point(*it, TaskArgument(&meta, sizeof(SampleIdxs)));
+        meta.idxs[i] = get_sample_index(0, idx++);
     }
-    IndexLauncher launcher(task_id, task_is,
-                           TaskArgument(NULL,0), argmap,
-                           Predicate::TRUE_PRED, false/*must*/, 0/*mapper_id*/,
-                           FFConfig::get_hash_id(""));
+    argmap.set_point(*it, TaskArgument(&meta, sizeof(SampleIdxs)));
+  }
+  IndexLauncher launcher(task_id, task_is,
+                         TaskArgument(NULL,0), argmap,
+                         Predicate::TRUE_PRED, false/*must*/, 0/*mapper_id*/,
+                         FFConfig::get_hash_id(""));
+  if (sharded) {
     launcher.add_region_requirement(
         RegionRequirement(full_input.part, 0/*projection id*/,
                           READ_ONLY, EXCLUSIVE, full_input.region,
                           MAP_TO_ZC_MEMORY));
-    launcher.add_field(0, FID_DATA);                    
+  } else {
     launcher.add_region_requirement(
-        RegionRequirement(batch_input.part, 0/*projection id*/,
-                          WRITE_ONLY, EXCLUSIVE, batch_input.region));
-    launcher.add_field(1, FID_DATA);
-    runtime->execute_index_space(ctx, launcher);
-    next_index += ff.config.batchSize / (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1);
+        RegionRequirement(full_input.region, 0/*projection id*/,
+                          READ_ONLY, EXCLUSIVE, full_input.region,
+                          MAP_TO_ZC_MEMORY));
   }
-#endif
+  launcher.add_field(0, FID_DATA);
+  launcher.add_region_requirement(
+      RegionRequirement(batch_input.part, 0/*projection id*/,
+                        WRITE_ONLY, EXCLUSIVE, batch_input.region));
+  launcher.add_field(1, FID_DATA);
+  runtime->execute_index_space(ctx, launcher);
+  next_index += sharded ? samples_per_part : ff.config.batchSize;
+}
+
+BatchStager::BatchStager(FFModel& ff, Tensor input, int num_buffers_, DataType datatype_)
+{
+  num_buffers = num_buffers_;
+  datatype = datatype_;
+  config = ff.config;
+  batch_input = input;
+  assert(num_buffers > 0);
+  int dims[MAX_TENSOR_DIM];
+  size_t volume = 1;
+  for (int i = 0; i < input.numDim; i++) {
+    dims[i] = input.adim[input.numDim-1-i];
+    volume *= dims[i];
+  }
+  size_t elem_size = 0;
+  if (datatype == DT_FLOAT) {
+    elem_size = sizeof(float);
+  } else if (datatype == DT_INT32) {
+    elem_size = sizeof(int);
+  } else {
+    assert(0);
+  }
+  buffer_size = volume * elem_size;
+  // The ring of staging buffers is allocated and attached once, so that
+  // staging a batch never allocates or registers memory
+  for (int i = 0; i < num_buffers; i++) {
+    Tensor staging_input;
+    switch (input.numDim) {
+#define DIMFUNC(DIM) \
+      case DIM: \
+      { \
+        staging_input = ff.create_tensor<DIM>(dims, datatype, NULL, false/*create_grad*/); \
+        break; \
+      }
+      LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+      default:
+        assert(false);
+    }
+    void *host_buffer = NULL;
+    int ret = posix_memalign(&host_buffer, 64, buffer_size);
+    assert(ret == 0);
+    memset(host_buffer, 0, buffer_size);
+    staging_input.attach_raw_ptr(config, host_buffer, true/*column_major*/);
+    staging_inputs.push_back(staging_input);
+    host_buffers.push_back(host_buffer);
+    pending_copies.push_back(FutureMap());
+  }
+  next_idx = 0;
+  fill_idx = 0;
+  num_filled = 0;
+}
+
+BatchStager::~BatchStager(void)
+{
+  Context ctx = config.lg_ctx;
+  Runtime* runtime = config.lg_hlr;
+  for (int i = 0; i < num_buffers; i++) {
+    if (pending_copies[i].exists())
+      pending_copies[i].wait_all_results();
+    staging_inputs[i].detach_raw_ptr(config);
+    runtime->destroy_logical_region(ctx, staging_inputs[i].region);
+    free(host_buffers[i]);
+  }
+}
+
+void* BatchStager::next_buffer(void)
+{
+  // Up to num_buffers batches can be filled ahead of stage_next_buffer
+  assert(num_filled < num_buffers);
+  int idx = fill_idx;
+  // Wait until the previous copy out of this buffer has drained before
+  // handing it back to the caller for writing
+  if (pending_copies[idx].exists()) {
+    pending_copies[idx].wait_all_results();
+    pending_copies[idx] = FutureMap();
+  }
+  // The buffer is attached with restricted coherence, the caller only
+  // writes it between this acquire and the release in stage_next_buffer
+  Context ctx = config.lg_ctx;
+  Runtime* runtime = config.lg_hlr;
+  Tensor& staging_input = staging_inputs[idx];
+  AcquireLauncher launcher(staging_input.region, staging_input.region,
+                           staging_input.physical_region);
+  launcher.add_field(FID_DATA);
+  runtime->issue_acquire(ctx, launcher);
+  fill_idx = (fill_idx + 1) % num_buffers;
+  num_filled++;
+  return host_buffers[idx];
+}
+
+void BatchStager::stage_next_buffer(FFModel& ff)
+{
+  assert(num_filled > 0);
+  // Hand the refilled buffer back to Legion, so that the load task
+  // reads the data written by the caller
+  {
+    Context ctx = ff.config.lg_ctx;
+    Runtime* runtime = ff.config.lg_hlr;
+    Tensor& staging_input = staging_inputs[next_idx];
+    ReleaseLauncher launcher(staging_input.region, staging_input.region,
+                             staging_input.physical_region);
+    launcher.add_field(FID_DATA);
+    runtime->issue_release(ctx, launcher);
+  }
+  int task_id = -1;
+  if (datatype == DT_FLOAT)
+    task_id = PY_DL_FLOAT_LOAD_BATCH_GPU_TASK_ID;
+  else if (datatype == DT_INT32)
+    task_id = PY_DL_INT_LOAD_BATCH_GPU_TASK_ID;
+  else
+    assert(0);
+  switch (batch_input.numDim) {
+#define DIMFUNC(DIM) \
+    case DIM: \
+      stage_xd_launcher<DIM>(ff, task_id, next_idx); \
+      break;
+    LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+    default:
+      assert(false);
+  }
+  next_idx = (next_idx + 1) % num_buffers;
+  num_filled--;
+}
+
+template<int NDIM>
+void BatchStager::stage_xd_launcher(FFModel& ff, int task_id, int idx)
+{
+  Context ctx = ff.config.lg_ctx;
+  Runtime* runtime = ff.config.lg_hlr;
+  // The copy only writes batch_input, so Legion orders it after the
+  // consumers of the previous batch and nothing else
+  IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
+  Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
+  ArgumentMap argmap;
+  int sample = 0;
+  for (PointInRectIterator<NDIM> it(rect); it(); it++) {
+    SampleIdxs meta;
+    assert(ff.config.batchSize % (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1) == 0);
+    meta.num_samples = ff.config.batchSize / (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1);
+    for (int i = 0; i < meta.num_samples; i++)
+      meta.idxs[i] = sample++;
+    argmap.set_point(*it, TaskArgument(&meta, sizeof(SampleIdxs)));
+  }
+  IndexLauncher launcher(task_id, task_is,
+                         TaskArgument(NULL,0), argmap,
+                         Predicate::TRUE_PRED, false/*must*/, 0/*mapper_id*/,
+                         FFConfig::get_hash_id(""));
+  launcher.add_region_requirement(
+      RegionRequirement(staging_inputs[idx].region, 0/*projection id*/,
+                        READ_ONLY, EXCLUSIVE, staging_inputs[idx].region));
+  launcher.add_field(0, FID_DATA);
+  launcher.add_region_requirement(
+      RegionRequirement(batch_input.part, 0/*projection id*/,
+                        WRITE_ONLY, EXCLUSIVE, batch_input.region));
+  launcher.add_field(1, FID_DATA);
+  pending_copies[idx] = runtime->execute_index_space(ctx, launcher);
+}
+
+BatchReader::BatchReader(FFModel& ff, Tensor output, int num_buffers_, DataType datatype_)
+{
+  num_buffers = num_buffers_;
+  datatype = datatype_;
+  config = ff.config;
+  batch_output = output;
+  assert(num_buffers > 0);
+  int dims[MAX_TENSOR_DIM];
+  size_t volume = 1;
+  for (int i = 0; i < output.numDim; i++) {
+    dims[i] = output.adim[output.numDim-1-i];
+    volume *= dims[i];
+  }
+  size_t elem_size = 0;
+  if (datatype == DT_FLOAT) {
+    elem_size = sizeof(float);
+  } else if (datatype == DT_INT32) {
+    elem_size = sizeof(int);
+  } else {
+    assert(0);
+  }
+  buffer_size = volume * elem_size;
+  // Same ring as BatchStager, with the copies going the other way
+  for (int i = 0; i < num_buffers; i++) {
+    Tensor readback_output;
+    switch (output.numDim) {
+#define DIMFUNC(DIM) \
+      case DIM: \
+      { \
+        readback_output = ff.create_tensor<DIM>(dims, datatype, NULL, false/*create_grad*/); \
+        break; \
+      }
+      LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+      default:
+        assert(false);
+    }
+    void *host_buffer = NULL;
+    int ret = posix_memalign(&host_buffer, 64, buffer_size);
+    assert(ret == 0);
+    readback_output.attach_raw_ptr(config, host_buffer, true/*column_major*/);
+    readback_outputs.push_back(readback_output);
+    host_buffers.push_back(host_buffer);
+    pending_copies.push_back(FutureMap());
+  }
+  next_idx = 0;
+}
+
+BatchReader::~BatchReader(void)
+{
+  Context ctx = config.lg_ctx;
+  Runtime* runtime = config.lg_hlr;
+  for (int i = 0; i < num_buffers; i++) {
+    if (pending_copies[i].exists())
+      pending_copies[i].wait_all_results();
+    readback_outputs[i].detach_raw_ptr(config);
+    runtime->destroy_logical_region(ctx, readback_outputs[i].region);
+    free(host_buffers[i]);
+  }
+}
+
+int BatchReader::read_next_buffer(FFModel& ff)
+{
+  int task_id = -1;
+  if (datatype == DT_FLOAT)
+    task_id = PY_DL_FLOAT_LOAD_BATCH_GPU_TASK_ID;
+  else if (datatype == DT_INT32)
+    task_id = PY_DL_INT_LOAD_BATCH_GPU_TASK_ID;
+  else
+    assert(0);
+  // The buffer is reused, so its previous batch must have been copied out
+  if (pending_copies[next_idx].exists()) {
+    pending_copies[next_idx].wait_all_results();
+    pending_copies[next_idx] = FutureMap();
+  }
+  switch (batch_output.numDim) {
+#define DIMFUNC(DIM) \
+    case DIM: \
+      read_xd_launcher<DIM>(ff, task_id, next_idx); \
+      break;
+    LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+    default:
+      assert(false);
+  }
+  int idx = next_idx;
+  next_idx = (next_idx + 1) % num_buffers;
+  return idx;
+}
+
+void BatchReader::copy_buffer(int idx, void* dst)
+{
+  if (pending_copies[idx].exists()) {
+    pending_copies[idx].wait_all_results();
+    pending_copies[idx] = FutureMap();
+  }
+  memcpy(dst, host_buffers[idx], buffer_size);
+}
+
+template<int NDIM>
+void BatchReader::read_xd_launcher(FFModel& ff, int task_id, int idx)
+{
+  Context ctx = ff.config.lg_ctx;
+  Runtime* runtime = ff.config.lg_hlr;
+  // The copy only reads batch_output, so the forward pass of the next
+  // batch can be issued while it is in flight
+  IndexSpaceT<NDIM> task_is = IndexSpaceT<NDIM>(ff.get_or_create_task_is(NDIM, ""));
+  Rect<NDIM> rect = runtime->get_index_space_domain(ctx, task_is);
+  ArgumentMap argmap;
+  int sample = 0;
+  for (PointInRectIterator<NDIM> it(rect); it(); it++) {
+    SampleIdxs meta;
+    assert(ff.config.batchSize % (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1) == 0);
+    meta.num_samples = ff.config.batchSize / (rect.hi[NDIM-1] - rect.lo[NDIM-1] + 1);
+    for (int i = 0; i < meta.num_samples; i++)
+      meta.idxs[i] = sample++;
+    argmap.set_point(*it, TaskArgument(&meta, sizeof(SampleIdxs)));
+  }
+  IndexLauncher launcher(task_id, task_is,
+                         TaskArgument(NULL,0), argmap,
+                         Predicate::TRUE_PRED, false/*must*/, 0/*mapper_id*/,
+                         FFConfig::get_hash_id(""));
+  launcher.add_region_requirement(
+      RegionRequirement(batch_output.region, 0/*projection id*/,
+                        READ_ONLY, EXCLUSIVE, batch_output.region,
+                        MAP_TO_ZC_MEMORY));
+  launcher.add_field(0, FID_DATA);
+  launcher.add_region_requirement(
+      RegionRequirement(readback_outputs[idx].part, 0/*projection id*/,
+                        WRITE_ONLY, EXCLUSIVE, readback_outputs[idx].region));
+  launcher.add_field(1, FID_DATA);
+  pending_copies[idx] = runtime->execute_index_space(ctx, launcher);
 }
 
 // Task body
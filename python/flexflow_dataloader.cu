@@ -113,6 +113,38 @@ void SingleDataLoader::load_input(const Task *task,
   }
 }
 
+template<typename DT>
+__global__
+void gather_samples_kernel(DT* dst, const DT* src, const int* idxs,
+                           coord_t volume, coord_t sample_size)
+{
+  CUDA_KERNEL_LOOP(i, volume)
+  {
+    coord_t sample = i / sample_size;
+    dst[i] = src[idxs[sample] * sample_size + i % sample_size];
+  }
+}
+
+// Returns the zero-copy buffer holding the sample indices of a shuffled
+// batch on the current GPU, and its device pointer in idxs_dev. It is
+// allocated once per GPU: the load tasks of a GPU run one at a time and
+// wait for their kernel, so the buffer is free when a task starts.
+static int* get_zc_sample_idxs(int** idxs_dev)
+{
+  static int* zc_idxs[MAX_NUM_WORKERS] = {NULL};
+  static int* zc_idxs_dev[MAX_NUM_WORKERS] = {NULL};
+  int device;
+  checkCUDA(cudaGetDevice(&device));
+  assert(device < MAX_NUM_WORKERS);
+  if (zc_idxs[device] == NULL) {
+    checkCUDA(cudaHostAlloc(&zc_idxs[device], sizeof(int) * MAX_NUM_SAMPLES,
+                            cudaHostAllocMapped | cudaHostAllocPortable));
+    checkCUDA(cudaHostGetDevicePointer(&zc_idxs_dev[device], zc_idxs[device], 0));
+  }
+  *idxs_dev = zc_idxs_dev[device];
+  return zc_idxs[device];
+}
+
 template<typename DT, int NDIM>
 void SingleDataLoader::load_input_with_dim(const Task *task,
                                      const std::vector<PhysicalRegion> &regions,
@@ -128,16 +160,29 @@ void SingleDataLoader::load_input_with_dim(const Task *task,
       regions[1], task->regions[1], FID_DATA, ctx, runtime, false/*readOutput*/);
   coord_t batch_size = acc_batch_input.rect.hi[NDIM-1] - acc_batch_input.rect.lo[NDIM-1] + 1;
   coord_t num_elements_per_batch = acc_batch_input.rect.volume() / batch_size;
-  //FIXME: currently assume continous indices
   assert(batch_size == meta->num_samples);
+  bool contiguous = true;
   for (int i = 1; i < batch_size; i++)
-    assert(meta->idxs[i] == meta->idxs[0] + i);
-  coord_t start_idx = meta->idxs[0];
-  const DT* input_zc = acc_full_input.ptr + start_idx * num_elements_per_batch;
-  //printf("ptr(%p, %p), idx0 %d nb_elements_per_batch %d, batch_size %d, %d\n", acc_full_input.ptr, input_zc, start_idx, num_elements_per_batch, batch_size, start_idx * num_elements_per_batch);
-  copy_kernel<DT><<<GET_BLOCKS(acc_batch_input.rect.volume()), CUDA_NUM_THREADS>>>(
-      acc_batch_input.ptr, input_zc, acc_batch_input.rect.volume());
-  checkCUDA(cudaDeviceSynchronize());
+    if (meta->idxs[i] != meta->idxs[0] + i)
+      contiguous = false;
+  if (contiguous) {
+    coord_t start_idx = meta->idxs[0];
+    const DT* input_zc = acc_full_input.ptr + start_idx * num_elements_per_batch;
+    copy_kernel<DT><<<GET_BLOCKS(acc_batch_input.rect.volume()), CUDA_NUM_THREADS>>>(
+        acc_batch_input.ptr, input_zc, acc_batch_input.rect.volume());
+    checkCUDA(cudaDeviceSynchronize());
+  } else {
+    // Shuffled batch: gather the selected samples straight out of
+    // the zero-copy full input, the kernel reads the indices from
+    // zero-copy memory too
+    int* idxs_dev;
+    int* idxs = get_zc_sample_idxs(&idxs_dev);
+    memcpy(idxs, meta->idxs, sizeof(int) * batch_size);
+    gather_samples_kernel<DT><<<GET_BLOCKS(acc_batch_input.rect.volume()), CUDA_NUM_THREADS>>>(
+        acc_batch_input.ptr, acc_full_input.ptr, idxs_dev,
+        acc_batch_input.rect.volume(), num_elements_per_batch);
+    checkCUDA(cudaDeviceSynchronize());
+  }
 }
 
 template void SingleDataLoader::load_input<float>(const Task *task, const std::vector<PhysicalRegion> &regions, Context ctx, Runtime* runtime);
@@ -93,6 +93,14 @@ public:
   void next_batch(FFModel&);
   
   void reset(void); 
+
+  void set_shuffle(FFModel& ff, bool shuffle_, int seed_, bool sharded_);
+
+  void set_position(int next_index_, int epoch_, int seed_);
+
+  void release(FFModel& ff);
+
+  int get_sample_index(int shard, int pos) const;
   
   static void register_cpu_tasks(void);
   
@@ -134,10 +142,68 @@ private:
   
   template<int NDIM>
   void index_loader_xd_launcher(FFModel& ff, int task_id, void *full_input_ptr, size_t size_per_sample);
+
+  template<int NDIM>
+  int get_num_shards(FFModel& ff);
 public:
   int num_samples, next_index;
   DataType datatype;
-  Tensor full_input, batch_input;         
+  Tensor full_input, batch_input;
+  // When shuffle is set, samples are visited in the order of permutation,
+  // which is regenerated from seed on every reset(). When sharded is set,
+  // each point task only reads its own slice of full_input, and
+  // permutation holds shard-local indices.
+  bool shuffle, sharded;
+  int seed, epoch, num_shards;
+  std::vector<int> permutation;
+};
+
+class BatchStager {
+public:
+  BatchStager(FFModel& ff, Tensor input, int num_buffers_, DataType datatype_);
+
+  ~BatchStager(void);
+
+  void* next_buffer(void);
+
+  void stage_next_buffer(FFModel&);
+private:
+  template<int NDIM>
+  void stage_xd_launcher(FFModel& ff, int task_id, int idx);
+public:
+  // next_buffer hands out the buffers from fill_idx, stage_next_buffer
+  // copies them from next_idx; num_filled buffers are in between
+  int num_buffers, next_idx, fill_idx, num_filled;
+  size_t buffer_size;
+  DataType datatype;
+  FFConfig config;
+  Tensor batch_input;
+  std::vector<Tensor> staging_inputs;
+  std::vector<void*> host_buffers;
+  std::vector<FutureMap> pending_copies;
+};
+
+class BatchReader {
+public:
+  BatchReader(FFModel& ff, Tensor output, int num_buffers_, DataType datatype_);
+
+  ~BatchReader(void);
+
+  int read_next_buffer(FFModel&);
+
+  void copy_buffer(int idx, void* dst);
+private:
+  template<int NDIM>
+  void read_xd_launcher(FFModel& ff, int task_id, int idx);
+public:
+  int num_buffers, next_idx;
+  size_t buffer_size;
+  DataType datatype;
+  FFConfig config;
+  Tensor batch_output;
+  std::vector<Tensor> readback_outputs;
+  std::vector<void*> host_buffers;
+  std::vector<FutureMap> pending_copies;
 };
 
 #define MAX_NUM_SAMPLES 4196
@@ -15,7 +15,7 @@ setup(
   install_requires=['numpy>=1.16',
                     'cffi>=1.11',
                     'qualname',
-                    'keras_preprocessing',
+                    'six',
                     'Pillow',
                     ],
 
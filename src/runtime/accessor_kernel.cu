@@ -146,9 +146,13 @@ DT* helperGetTensorPointerWO(PhysicalRegion region,
   template class TensorAccessorR<float, DIM>; \
   template class TensorAccessorR<int32_t, DIM>; \
   template class TensorAccessorR<int64_t, DIM>; \
+  template class TensorAccessorR<double, DIM>; \
+  template class TensorAccessorR<bool, DIM>; \
   template class TensorAccessorW<float, DIM>; \
   template class TensorAccessorW<int32_t, DIM>; \
-  template class TensorAccessorW<int64_t, DIM>;
+  template class TensorAccessorW<int64_t, DIM>; \
+  template class TensorAccessorW<double, DIM>; \
+  template class TensorAccessorW<bool, DIM>;
   LEGION_FOREACH_N(DIMFUNC)
 #undef DIMFUNC
 
@@ -107,6 +107,27 @@ T* Tensor::get_raw_ptr(FFConfig &config)
   return raw_ptr;
 }
 
+template<typename T>
+void Tensor::get_raw_strides(FFConfig &config, size_t *strides)
+{
+  // Byte strides of the inline mapped instance, fastest dimension first
+  switch (numDim) {
+#define DIMFUNC(DIM) \
+    case DIM: \
+    { \
+      const AccessorRO<T, DIM> acc(physical_region, FID_DATA); \
+      for (int i = 0; i < DIM; i++) \
+        strides[i] = acc.accessor.strides[i]; \
+      break; \
+    }
+    LEGION_FOREACH_N(DIMFUNC)
+#undef DIMFUNC
+    default:
+      printf("wrong numDim %d", numDim);
+      assert(0);
+  }
+}
+
 void Tensor::attach_raw_ptr(FFConfig &config, void *raw_ptr, bool column_major)
 {
   Context ctx = config.lg_ctx;
@@ -787,6 +808,9 @@ Tensor FFModel::create_tensor(const int dims[],
     case DT_INT64:
       allocator.allocate_field(sizeof(int64_t), FID_DATA);
       break;
+    case DT_BOOLEAN:
+      allocator.allocate_field(sizeof(bool), FID_DATA);
+      break;
     default:
       assert(false);
   }
@@ -976,6 +1000,12 @@ Parameter FFModel::create_linear_weight(Op* op,
     case DT_INT32:
       allocator.allocate_field(sizeof(int), FID_DATA);
       break;
+    case DT_INT64:
+      allocator.allocate_field(sizeof(int64_t), FID_DATA);
+      break;
+    case DT_BOOLEAN:
+      allocator.allocate_field(sizeof(bool), FID_DATA);
+      break;
     default:
       assert(false);
   }
@@ -1107,6 +1137,12 @@ Parameter FFModel::create_conv_weight(Op* op,
     case DT_INT32:
       allocator.allocate_field(sizeof(int), FID_DATA);
       break;
+    case DT_INT64:
+      allocator.allocate_field(sizeof(int64_t), FID_DATA);
+      break;
+    case DT_BOOLEAN:
+      allocator.allocate_field(sizeof(bool), FID_DATA);
+      break;
     default:
       assert(false);
   }
@@ -1223,6 +1259,12 @@ Tensor FFModel::create_linear_replica(const int dims[],
     case DT_INT32:
       allocator.allocate_field(sizeof(int), FID_DATA);
       break;
+    case DT_INT64:
+      allocator.allocate_field(sizeof(int64_t), FID_DATA);
+      break;
+    case DT_BOOLEAN:
+      allocator.allocate_field(sizeof(bool), FID_DATA);
+      break;
     default:
       assert(false);
   }
@@ -1697,6 +1739,25 @@ void FFModel::rewrite(const std::map<Op*, ParallelConfig>& current,
   next[layers[opId]] = layers[opId]->get_random_parallel_config(*this);
 }
 
+void FFModel::measure_operator_costs(std::vector<CostMetrics>& costs,
+                                     std::vector<int>& num_parts)
+{
+  // Measure each layer under its ParallelConfig with the simulator
+  // of the strategy search, on a GPU
+  Context ctx = config.lg_ctx;
+  Runtime* runtime = config.lg_hlr;
+  costs.resize(layers.size());
+  num_parts.resize(layers.size());
+  MeasureOperatorCostsArgs args;
+  args.model = this;
+  args.costs = costs.data();
+  args.num_parts = num_parts.data();
+  TaskLauncher launcher(MEASURE_OPERATOR_COSTS_TASK_ID,
+      TaskArgument(&args, sizeof(MeasureOperatorCostsArgs)));
+  Future future = runtime->execute_task(ctx, launcher);
+  future.get_void_result();
+}
+
 void FFModel::optimize(Simulator* simulator,
                        std::map<Op*, ParallelConfig>& best,
                        size_t budget, float alpha,
@@ -2765,6 +2826,14 @@ void register_flexflow_internal_tasks()
     Runtime::preregister_task_variant<Simulator::strategy_search_task>(
         registrar, "Stretegy Search Task");
   }
+  {
+    TaskVariantRegistrar registrar(MEASURE_OPERATOR_COSTS_TASK_ID,
+                                   "Measure Operator Costs");
+    registrar.add_constraint(ProcessorConstraint(Processor::TOC_PROC));
+    registrar.set_leaf();
+    Runtime::preregister_task_variant<Simulator::measure_operator_costs_task>(
+        registrar, "Measure Operator Costs Task");
+  }
   // Parameter Server Prefetch task
   {
     TaskVariantRegistrar registrar(PS_PREFETCH_TASK_ID, "Weights Prefetch");
@@ -2802,3 +2871,11 @@ template Parameter FFModel::create_conv_weight<1>(Op* op, const int* dims, DataT
 
 template float* Tensor::get_raw_ptr<float>(FFConfig &config);
 template int32_t* Tensor::get_raw_ptr<int32_t>(FFConfig &config);
+template int64_t* Tensor::get_raw_ptr<int64_t>(FFConfig &config);
+template double* Tensor::get_raw_ptr<double>(FFConfig &config);
+template bool* Tensor::get_raw_ptr<bool>(FFConfig &config);
+template void Tensor::get_raw_strides<float>(FFConfig &config, size_t *strides);
+template void Tensor::get_raw_strides<int32_t>(FFConfig &config, size_t *strides);
+template void Tensor::get_raw_strides<int64_t>(FFConfig &config, size_t *strides);
+template void Tensor::get_raw_strides<double>(FFConfig &config, size_t *strides);
+template void Tensor::get_raw_strides<bool>(FFConfig &config, size_t *strides);
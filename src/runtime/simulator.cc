@@ -299,6 +299,17 @@ void Simulator::add_task_dependencies_with_xfer(SimTask* src_task,
 }
 
 CostMetrics Simulator::measure_operator_cost(Op* op, const ParallelConfig& config)
+{
+  CostMetrics cost_metrics;
+  bool is_implemented = measure_operator_cost(op, config, cost_metrics);
+  if (! is_implemented) {
+    handle_measure_operator_cost_unimplemented(op);
+  }
+  return cost_metrics;
+}
+
+bool Simulator::measure_operator_cost(Op* op, const ParallelConfig& config,
+                                      CostMetrics& cost_metrics)
 {
   size_t hash = 17 * 31 + (size_t)(op);
   hash = hash * 31 + std::hash<int>()(config.device_type);
@@ -308,16 +319,15 @@ CostMetrics Simulator::measure_operator_cost(Op* op, const ParallelConfig& confi
   std::map<size_t, CostMetrics>::const_iterator iter =
     hash_to_operator_cost.find(hash);
   if (iter == hash_to_operator_cost.end()) {
-    CostMetrics cost_metrics;
     bool is_implemented = op->measure_operator_cost(this, config, cost_metrics);
     if (! is_implemented) {
-      handle_measure_operator_cost_unimplemented(op);
+      return false;
     }
     hash_to_operator_cost[hash] = cost_metrics;
-    return cost_metrics;
   } else {
-    return iter->second;
+    cost_metrics = iter->second;
   }
+  return true;
 }
 
 float Simulator::simulate_runtime(const FFModel* model,
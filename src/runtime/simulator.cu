@@ -67,19 +67,8 @@ Simulator::~Simulator(void)
   simulatorInst.destroy();
 }
 
-__host__
-void Simulator::strategy_search_task(const Task *task,
-                                     const std::vector<PhysicalRegion> &regions,
-                                     Context ctx, Runtime *runtime)
+static MachineModel* create_machine_model(const FFModel* model, Memory gpu_mem)
 {
-  const FFModel* model = *((FFModel**) task->args);
-  Memory gpu_mem = Machine::MemoryQuery(Machine::get_machine())
-         .only_kind(Memory::GPU_FB_MEM).best_affinity_to(task->target_proc).first();
-  // Realm::MemoryImpl* memImpl =
-  //     Realm::get_runtime()->get_memory_impl(gpu_mem);
-  // Realm::Cuda::GPUFBMemory* memFBImpl = (Realm::Cuda::GPUFBMemory*) memImpl;
-  // off_t offset = memFBImpl->alloc_bytes_local(model->config.simulator_work_space_size);
-  // void* base_ptr = memFBImpl->get_direct_ptr(offset, 0);
   MachineModel *machine;
   if (model->config.machine_model_version == 0) {
     machine = (MachineModel *) new SimpleMachineModel(model->config.numNodes, model->config.workersPerNode, gpu_mem.capacity());
@@ -90,8 +79,11 @@ void Simulator::strategy_search_task(const Task *task,
   else {
     assert(false && "machine model creation error: currently only support machine-model-version = 0 or 1. When machine-model-version = 1, machine-model-file should not be empty.");
   }
-  // Assume this task is running on GPU0
-  Simulator* simulator = new Simulator(model, model->handlers[0], gpu_mem, machine);
+  return machine;
+}
+
+static void set_simulator_stream(Simulator* simulator)
+{
   // Set cublas/cudnn streams to allow Realm catch the events
 #ifndef DISABLE_LEGION_CUDA_HIJACK
   cudaStream_t stream;
@@ -99,6 +91,25 @@ void Simulator::strategy_search_task(const Task *task,
   checkCUDA(cublasSetStream(simulator->handler.blas, stream));
   checkCUDNN(cudnnSetStream(simulator->handler.dnn, stream));
 #endif
+}
+
+__host__
+void Simulator::strategy_search_task(const Task *task,
+                                     const std::vector<PhysicalRegion> &regions,
+                                     Context ctx, Runtime *runtime)
+{
+  const FFModel* model = *((FFModel**) task->args);
+  Memory gpu_mem = Machine::MemoryQuery(Machine::get_machine())
+         .only_kind(Memory::GPU_FB_MEM).best_affinity_to(task->target_proc).first();
+  // Realm::MemoryImpl* memImpl =
+  //     Realm::get_runtime()->get_memory_impl(gpu_mem);
+  // Realm::Cuda::GPUFBMemory* memFBImpl = (Realm::Cuda::GPUFBMemory*) memImpl;
+  // off_t offset = memFBImpl->alloc_bytes_local(model->config.simulator_work_space_size);
+  // void* base_ptr = memFBImpl->get_direct_ptr(offset, 0);
+  MachineModel *machine = create_machine_model(model, gpu_mem);
+  // Assume this task is running on GPU0
+  Simulator* simulator = new Simulator(model, model->handlers[0], gpu_mem, machine);
+  set_simulator_stream(simulator);
   std::map<Op*, ParallelConfig> strategies;
   if (model->config.import_strategy_file.length() > 0) {
     // Load the strategy from config.strategies
@@ -152,3 +163,32 @@ void Simulator::strategy_search_task(const Task *task,
   delete(machine);
 }
 
+__host__
+void Simulator::measure_operator_costs_task(const Task *task,
+                                            const std::vector<PhysicalRegion> &regions,
+                                            Context ctx, Runtime *runtime)
+{
+  const MeasureOperatorCostsArgs* args = (const MeasureOperatorCostsArgs*) task->args;
+  const FFModel* model = args->model;
+  Memory gpu_mem = Machine::MemoryQuery(Machine::get_machine())
+         .only_kind(Memory::GPU_FB_MEM).best_affinity_to(task->target_proc).first();
+  MachineModel *machine = create_machine_model(model, gpu_mem);
+  // Assume this task is running on GPU0
+  Simulator* simulator = new Simulator(model, model->handlers[0], gpu_mem, machine);
+  set_simulator_stream(simulator);
+  for (size_t l = 0; l < model->layers.size(); l++) {
+    Op* op = model->layers[l];
+    // the ParallelConfig the op was partitioned with at compile time
+    ParallelConfig pc;
+    model->config.find_parallel_config(op->outputs[0].numDim, op->name, pc);
+    args->num_parts[l] = pc.num_parts();
+    if (!simulator->measure_operator_cost(op, pc, args->costs[l])) {
+      // not every op can be measured, report them as unknown
+      args->costs[l].forward_time = -1.0f;
+      args->costs[l].backward_time = -1.0f;
+      args->costs[l].memory_requirement = 0;
+    }
+  }
+  delete(simulator);
+  delete(machine);
+}
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+ff = pytest.importorskip("flexflow.core")
+
+class StubStager(object):
+	# records the batches instead of copying them into a batch tensor
+	def __init__(self):
+		self.batches = []
+
+	def fill(self, np_array):
+		self.batches.append(np.array(np_array))
+
+def make_loader(source, batch_size, chunk_size):
+	# the prefetching and batching of MemmapDataLoader without a FFModel
+	loader = ff.MemmapDataLoader.__new__(ff.MemmapDataLoader)
+	loader.source = source
+	loader.batch_size = batch_size
+	loader.chunk_size = chunk_size
+	loader.num_chunks = 2
+	loader.shuffle = False
+	loader.seed = 0
+	loader.epoch = 0
+	loader.pad_last_batch = False
+	loader._num_samples = source.shape[0]
+	loader._stager = StubStager()
+	loader._worker = None
+	return loader
+
+def run_epochs(loader, num_epochs):
+	num_batches = loader.num_samples // loader.batch_size
+	epochs = []
+	for epoch in range(num_epochs):
+		loader.reset()
+		loader._stager.batches = []
+		for step in range(num_batches):
+			loader.fill_next_batch()
+		epochs.append(np.concatenate(loader._stager.batches))
+	loader.close()
+	return epochs
+
+@pytest.mark.parametrize("tail", [0, 10, 64, 100])
+def test_shuffle_tail_chunk(tail):
+	# a tail chunk shorter than a batch must not come up in the middle of an epoch
+	batch_size = 64
+	chunk_size = 4096
+	source = np.arange(chunk_size * 4 + tail, dtype=np.float32).reshape(-1, 1)
+	loader = make_loader(source, batch_size, chunk_size)
+	loader.set_shuffle(None, True, seed=1)
+	num_batches = source.shape[0] // batch_size
+	for samples in run_epochs(loader, 10):
+		assert samples.shape[0] == num_batches * batch_size
+		# every sample is visited at most once
+		assert len(np.unique(samples)) == samples.shape[0]
+
+def test_shuffle_aligned():
+	# the inputs and the labels configured with the same seed draw the same samples
+	source = np.arange(1000, dtype=np.float32).reshape(-1, 1)
+	inputs = make_loader(source, 16, 128)
+	labels = make_loader(source * 2, 16, 128)
+	inputs.set_shuffle(None, True, seed=3)
+	labels.set_shuffle(None, True, seed=3)
+	for input_samples, label_samples in zip(run_epochs(inputs, 3), run_epochs(labels, 3)):
+		np.testing.assert_array_equal(input_samples * 2, label_samples)
+
+def test_pad_last_batch():
+	source = np.arange(100, dtype=np.float32).reshape(-1, 1)
+	loader = make_loader(source, 16, 32)
+	loader.pad_last_batch = True
+	loader.reset()
+	for step in range(7):
+		loader.fill_next_batch()
+	loader.close()
+	samples = np.concatenate(loader._stager.batches).reshape(-1)
+	np.testing.assert_array_equal(samples[:100], np.arange(100))
+	assert (samples[100:] == 99).all()
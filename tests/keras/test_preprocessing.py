@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+sequence = pytest.importorskip("flexflow.keras.preprocessing.sequence")
+text = pytest.importorskip("flexflow.keras.preprocessing.text")
+
+def reference_pad_sequences(sequences, maxlen=None, dtype='int32', padding='pre', truncating='pre', value=0.):
+	# the per-sample loop of keras_preprocessing, which the vectorized version must match
+	lengths = [len(s) for s in sequences]
+	if maxlen is None:
+		maxlen = np.max(lengths)
+	x = np.full((len(sequences), maxlen), value, dtype=dtype)
+	for idx, s in enumerate(sequences):
+		if not len(s):
+			continue
+		if truncating == 'pre':
+			trunc = np.asarray(s[-maxlen:], dtype=dtype)
+		else:
+			trunc = np.asarray(s[:maxlen], dtype=dtype)
+		if padding == 'post':
+			x[idx, :len(trunc)] = trunc
+		else:
+			x[idx, -len(trunc):] = trunc
+	return x
+
+def random_sequences(rng, num_sequences, max_len):
+	return [[rng.randint(1, 100) for _ in range(rng.randint(0, max_len))] for _ in range(num_sequences)]
+
+def random_texts(rng, num_texts):
+	words = ['a', 'b', 'c', 'dd', 'ee', 'f', 'g', 'h']
+	return [' '.join(rng.choice(words) for _ in range(rng.randint(0, 10))) for _ in range(num_texts)]
+
+@pytest.mark.parametrize("padding", ['pre', 'post'])
+@pytest.mark.parametrize("truncating", ['pre', 'post'])
+@pytest.mark.parametrize("maxlen", [None, 1, 5, 20])
+@pytest.mark.parametrize("dtype", ['int32', 'int64', 'float32'])
+def test_pad_sequences(padding, truncating, maxlen, dtype):
+	rng = random.Random(0)
+	for _ in range(20):
+		sequences = random_sequences(rng, rng.randint(1, 30), 12)
+		sequences.append([rng.randint(1, 100)])
+		x = sequence.pad_sequences(sequences, maxlen=maxlen, dtype=dtype, padding=padding, truncating=truncating, value=-1)
+		ref = reference_pad_sequences(sequences, maxlen=maxlen, dtype=dtype, padding=padding, truncating=truncating, value=-1)
+		assert x.dtype == ref.dtype
+		np.testing.assert_array_equal(x, ref)
+
+def test_pad_sequences_ragged():
+	sequences = random_sequences(random.Random(1), 50, 12)
+	ragged = sequence.RaggedSequences.from_sequences(sequences)
+	np.testing.assert_array_equal(sequence.pad_sequences(ragged, maxlen=8),
+	                              reference_pad_sequences(sequences, maxlen=8))
+
+def test_pad_sequences_out_of_range():
+	x = sequence.pad_sequences([[-1, 300]], dtype='uint8')
+	np.testing.assert_array_equal(x, np.array([[-1, 300]]).astype('uint8'))
+
+def test_tokenizer_workers():
+	ref_text = pytest.importorskip("keras_preprocessing.text")
+	texts = random_texts(random.Random(2), 200)
+	tokenizer = text.Tokenizer(num_words=5, oov_token='<u>')
+	tokenizer.fit_on_texts(texts, workers=3)
+	ref = ref_text.Tokenizer(num_words=5, oov_token='<u>')
+	ref.fit_on_texts(texts)
+	assert tokenizer.word_index == ref.word_index
+	assert dict(tokenizer.word_counts) == dict(ref.word_counts)
+	assert dict(tokenizer.word_docs) == dict(ref.word_docs)
+	assert tokenizer.document_count == ref.document_count
+	assert tokenizer.texts_to_sequences(texts, workers=3) == ref.texts_to_sequences(texts)
+	assert tokenizer.texts_to_sequences(texts) == ref.texts_to_sequences(texts)
+
+@pytest.mark.parametrize("mode", ['binary', 'count', 'tfidf', 'freq'])
+def test_sequences_to_matrix(mode):
+	ref_text = pytest.importorskip("keras_preprocessing.text")
+	texts = random_texts(random.Random(3), 200)
+	tokenizer = text.Tokenizer(num_words=6)
+	tokenizer.fit_on_texts(texts)
+	ref = ref_text.Tokenizer(num_words=6)
+	ref.fit_on_texts(texts)
+	sequences = ref.texts_to_sequences(texts)
+	np.testing.assert_allclose(tokenizer.sequences_to_matrix(sequences, mode=mode),
+	                           ref.sequences_to_matrix(sequences, mode=mode), rtol=1e-6)
+	np.testing.assert_allclose(tokenizer.texts_to_matrix(texts, mode=mode),
+	                           ref.texts_to_matrix(texts, mode=mode), rtol=1e-6)
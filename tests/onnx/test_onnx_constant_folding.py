@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+from onnx import helper, numpy_helper, TensorProto
+import flexflow.onnx.constant_folding as constant_folding
+
+def make_model(nodes, input_shape, initializers=()):
+	graph = helper.make_graph(nodes, "test",
+	                          [helper.make_tensor_value_info("x", TensorProto.FLOAT, input_shape)],
+	                          [helper.make_tensor_value_info("y", TensorProto.FLOAT, None)],
+	                          [numpy_helper.from_array(array, name) for name, array in initializers])
+	return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+
+def fold(model, input_shape):
+	return constant_folding.fold_constants(model, {"x": input_shape}, lambda name: None)
+
+@pytest.mark.parametrize("attribute, value, expected", [
+	("value_ints", [2, 3], np.array([2, 3], dtype=np.int64)),
+	("value_int", 6, np.array(6, dtype=np.int64)),
+	("value_floats", [0.5, 2.0], np.array([0.5, 2.0], dtype=np.float32)),
+	("value_float", 0.5, np.array(0.5, dtype=np.float32)),
+	("value", numpy_helper.from_array(np.array([2, 3], dtype=np.int64)), np.array([2, 3], dtype=np.int64)),
+])
+def test_fold_constant(attribute, value, expected):
+	nodes = [helper.make_node("Constant", [], ["c"], **{attribute: value}),
+	         helper.make_node("Identity", ["x"], ["y"])]
+	model = make_model(nodes, [6])
+	constants = fold(model, [6])
+	assert constants["c"].dtype == expected.dtype
+	np.testing.assert_array_equal(constants["c"], expected)
+	assert [node.op_type for node in model.graph.node] == ["Identity"]
+
+def test_fold_constant_reshape():
+	# the shape of the Reshape is folded through the Constant
+	nodes = [helper.make_node("Constant", [], ["shape"], value_ints=[2, 3]),
+	         helper.make_node("Constant", [], ["ones"], value=numpy_helper.from_array(np.ones(6, dtype=np.float32))),
+	         helper.make_node("Reshape", ["ones", "shape"], ["r"]),
+	         helper.make_node("Add", ["x", "r"], ["y"])]
+	model = make_model(nodes, [2, 3])
+	constants = fold(model, [2, 3])
+	np.testing.assert_array_equal(constants["r"], np.ones((2, 3), dtype=np.float32))
+	assert [node.op_type for node in model.graph.node] == ["Add"]
+
+def test_keep_string_constant():
+	nodes = [helper.make_node("Constant", [], ["c"], value_strings=["a", "b"]),
+	         helper.make_node("Identity", ["x"], ["y"])]
+	model = make_model(nodes, [6])
+	assert "c" not in fold(model, [6])
+	assert [node.op_type for node in model.graph.node] == ["Constant", "Identity"]
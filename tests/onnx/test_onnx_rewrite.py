@@ -0,0 +1,206 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+reference = pytest.importorskip("onnx.reference")
+from onnx import helper, numpy_helper, TensorProto
+import flexflow.onnx.rewrite as rewrite
+
+def make_graph(nodes, input_shape, arrays):
+	return helper.make_graph(nodes, "test",
+	                         [helper.make_tensor_value_info("x", TensorProto.FLOAT, input_shape)],
+	                         [helper.make_tensor_value_info("y", TensorProto.FLOAT, None)],
+	                         [numpy_helper.from_array(array, name) for name, array in arrays.items()])
+
+def lower_graph(graph, arrays):
+	# the rewritten graph uses ops and attributes of FlexFlow, lower them back to
+	# ONNX so that the reference runtime can run it: Dense is the Gemm of
+	# ONNXModel.handleDense and the fused activations become nodes again
+	nodes = []
+	for node in graph.node:
+		attributes = {a.name: helper.get_attribute_value(a) for a in node.attribute}
+		activation = attributes.pop("activation", b"").decode()
+		output = node.output[0] + "_preact" if activation != "" else node.output[0]
+		if node.op_type == "Dense":
+			nodes.append(helper.make_node("Gemm", list(node.input), [output], transB=attributes.get("trans_b", 1),
+			                              alpha=attributes.get("alpha", 1.0), beta=attributes.get("beta", 1.0)))
+		else:
+			nodes.append(helper.make_node(node.op_type, list(node.input), [output], **attributes))
+		if activation != "":
+			nodes.append(helper.make_node(activation, [output], [node.output[0]]))
+	return helper.make_graph(nodes, "lowered", list(graph.input), list(graph.output),
+	                         [numpy_helper.from_array(array, name) for name, array in arrays.items()])
+
+def run_graph(graph, x):
+	model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 15)])
+	return reference.ReferenceEvaluator(model).run(None, {"x": x})[0]
+
+def check_rewrite(nodes, input_shape, arrays, op_types, passes=None):
+	x = np.random.RandomState(0).standard_normal(input_shape).astype(np.float32)
+	expected = run_graph(make_graph(nodes, input_shape, arrays), x)
+	graph = make_graph(nodes, input_shape, arrays)
+	weights = {name: list(array.shape) for name, array in arrays.items()}
+	new_weights = rewrite.rewrite_graph(graph, weights, passes, arrays.get)
+	assert [node.op_type for node in graph.node] == op_types
+	all_arrays = dict(arrays)
+	all_arrays.update(new_weights)
+	np.testing.assert_allclose(run_graph(lower_graph(graph, all_arrays), x), expected, rtol=1e-6, atol=1e-6)
+	return graph
+
+def random_arrays(**shapes):
+	rng = np.random.RandomState(1)
+	return {name: rng.standard_normal(shape).astype(np.float32) for name, shape in shapes.items()}
+
+def test_fuse_pad_conv():
+	arrays = random_arrays(W=(4, 3, 3, 3))
+	arrays["pads"] = np.array([0, 0, 1, 2, 0, 0, 1, 2], dtype=np.int64)
+	nodes = [helper.make_node("Pad", ["x", "pads"], ["p"], mode="constant"),
+	         helper.make_node("Conv", ["p", "W"], ["y"], kernel_shape=[3, 3], pads=[1, 0, 1, 0])]
+	graph = check_rewrite(nodes, [2, 3, 8, 8], arrays, ["Conv"])
+	attributes = {a.name: helper.get_attribute_value(a) for a in graph.node[0].attribute}
+	assert list(attributes["pads"]) == [2, 2, 2, 2]
+
+def test_fuse_pad_conv_asymmetric():
+	arrays = random_arrays(W=(4, 3, 3, 3))
+	arrays["pads"] = np.array([0, 0, 1, 1, 0, 0, 0, 0], dtype=np.int64)
+	nodes = [helper.make_node("Pad", ["x", "pads"], ["p"], mode="constant"),
+	         helper.make_node("Conv", ["p", "W"], ["y"], kernel_shape=[3, 3])]
+	check_rewrite(nodes, [2, 3, 8, 8], arrays, ["Pad", "Conv"])
+
+def test_eliminate_identity():
+	arrays = random_arrays(W=(4, 5), b=(5,))
+	nodes = [helper.make_node("Identity", ["x"], ["i"]),
+	         helper.make_node("Gemm", ["i", "W", "b"], ["g"]),
+	         helper.make_node("Identity", ["g"], ["y"])]
+	# an Identity computing a graph output is kept
+	check_rewrite(nodes, [3, 4], arrays, ["Dense", "Identity"])
+
+def test_matmul_add_to_dense():
+	arrays = random_arrays(W=(4, 5), b=(1, 5))
+	nodes = [helper.make_node("MatMul", ["x", "W"], ["m"]),
+	         helper.make_node("Add", ["b", "m"], ["y"])]
+	graph = check_rewrite(nodes, [3, 4], arrays, ["Dense"])
+	assert list(graph.node[0].input) == ["x", "W", "b"]
+
+@pytest.mark.parametrize("trans_b", [0, 1])
+def test_gemm_to_dense(trans_b):
+	arrays = random_arrays(W=(5, 4) if trans_b == 1 else (4, 5), b=(5,))
+	nodes = [helper.make_node("Gemm", ["x", "W", "b"], ["y"], transB=trans_b, alpha=0.5, beta=2.0)]
+	check_rewrite(nodes, [3, 4], arrays, ["Dense"])
+
+def test_gemm_trans_a_is_not_rewritten():
+	arrays = random_arrays(W=(4, 5))
+	nodes = [helper.make_node("Gemm", ["x", "W"], ["y"], transA=1)]
+	check_rewrite(nodes, [4, 3], arrays, ["Gemm"])
+
+@pytest.mark.parametrize("activation", ["Relu", "Sigmoid"])
+def test_fuse_dense_activation(activation):
+	arrays = random_arrays(W=(5, 4), b=(5,))
+	nodes = [helper.make_node("Gemm", ["x", "W", "b"], ["g"], transB=1),
+	         helper.make_node(activation, ["g"], ["y"])]
+	check_rewrite(nodes, [3, 4], arrays, ["Dense"])
+
+def test_fuse_conv_relu():
+	arrays = random_arrays(W=(4, 3, 3, 3), b=(4,))
+	nodes = [helper.make_node("Conv", ["x", "W", "b"], ["c"], kernel_shape=[3, 3], pads=[1, 1, 1, 1]),
+	         helper.make_node("Relu", ["c"], ["y"])]
+	check_rewrite(nodes, [2, 3, 6, 6], arrays, ["Conv"])
+
+def test_conv_sigmoid_is_not_fused():
+	arrays = random_arrays(W=(4, 3, 3, 3))
+	nodes = [helper.make_node("Conv", ["x", "W"], ["c"], kernel_shape=[3, 3]),
+	         helper.make_node("Sigmoid", ["c"], ["y"])]
+	check_rewrite(nodes, [2, 3, 6, 6], arrays, ["Conv", "Sigmoid"])
+
+def batch_norm_arrays(arrays, num_channels):
+	rng = np.random.RandomState(2)
+	arrays["scale"] = rng.standard_normal(num_channels).astype(np.float32)
+	arrays["shift"] = rng.standard_normal(num_channels).astype(np.float32)
+	arrays["mean"] = rng.standard_normal(num_channels).astype(np.float32)
+	arrays["var"] = (rng.random_sample(num_channels) + 0.5).astype(np.float32)
+	return arrays
+
+fold_passes = rewrite.default_rewrite_passes + [rewrite.FoldBatchNorm()]
+
+@pytest.mark.parametrize("use_bias", [False, True])
+def test_fold_batch_norm_conv(use_bias):
+	arrays = batch_norm_arrays(random_arrays(W=(4, 3, 3, 3), b=(4,)), 4)
+	inputs = ["x", "W", "b"] if use_bias else ["x", "W"]
+	nodes = [helper.make_node("Conv", inputs, ["c"], kernel_shape=[3, 3], pads=[1, 1, 1, 1]),
+	         helper.make_node("BatchNormalization", ["c", "scale", "shift", "mean", "var"], ["n"], epsilon=1e-3),
+	         helper.make_node("Relu", ["n"], ["y"])]
+	check_rewrite(nodes, [2, 3, 6, 6], arrays, ["Conv"], fold_passes)
+
+@pytest.mark.parametrize("trans_b", [0, 1])
+def test_fold_batch_norm_gemm(trans_b):
+	arrays = batch_norm_arrays(random_arrays(W=(5, 4) if trans_b == 1 else (4, 5), b=(5,)), 5)
+	nodes = [helper.make_node("Gemm", ["x", "W", "b"], ["g"], transB=trans_b, alpha=2.0, beta=0.5),
+	         helper.make_node("BatchNormalization", ["g", "scale", "shift", "mean", "var"], ["y"])]
+	graph = check_rewrite(nodes, [3, 4], arrays, ["Dense"], fold_passes)
+	attributes = {a.name: helper.get_attribute_value(a) for a in graph.node[0].attribute}
+	assert attributes["trans_b"] == 1 and "alpha" not in attributes and "beta" not in attributes
+
+def test_fold_batch_norm_shared_output():
+	# the Conv output is also read by another node, so it can not be folded
+	arrays = batch_norm_arrays(random_arrays(W=(4, 3, 3, 3)), 4)
+	nodes = [helper.make_node("Conv", ["x", "W"], ["c"], kernel_shape=[3, 3]),
+	         helper.make_node("BatchNormalization", ["c", "scale", "shift", "mean", "var"], ["n"]),
+	         helper.make_node("Add", ["c", "n"], ["y"])]
+	check_rewrite(nodes, [2, 3, 6, 6], arrays, ["Conv", "BatchNormalization", "Add"], fold_passes)
+
+class StubOp(object):
+	def __init__(self, name):
+		self.name = name
+
+	def get_parameter_tensor_by_id(self, parameter_id):
+		return (self.name, parameter_id)
+
+class StubTensor(object):
+	def __init__(self, dims):
+		self.dims = dims
+
+class StubFFModel(object):
+	# records the ops created by ONNXModel.apply and the parameters set by load_weights
+	def __init__(self):
+		self.layers = []
+		self.calls = []
+		self.parameters = {}
+
+	def get_layers(self):
+		return self.layers
+
+	def conv2d(self, input, *args, **kwargs):
+		self.calls.append(("conv2d", args, kwargs))
+		self.layers.append(StubOp(kwargs["name"]))
+		return StubTensor(input.dims)
+
+	def set_parameters(self, parameters, np_arrays):
+		self.parameters.update(zip(parameters, np_arrays))
+
+def test_apply_fold_batch_norm_conv():
+	onnx_model = pytest.importorskip("flexflow.onnx.model")
+	from flexflow.core import ActiMode, CompMode
+	arrays = batch_norm_arrays(random_arrays(W=(4, 3, 3, 3), b=(4,)), 4)
+	nodes = [helper.make_node("Conv", ["x", "W", "b"], ["c"], name="conv", kernel_shape=[3, 3],
+	                          strides=[1, 1], pads=[1, 1, 1, 1], group=1),
+	         helper.make_node("BatchNormalization", ["c", "scale", "shift", "mean", "var"], ["n"]),
+	         helper.make_node("Relu", ["n"], ["y"])]
+	input_shape = [2, 3, 6, 6]
+	x = np.random.RandomState(0).standard_normal(input_shape).astype(np.float32)
+	model = helper.make_model(make_graph(nodes, input_shape, arrays), opset_imports=[helper.make_opsetid("", 15)])
+	expected = run_graph(model.graph, x)
+	importer = onnx_model.ONNXModel(model)
+	ffmodel = StubFFModel()
+	importer.apply(ffmodel, {"x": StubTensor(input_shape)}, CompMode.INFERENCE)
+	assert [call[0] for call in ffmodel.calls] == ["conv2d"]
+	args, kwargs = ffmodel.calls[0][1:]
+	# out_channels, kernel, stride, padding, activation, group, use_bias
+	assert args == (4, 3, 3, 1, 1, 1, 1, ActiMode.AC_MODE_RELU, 1, True)
+	assert [(op.name, parameter_id, name) for op, parameter_id, name, transform in importer.parameter_table] == \
+	       [("conv", 0, "n_folded_kernel"), ("conv", 1, "n_folded_bias")]
+	importer.load_weights(ffmodel)
+	# the folded weights computed by the Conv alone give the outputs of Conv+BN+Relu
+	folded = {"W": ffmodel.parameters[("conv", 0)], "b": ffmodel.parameters[("conv", 1)]}
+	conv_relu = [helper.make_node("Conv", ["x", "W", "b"], ["c"], kernel_shape=[3, 3], pads=[1, 1, 1, 1]),
+	             helper.make_node("Relu", ["c"], ["y"])]
+	np.testing.assert_allclose(run_graph(make_graph(conv_relu, input_shape, folded), x), expected, rtol=1e-5, atol=1e-5)
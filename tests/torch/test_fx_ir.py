@@ -0,0 +1,58 @@
+import pytest
+
+# the nodes are built directly, torch is only needed by the import of fx
+fx = pytest.importorskip("flexflow.torch.fx")
+from flexflow.core.flexflow_type import OpType, ActiMode, PoolType, enum_to_int
+from flexflow.torch.fx import IRNode
+
+def make_nodes():
+	# a small CNN with every kind of attrs: ints, a float, the outputs of a split
+	relu = enum_to_int(ActiMode, ActiMode.AC_MODE_RELU)
+	none = enum_to_int(ActiMode, ActiMode.AC_MODE_NONE)
+	max_pool = enum_to_int(PoolType, PoolType.POOL_MAX)
+	return [IRNode("x", OpType.INPUT, []),
+	        IRNode("conv1", OpType.CONV2D, [0], (16, 3, 3, 1, 1, 1, 1, relu, 1, 1)),
+	        IRNode("pool1", OpType.POOL2D, [1], (2, 2, 0, max_pool, none)),
+	        IRNode("split", OpType.SPLIT, [2], (2, 1)),
+	        IRNode("getitem", OpType.GETITEM, [3], (0,)),
+	        IRNode("getitem_1", OpType.GETITEM, [3], (1,)),
+	        IRNode("add", OpType.ADD, [4, 5]),
+	        IRNode("cat", OpType.CONCAT, [6, 4], (1,)),
+	        IRNode("flat", OpType.FLAT, [7]),
+	        IRNode("dropout", OpType.DROPOUT, [8], (0.25,)),
+	        IRNode("fc", OpType.LINEAR, [9], (10, none, 1)),
+	        IRNode("softmax", OpType.SOFTMAX, [10]),
+	        IRNode("output", OpType.OUTPUT, [11])]
+
+def assert_same_nodes(nodes, expected):
+	assert len(nodes) == len(expected)
+	for node, expected_node in zip(nodes, expected):
+		assert node.name == expected_node.name
+		assert node.op_type == expected_node.op_type
+		assert list(node.inputs) == list(expected_node.inputs)
+		assert tuple(node.attrs) == tuple(expected_node.attrs)
+
+def test_ir_bytes_round_trip():
+	nodes = make_nodes()
+	data = fx.ir_to_bytes(nodes)
+	assert fx.is_ir_bytes(data)
+	assert_same_nodes(fx.ir_from_bytes(data), nodes)
+	# the deserializer also reads from a memoryview of a mapped file
+	assert_same_nodes(fx.ir_from_bytes(memoryview(data)), nodes)
+
+def test_ir_str_round_trip():
+	nodes = make_nodes()
+	lines = fx.ir_to_str(nodes)
+	assert len(lines) == len(nodes)
+	assert not fx.is_ir_bytes("".join(lines).encode("utf-8"))
+	assert_same_nodes(fx.ir_from_str(lines), nodes)
+
+def test_ir_str_to_bytes():
+	nodes = fx.ir_from_str(fx.ir_to_str(make_nodes()))
+	assert fx.ir_to_bytes(nodes) == fx.ir_to_bytes(make_nodes())
+
+def test_ir_bytes_version():
+	data = bytearray(fx.ir_to_bytes(make_nodes()))
+	data[4] += 1
+	with pytest.raises(AssertionError):
+		fx.ir_from_bytes(bytes(data))